@@ -0,0 +1,53 @@
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+
+class StatelessUser(TokenUser):
+    """
+    Пользователь, восстановленный из claims access-токена без запроса к БД.
+    Для записи во внешние ключи используйте id (buyer_id=request.user.id).
+    """
+
+    # simplejwt хранит user_id строкой, а сравнивается он с *_id моделей
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @property
+    def email(self):
+        return self.token.get('email', '')
+
+    @property
+    def is_seller(self):
+        return bool(self.token.get('is_seller'))
+
+    @property
+    def seller_profile_id(self):
+        return self.token.get('seller_profile_id')
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация без загрузки CustomUser на каждый запрос.
+    Токены, выпущенные до появления claim is_seller, обрабатываются
+    по-старому — через БД.
+
+    is_active не проверяется: деактивированный пользователь остается
+    аутентифицированным до истечения access-токена (ACCESS_TOKEN_LIFETIME),
+    новый access через refresh он уже не получит.
+    """
+
+    def get_user(self, validated_token):
+        if 'is_seller' not in validated_token:
+            return super().get_user(validated_token)
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        return StatelessUser(validated_token)
@@ -0,0 +1,54 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from common.benchmark import Benchmark, format_summary, test_database, write_results
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк регистрации: пропускная способность Stage1View, Stage2View и Stage3View'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--iterations', type=int, default=200)
+        parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON')
+        parser.add_argument(
+            '--real-hasher', action='store_true',
+            help='Использовать настоящий PBKDF2 (по умолчанию MD5, чтобы измерять работу с БД)',
+        )
+
+    def handle(self, *args, iterations=200, json_path=None, real_hasher=False, **options):
+        overrides = {
+            'OUTBOX': {'EAGER_DISPATCH': False},
+            # Лимиты отправки не должны влиять на замеры
+            'OTP_SETTINGS': {'MAX_SENDS': iterations + 1},
+        }
+        if not real_hasher:
+            overrides['PASSWORD_HASHERS'] = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+        stages = [Benchmark('stage1'), Benchmark('stage2'), Benchmark('stage3')]
+        with test_database(), override_settings(**overrides), \
+                mock.patch('apps.accounts.otp.generate_code', return_value='123456'):
+            cache.clear()
+            for i in range(iterations):
+                self._register(Client(), i, stages)
+
+        results = [stage.summary() for stage in stages]
+        for summary in results:
+            self.stdout.write(format_summary(summary))
+        if json_path:
+            write_results(json_path, results, benchmark='registration')
+
+    def _register(self, client, i, stages):
+        steps = [
+            (reverse('stage1'), {'email_or_phone': f'bench{i}@gmail.com'}, 200),
+            (reverse('stage2'), {'otp': '123456'}, 200),
+            (reverse('stage3'), {'username': f'bench{i}', 'password': 'Bench-pass-42'}, 201),
+        ]
+        for bench, (url, data, expected) in zip(stages, steps):
+            with bench.measure():
+                response = client.post(url, data)
+            if response.status_code != expected:
+                raise RuntimeError(f'{url}: {response.status_code} {response.content!r}')
@@ -0,0 +1,34 @@
+from django.utils.functional import SimpleLazyObject
+
+
+class SellerContext:
+    """Кто делает запрос: id пользователя и id профиля продавца (или None)"""
+
+    __slots__ = ('user_id', 'profile_id')
+
+    def __init__(self, user):
+        if user is not None and user.is_authenticated:
+            self.user_id = user.id
+            self.profile_id = user.seller_profile_id
+        else:
+            self.user_id = None
+            self.profile_id = None
+
+    @property
+    def is_seller(self):
+        return self.profile_id is not None
+
+
+class SellerContextMiddleware:
+    """
+    Добавляет request.seller — SellerContext, вычисляемый один раз за запрос.
+    Вычисление ленивое: к моменту обращения из view DRF уже подставил
+    в request.user пользователя из JWT (без запроса к БД) или сессии.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.seller = SimpleLazyObject(lambda: SellerContext(request.user))
+        return self.get_response(request)
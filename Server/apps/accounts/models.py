@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 class CustomUser(AbstractUser):
@@ -15,6 +16,18 @@ class CustomUser(AbstractUser):
 
     def __str__(self):
         return self.email
+
+    # Тот же интерфейс, что и у StatelessUser из JWT (apps/accounts/authentication.py)
+    @cached_property
+    def seller_profile_id(self):
+        try:
+            return self.seller_profile.id
+        except SellerProfile.DoesNotExist:
+            return None
+
+    @property
+    def is_seller(self):
+        return self.seller_profile_id is not None
     
 
 class SellerProfile(models.Model):
@@ -24,4 +37,25 @@ class SellerProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f'Продавец: {self.shop_name}'
\ No newline at end of file
+        return f'Продавец: {self.shop_name}'
+
+class OTPCode(models.Model):
+    """Одноразовый код верификации (резервное хранилище для OTP)"""
+    identifier = models.CharField(max_length=100, unique=True)
+    code = models.CharField(max_length=6)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    is_verified = models.BooleanField(default=False)
+    expires_at = models.DateTimeField()
+
+    # Ограничение частоты отправки
+    send_count = models.PositiveSmallIntegerField(default=0)
+    window_started_at = models.DateTimeField()
+    last_sent_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f'OTP для {self.identifier}'
@@ -0,0 +1,230 @@
+"""
+Хранилище одноразовых кодов (OTP) для регистрации.
+
+По умолчанию коды живут в кеше Django (он должен быть общим для воркеров,
+иначе settings выбирают 'db'), при OTP_SETTINGS['STORE'] = 'db'
+используется таблица OTPCode. Оба хранилища поддерживают TTL, счетчик
+попыток ввода и ограничение частоты отправки на один email/телефон.
+"""
+import hmac
+import secrets
+import string
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OTPCode
+
+
+DEFAULTS = {
+    'STORE': 'cache',           # 'cache' или 'db'
+    'CACHE_ALIAS': 'default',
+    'LENGTH': 6,
+    'TTL': 300,                 # время жизни кода, сек
+    'MAX_ATTEMPTS': 5,          # попыток ввода на один код
+    'RESEND_INTERVAL': 60,      # минимальный интервал между отправками, сек
+    'MAX_SENDS': 5,             # отправок за окно
+    'SEND_WINDOW': 3600,        # окно ограничения отправок, сек
+}
+
+
+def otp_settings():
+    return {**DEFAULTS, **getattr(settings, 'OTP_SETTINGS', {})}
+
+
+def generate_code(length):
+    return ''.join(secrets.choice(string.digits) for _ in range(length))
+
+
+class OTPThrottled(Exception):
+    """Превышен лимит отправок или попыток ввода"""
+
+    def __init__(self, message, wait=None):
+        super().__init__(message)
+        self.message = message
+        self.wait = wait
+
+
+class BaseOTPStore:
+    def __init__(self, options=None):
+        self.options = options or otp_settings()
+
+    def issue(self, identifier):
+        """Создать новый код для identifier и вернуть его"""
+        raise NotImplementedError
+
+    def verify(self, identifier, code):
+        """Проверить код; при успехе identifier считается подтвержденным"""
+        raise NotImplementedError
+
+    def is_verified(self, identifier):
+        raise NotImplementedError
+
+    def discard(self, identifier):
+        raise NotImplementedError
+
+
+class CacheOTPStore(BaseOTPStore):
+    """OTP в кеше Django: без обращений к БД на каждом шаге"""
+
+    def __init__(self, options=None):
+        super().__init__(options)
+        self.cache = caches[self.options['CACHE_ALIAS']]
+
+    def _key(self, kind, identifier):
+        return f'otp:{kind}:{identifier}'
+
+    def _incr(self, key, timeout):
+        # add() не перезаписывает существующий счетчик и задает ему TTL окна
+        self.cache.add(key, 0, timeout)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # ключ истек между add() и incr()
+            self.cache.set(key, 1, timeout)
+            return 1
+
+    def issue(self, identifier):
+        opts = self.options
+        now = time.time()
+
+        cooldown_key = self._key('cooldown', identifier)
+        if not self.cache.add(cooldown_key, now, opts['RESEND_INTERVAL']):
+            sent_at = self.cache.get(cooldown_key) or now
+            wait = max(1, int(opts['RESEND_INTERVAL'] - (now - sent_at)))
+            raise OTPThrottled("Код уже отправлен, повторите позже", wait)
+
+        sends = self._incr(self._key('sends', identifier), opts['SEND_WINDOW'])
+        if sends > opts['MAX_SENDS']:
+            raise OTPThrottled("Превышен лимит отправки кодов", opts['SEND_WINDOW'])
+
+        code = generate_code(opts['LENGTH'])
+        self.cache.set(self._key('code', identifier), {'code': code, 'verified': False}, opts['TTL'])
+        self.cache.delete(self._key('attempts', identifier))
+        return code
+
+    def verify(self, identifier, code):
+        opts = self.options
+        code_key = self._key('code', identifier)
+        entry = self.cache.get(code_key)
+        if not entry:
+            return False
+
+        attempts = self._incr(self._key('attempts', identifier), opts['TTL'])
+        if attempts > opts['MAX_ATTEMPTS']:
+            self.discard(identifier)
+            raise OTPThrottled("Слишком много попыток, запросите новый код")
+
+        if not hmac.compare_digest(entry['code'], code):
+            return False
+
+        entry['verified'] = True
+        self.cache.set(code_key, entry, opts['TTL'])
+        return True
+
+    def is_verified(self, identifier):
+        entry = self.cache.get(self._key('code', identifier))
+        return bool(entry and entry['verified'])
+
+    def discard(self, identifier):
+        self.cache.delete_many([
+            self._key('code', identifier),
+            self._key('attempts', identifier),
+        ])
+
+
+class DatabaseOTPStore(BaseOTPStore):
+    """OTP в таблице OTPCode: для конфигураций без общего кеша"""
+
+    @transaction.atomic
+    def issue(self, identifier):
+        opts = self.options
+        now = timezone.now()
+        code = generate_code(opts['LENGTH'])
+        expires_at = now + timedelta(seconds=opts['TTL'])
+
+        otp, created = OTPCode.objects.select_for_update().get_or_create(
+            identifier=identifier,
+            defaults={
+                'code': code,
+                'expires_at': expires_at,
+                'send_count': 1,
+                'window_started_at': now,
+                'last_sent_at': now,
+            },
+        )
+        if created:
+            return code
+
+        elapsed = (now - otp.last_sent_at).total_seconds()
+        if elapsed < opts['RESEND_INTERVAL']:
+            raise OTPThrottled(
+                "Код уже отправлен, повторите позже",
+                max(1, int(opts['RESEND_INTERVAL'] - elapsed)),
+            )
+
+        if (now - otp.window_started_at).total_seconds() >= opts['SEND_WINDOW']:
+            otp.window_started_at = now
+            otp.send_count = 0
+        if otp.send_count >= opts['MAX_SENDS']:
+            raise OTPThrottled("Превышен лимит отправки кодов", opts['SEND_WINDOW'])
+
+        otp.code = code
+        otp.attempts = 0
+        otp.is_verified = False
+        otp.expires_at = expires_at
+        otp.send_count += 1
+        otp.last_sent_at = now
+        otp.save()
+        return code
+
+    def verify(self, identifier, code):
+        # Исключение — после commit, иначе сброс кода откатился бы вместе с транзакцией
+        with transaction.atomic():
+            otp = OTPCode.objects.select_for_update().filter(
+                identifier=identifier,
+                expires_at__gt=timezone.now(),
+            ).first()
+            if otp is None:
+                return False
+
+            otp.attempts += 1
+            locked = otp.attempts > self.options['MAX_ATTEMPTS']
+            if locked:
+                otp.expires_at = timezone.now()
+                otp.save(update_fields=['attempts', 'expires_at'])
+            else:
+                otp.is_verified = hmac.compare_digest(otp.code, code)
+                otp.save(update_fields=['attempts', 'is_verified'])
+        if locked:
+            raise OTPThrottled("Слишком много попыток, запросите новый код")
+        return otp.is_verified
+
+    def is_verified(self, identifier):
+        return OTPCode.objects.filter(
+            identifier=identifier,
+            is_verified=True,
+            expires_at__gt=timezone.now(),
+        ).exists()
+
+    def discard(self, identifier):
+        # Счетчики отправок сохраняем, сбрасываем только сам код
+        OTPCode.objects.filter(identifier=identifier).update(
+            is_verified=False,
+            expires_at=timezone.now(),
+        )
+
+
+STORES = {
+    'cache': CacheOTPStore,
+    'db': DatabaseOTPStore,
+}
+
+
+def get_otp_store():
+    options = otp_settings()
+    return STORES[options['STORE']](options)
@@ -1,10 +1,10 @@
-from rest_framework import serializers
+from rest_framework import serializers, exceptions
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
-from django.core.mail import send_mail
-from django.conf import settings
-import random
-import string
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from .otp import get_otp_store, OTPThrottled
+from .tasks import send_otp
 
 User = get_user_model()
 
@@ -18,27 +18,25 @@ class Stage1Serializer(serializers.Serializer):
         else:
             if not value.isdigit() or len(value) < 10:
                 raise serializers.ValidationError("Неверный телефон")
-        if User.objects.filter(email=value).exists() or User.objects.filter(phone=value).exists():
+        # email и phone уникальны (индексированы): одна проверка на оба поля
+        if User.objects.filter(Q(email=value) | Q(phone=value)).exists():
             raise serializers.ValidationError("Пользователь уже существует")
         return value
 
     def create_otp(self, value):
-        otp = ''.join(random.choices(string.digits, k=6))
+        try:
+            otp = get_otp_store().issue(value)
+        except OTPThrottled as exc:
+            raise exceptions.Throttled(wait=exc.wait, detail=exc.message)
+        session = self.context['session']
+        session.pop('temp_email', None)
+        session.pop('temp_phone', None)
+        send_otp(value, otp)
         if '@' in value:
-            send_mail(
-                'Код верификации',
-                f'Ваш код: {otp}',
-                settings.DEFAULT_FROM_EMAIL,
-                [value],
-                fail_silently=False,
-            )
-            self.context['session']['temp_email'] = value
-            self.context['session']['otp'] = otp
-            self.context['session'].modified = True
+            session['temp_email'] = value
         else:
-            self.context['session']['temp_phone'] = value
-            self.context['session']['otp'] = otp
-            self.context['session'].modified = True
+            session['temp_phone'] = value
+        session.modified = True
         return otp
 
 class Stage2Serializer(serializers.Serializer):
@@ -46,8 +44,14 @@ class Stage2Serializer(serializers.Serializer):
 
     def validate_otp(self, value):
         session = self.context['session']
-        otp = session.get('otp')
-        if not otp or value != otp:
+        email_or_phone = session.get('temp_email') or session.get('temp_phone')
+        if not email_or_phone:
+            raise serializers.ValidationError("Неверный код")
+        try:
+            verified = get_otp_store().verify(email_or_phone, value)
+        except OTPThrottled as exc:
+            raise serializers.ValidationError(exc.message)
+        if not verified:
             raise serializers.ValidationError("Неверный код")
         return value
 
@@ -55,32 +59,52 @@ class Stage3Serializer(serializers.Serializer):
     username = serializers.CharField(max_length=150, min_length=3)
     password = serializers.CharField(min_length=8, write_only=True)
 
-    def validate_username(self, value):
-        if User.objects.filter(username=value).exists():
-            raise serializers.ValidationError("Username занят")
-        return value
-
     def validate_password(self, value):
         validate_password(value)
         return value
 
-    def create_user(self):
+    def validate(self, data):
         session = self.context['session']
         email_or_phone = session.get('temp_email') or session.get('temp_phone')
-        user = User.objects.create_user(
-            email=email_or_phone if '@' in email_or_phone else None,
-            phone=email_or_phone if '@' not in email_or_phone else None,
-            username=self.validated_data['username'],
-            password=self.validated_data['password'],
+        if not email_or_phone or not get_otp_store().is_verified(email_or_phone):
+            raise serializers.ValidationError("Email или телефон не подтвержден")
+
+        # Username и email/телефон проверяются одним запросом по уникальным индексам
+        taken = list(
+            User.objects.filter(
+                Q(username=data['username']) | Q(email=email_or_phone) | Q(phone=email_or_phone)
+            ).values_list('username', flat=True)[:2]
         )
-        if '@' in email_or_phone:
-            user.is_email_verified = True
-        else:
-            user.is_phone_verified = True
-        user.save()
-        if 'otp' in session:
-            del session['otp']
-            session.modified = True
+        if data['username'] in taken:
+            raise serializers.ValidationError({'username': "Username занят"})
+        if taken:
+            raise serializers.ValidationError("Пользователь уже существует")
+        return data
+
+    def create_user(self):
+        session = self.context['session']
+        email_or_phone = session.get('temp_email') or session.get('temp_phone')
+        is_email = '@' in email_or_phone
+        try:
+            # Один INSERT: флаги верификации выставляются сразу
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    email=email_or_phone if is_email else None,
+                    phone=email_or_phone if not is_email else None,
+                    username=self.validated_data['username'],
+                    password=self.validated_data['password'],
+                    is_email_verified=is_email,
+                    is_phone_verified=not is_email,
+                )
+        except IntegrityError:
+            # Параллельная регистрация заняла username или email/телефон
+            raise serializers.ValidationError("Пользователь уже существует")
+        # Новый пользователь еще не продавец: claims токена без лишнего запроса
+        user.seller_profile_id = None
+        get_otp_store().discard(email_or_phone)
+        session.pop('temp_email', None)
+        session.pop('temp_phone', None)
+        session.modified = True
         return user
 
 class Stage4Serializer(serializers.ModelSerializer):
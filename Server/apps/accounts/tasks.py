@@ -0,0 +1,8 @@
+from apps.notifications.services import enqueue_email, enqueue_sms
+
+
+def send_otp(email_or_phone, otp):
+    """Поставить код в очередь исходящих сообщений (email или SMS)"""
+    if '@' in email_or_phone:
+        return enqueue_email(email_or_phone, 'Код верификации', f'Ваш код: {otp}')
+    return enqueue_sms(email_or_phone, f'Ваш код: {otp}')
@@ -1,3 +1,147 @@
-from django.test import TestCase
+import time
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import StatelessJWTAuthentication, StatelessUser
+from .middleware import SellerContext
+from .models import CustomUser, SellerProfile
+from .otp import CacheOTPStore, DatabaseOTPStore, OTPThrottled, otp_settings
+from .tokens import UserRefreshToken
+
+
+class Clock:
+    """Подменяет time.time() (TTL кеша) и timezone.now() (DatabaseOTPStore)"""
+
+    def __init__(self, test):
+        self.now = time.time()
+        test.enterContext(mock.patch('time.time', lambda: self.now))
+        test.enterContext(mock.patch(
+            'django.utils.timezone.now', lambda: datetime.fromtimestamp(self.now, dt_timezone.utc),
+        ))
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class OTPStoreTests:
+    """Одни и те же проверки для обоих хранилищ (подклассы задают store_class)"""
+
+    store_class = None
+    options = {'TTL': 300, 'MAX_ATTEMPTS': 3, 'RESEND_INTERVAL': 60, 'MAX_SENDS': 3, 'SEND_WINDOW': 3600}
+
+    def setUp(self):
+        cache.clear()
+        self.clock = Clock(self)
+        self.store = self.store_class({**otp_settings(), **self.options})
+
+    def test_code_expires_after_ttl(self):
+        code = self.store.issue('a@example.com')
+        self.clock.advance(299)
+        self.assertTrue(self.store.verify('a@example.com', code))
+        self.assertTrue(self.store.is_verified('a@example.com'))
+        self.clock.advance(301)
+        self.assertFalse(self.store.is_verified('a@example.com'))
+        self.assertFalse(self.store.verify('a@example.com', code))
+
+    def test_lockout_after_max_attempts(self):
+        code = self.store.issue('a@example.com')
+        wrong = '000000' if code != '000000' else '111111'
+        for _ in range(3):
+            self.assertFalse(self.store.verify('a@example.com', wrong))
+        with self.assertRaises(OTPThrottled):
+            self.store.verify('a@example.com', code)
+        # Код сброшен: верный код больше не подходит
+        self.assertFalse(self.store.verify('a@example.com', code))
+        self.assertFalse(self.store.is_verified('a@example.com'))
+
+        self.clock.advance(60)
+        code = self.store.issue('a@example.com')
+        self.assertTrue(self.store.verify('a@example.com', code))
+
+    def test_resend_interval(self):
+        first = self.store.issue('a@example.com')
+        self.clock.advance(20)
+        with self.assertRaises(OTPThrottled) as throttled:
+            self.store.issue('a@example.com')
+        self.assertEqual(throttled.exception.wait, 40)
+        # Лимит — на каждый адрес отдельно
+        self.store.issue('b@example.com')
+
+        self.clock.advance(40)
+        second = self.store.issue('a@example.com')
+        if second != first:
+            self.assertFalse(self.store.verify('a@example.com', first))
+        self.assertTrue(self.store.verify('a@example.com', second))
+
+    def test_send_window(self):
+        for _ in range(3):
+            self.store.issue('a@example.com')
+            self.clock.advance(60)
+        with self.assertRaises(OTPThrottled) as throttled:
+            self.store.issue('a@example.com')
+        self.assertEqual(throttled.exception.wait, 3600)
+
+        self.clock.advance(3600)
+        code = self.store.issue('a@example.com')
+        self.assertTrue(self.store.verify('a@example.com', code))
+
+
+class CacheOTPStoreTests(OTPStoreTests, TestCase):
+    store_class = CacheOTPStore
+
+
+class DatabaseOTPStoreTests(OTPStoreTests, TestCase):
+    store_class = DatabaseOTPStore
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='seller@example.com', username='seller', password='x')
+        self.factory = RequestFactory()
+
+    def authenticate(self, access):
+        request = self.factory.get('/', headers={'Authorization': f'Bearer {access}'})
+        user, _ = StatelessJWTAuthentication().authenticate(request)
+        return user
+
+    def test_claims_authenticate_without_queries(self):
+        profile = SellerProfile.objects.create(user=self.user, shop_name='Shop')
+        access = str(UserRefreshToken.for_user(self.user).access_token)
+        with self.assertNumQueries(0):
+            user = self.authenticate(access)
+            seller = SellerContext(user)
+            self.assertIsInstance(user, StatelessUser)
+            self.assertEqual((user.id, user.email, user.is_seller), (self.user.id, 'seller@example.com', True))
+            self.assertEqual((seller.user_id, seller.profile_id), (self.user.id, profile.id))
+
+    def test_token_without_is_seller_falls_back_to_database(self):
+        access = str(RefreshToken.for_user(self.user).access_token)
+        with self.assertNumQueries(1):
+            user = self.authenticate(access)
+        self.assertIsInstance(user, CustomUser)
+        self.assertEqual(user.id, self.user.id)
+        SellerProfile.objects.create(user=self.user, shop_name='Shop')
+        self.assertTrue(self.authenticate(access).is_seller)
+
+    def test_refresh_picks_up_seller_status(self):
+        refresh = str(UserRefreshToken.for_user(self.user))
+        self.assertFalse(self.authenticate(UserRefreshToken(refresh).access_token).is_seller)
+
+        profile = SellerProfile.objects.create(user=self.user, shop_name='Shop')
+        with self.assertNumQueries(1):
+            access = UserRefreshToken(refresh).fresh_access_token()
+        user = self.authenticate(access)
+        self.assertEqual((user.is_seller, user.seller_profile_id), (True, profile.id))
+
+    def test_deactivated_user_keeps_access_until_expiry(self):
+        refresh = UserRefreshToken.for_user(self.user)
+        access = str(refresh.access_token)
+        CustomUser.objects.filter(id=self.user.id).update(is_active=False)
+        self.assertEqual(self.authenticate(access).id, self.user.id)
+        with self.assertRaises(TokenError):
+            UserRefreshToken(str(refresh)).fresh_access_token()
@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+User = get_user_model()
+
+
+def set_user_claims(token, email, seller_profile_id):
+    """Данные пользователя в токене: по ним StatelessUser работает без БД"""
+    token['email'] = email
+    token['is_seller'] = seller_profile_id is not None
+    token['seller_profile_id'] = seller_profile_id
+
+
+class UserRefreshToken(RefreshToken):
+    """Refresh-токен с claims is_seller/seller_profile_id (копируются в access)"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        set_user_claims(token, user.email, user.seller_profile_id)
+        return token
+
+    def fresh_access_token(self):
+        """
+        Access-токен с актуальными claims: продавцом могли стать после
+        входа, поэтому при обновлении данные перечитываются одним запросом.
+        """
+        user_data = User.objects.filter(
+            id=self[api_settings.USER_ID_CLAIM],
+            is_active=True,
+        ).values('email', 'seller_profile__id').first()
+        if user_data is None:
+            raise TokenError('User not found')
+
+        access = self.access_token
+        set_user_claims(access, user_data['email'], user_data['seller_profile__id'])
+        return access
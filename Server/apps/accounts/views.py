@@ -2,8 +2,9 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
 from .serializers import Stage1Serializer, Stage2Serializer, Stage3Serializer, Stage4Serializer
+from .tokens import UserRefreshToken
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -34,7 +35,7 @@ class Stage3View(APIView):
         serializer = Stage3Serializer(data=request.data, context={'session': request.session})
         if serializer.is_valid():
             user = serializer.create_user()
-            refresh = RefreshToken.for_user(user)
+            refresh = UserRefreshToken.for_user(user)
             return Response({
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
@@ -66,15 +67,17 @@ class LoginView(APIView):
         if not email_or_phone or not password:
             return Response({'error': 'Email/Phone and password are required'}, status=status.HTTP_400_BAD_REQUEST)
         try:
+            # seller_profile нужен для claims токена — берем тем же запросом
+            users = User.objects.select_related('seller_profile')
             if '@' in email_or_phone:
-                user = User.objects.get(email=email_or_phone)
+                user = users.get(email=email_or_phone)
             else:
-                user = User.objects.get(phone=email_or_phone)
+                user = users.get(phone=email_or_phone)
         except User.DoesNotExist:
             return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
         if not user.check_password(password):
             return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
-        refresh = RefreshToken.for_user(user)
+        refresh = UserRefreshToken.for_user(user)
         return Response({
             'refresh': str(refresh),
             'access': str(refresh.access_token),
@@ -90,10 +93,10 @@ class RefreshTokenView(APIView):
         if not refresh_token:
             return Response({'error': 'Refresh token is required'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            refresh = RefreshToken(refresh_token)
+            refresh = UserRefreshToken(refresh_token)
             data = {
-                'access': str(refresh.access_token),
+                'access': str(refresh.fresh_access_token()),
             }
             return Response(data, status=status.HTTP_200_OK)
-        except Exception as e:
+        except TokenError:
             return Response({'error': 'Invalid refresh token'}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
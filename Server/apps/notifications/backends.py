@@ -0,0 +1,76 @@
+"""
+Бэкенды отправки SMS. Интерфейс повторяет django.core.mail:
+open()/close() для переиспользования соединения и send_messages().
+"""
+import sys
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+
+class BaseSmsBackend:
+    def __init__(self, **kwargs):
+        pass
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        """messages — список OutboundMessage; вернуть число отправленных"""
+        raise NotImplementedError
+
+
+class ConsoleSmsBackend(BaseSmsBackend):
+    """Печатает SMS в stdout (для разработки)"""
+
+    def __init__(self, stream=None, **kwargs):
+        super().__init__(**kwargs)
+        self.stream = stream or sys.stdout
+        self._lock = threading.RLock()
+
+    def send_messages(self, messages):
+        with self._lock:
+            for message in messages:
+                self.stream.write(f'SMS to {message.recipient}: {message.body}\n')
+            self.stream.flush()
+        return len(messages)
+
+
+class FileSmsBackend(BaseSmsBackend):
+    """
+    Дописывает SMS в файл file_path (для тестов и локальной отладки);
+    по умолчанию — settings.SMS_FILE_PATH
+    """
+
+    def __init__(self, file_path=None, **kwargs):
+        super().__init__(**kwargs)
+        file_path = file_path or getattr(settings, 'SMS_FILE_PATH', None)
+        if not file_path:
+            raise ImproperlyConfigured('FileSmsBackend: укажите file_path в SMS_BACKEND_OPTIONS или SMS_FILE_PATH')
+        self.file_path = Path(file_path)
+        self._lock = threading.RLock()
+
+    def send_messages(self, messages):
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, self.file_path.open('a', encoding='utf-8') as f:
+            for message in messages:
+                f.write(f'{timezone.now().isoformat()}\t{message.recipient}\t{message.body}\n')
+        return len(messages)
+
+
+# Отправленные LocMemSmsBackend сообщения, аналог django.core.mail.outbox
+outbox = []
+
+
+class LocMemSmsBackend(BaseSmsBackend):
+    """Складывает SMS в backends.outbox (для тестов)"""
+
+    def send_messages(self, messages):
+        outbox.extend(messages)
+        return len(messages)
@@ -0,0 +1,139 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboundMessage
+from .services import outbox_settings
+
+logger = logging.getLogger(__name__)
+
+
+def get_sms_backend(options=None):
+    options = options or outbox_settings()
+    return import_string(options['SMS_BACKEND'])(**options['SMS_BACKEND_OPTIONS'])
+
+
+class OutboxDispatcher:
+    """
+    Забирает пачки OutboundMessage и отправляет их через одно
+    открытое SMTP-соединение (и один SMS-бэкенд) на весь цикл работы.
+    """
+
+    def __init__(self, options=None):
+        self.options = options or outbox_settings()
+        self._email_connection = None
+        self._sms_backend = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def email_connection(self):
+        if self._email_connection is None:
+            self._email_connection = get_connection(fail_silently=False)
+            self._email_connection.open()
+        return self._email_connection
+
+    @property
+    def sms_backend(self):
+        if self._sms_backend is None:
+            self._sms_backend = get_sms_backend(self.options)
+            self._sms_backend.open()
+        return self._sms_backend
+
+    def close(self):
+        for backend in (self._email_connection, self._sms_backend):
+            if backend is not None:
+                try:
+                    backend.close()
+                except Exception:
+                    logger.exception('Ошибка при закрытии соединения')
+        self._email_connection = None
+        self._sms_backend = None
+
+    def claim_batch(self):
+        now = timezone.now()
+        stale = now - timedelta(seconds=self.options['CLAIM_TIMEOUT'])
+        with transaction.atomic():
+            ids = list(
+                OutboundMessage.objects
+                .select_for_update(skip_locked=True)
+                .filter(
+                    Q(status=OutboundMessage.Status.PENDING, next_attempt_at__lte=now) |
+                    Q(status=OutboundMessage.Status.SENDING, claimed_at__lt=stale)
+                )
+                .order_by('next_attempt_at')
+                .values_list('id', flat=True)[:self.options['BATCH_SIZE']]
+            )
+            if not ids:
+                return []
+            OutboundMessage.objects.filter(id__in=ids).update(
+                status=OutboundMessage.Status.SENDING,
+                claimed_at=now,
+            )
+        return list(OutboundMessage.objects.filter(id__in=ids))
+
+    def _send_one(self, message):
+        if message.channel == OutboundMessage.Channel.EMAIL:
+            email = EmailMessage(
+                message.subject,
+                message.body,
+                settings.DEFAULT_FROM_EMAIL,
+                [message.recipient],
+                connection=self.email_connection,
+            )
+            self.email_connection.send_messages([email])
+        else:
+            self.sms_backend.send_messages([message])
+
+    def _retry_delay(self, attempts):
+        delay = self.options['RETRY_BASE_DELAY'] * 2 ** (attempts - 1)
+        return timedelta(seconds=min(delay, self.options['RETRY_MAX_DELAY']))
+
+    def dispatch_batch(self):
+        """Отправить одну пачку; вернуть число обработанных сообщений"""
+        messages = self.claim_batch()
+        sent, failed = [], []
+        for message in messages:
+            message.attempts += 1
+            try:
+                self._send_one(message)
+            except Exception as exc:
+                logger.warning('Не удалось отправить сообщение %s: %s', message.id, exc)
+                message.last_error = str(exc)
+                failed.append(message)
+                # Соединение могло оборваться — следующая отправка откроет новое
+                self.close()
+            else:
+                sent.append(message)
+
+        now = timezone.now()
+        for message in sent:
+            message.status = OutboundMessage.Status.SENT
+            message.sent_at = now
+        for message in failed:
+            if message.attempts >= self.options['MAX_ATTEMPTS']:
+                message.status = OutboundMessage.Status.FAILED
+            else:
+                message.status = OutboundMessage.Status.PENDING
+                message.next_attempt_at = now + self._retry_delay(message.attempts)
+        OutboundMessage.objects.bulk_update(
+            messages,
+            ['status', 'attempts', 'sent_at', 'next_attempt_at', 'last_error'],
+        )
+        return len(messages)
+
+    def run_until_empty(self):
+        total = 0
+        while processed := self.dispatch_batch():
+            total += processed
+        return total
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.notifications.dispatcher import OutboxDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Отправляет исходящие email/SMS из очереди OutboundMessage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Обработать очередь один раз и выйти')
+        parser.add_argument('--interval', type=float, default=2.0, help='Пауза при пустой очереди, сек')
+
+    def handle(self, *args, once=False, interval=2.0, **options):
+        with OutboxDispatcher() as dispatcher:
+            while True:
+                close_old_connections()
+                processed = dispatcher.run_until_empty()
+                if processed:
+                    self.stdout.write(f'Обработано сообщений: {processed}')
+                if once:
+                    break
+                time.sleep(interval)
@@ -0,0 +1,67 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .models import OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BASE_DELAY': 30,        # сек, удваивается с каждой попыткой
+    'RETRY_MAX_DELAY': 3600,
+    'CLAIM_TIMEOUT': 300,          # через сколько сек зависшее SENDING снова в очереди
+    'EAGER_DISPATCH': True,        # отправлять в фоновом потоке сразу после commit
+    'SMS_BACKEND': 'apps.notifications.backends.ConsoleSmsBackend',
+    'SMS_BACKEND_OPTIONS': {},
+}
+
+
+def outbox_settings():
+    return {**DEFAULTS, **getattr(settings, 'OUTBOX', {})}
+
+
+# Один поток: параллельные вызовы встают в очередь, а не плодят соединения
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='outbox')
+
+
+def _dispatch_in_background():
+    from .dispatcher import OutboxDispatcher
+
+    try:
+        with OutboxDispatcher() as dispatcher:
+            dispatcher.run_until_empty()
+    except Exception:
+        logger.exception('Ошибка фоновой отправки сообщений')
+    finally:
+        connections.close_all()
+
+
+def _schedule_dispatch():
+    if outbox_settings()['EAGER_DISPATCH']:
+        transaction.on_commit(lambda: _executor.submit(_dispatch_in_background))
+
+
+def enqueue_email(recipient, subject, body):
+    message = OutboundMessage.objects.create(
+        channel=OutboundMessage.Channel.EMAIL,
+        recipient=recipient,
+        subject=subject,
+        body=body,
+    )
+    _schedule_dispatch()
+    return message
+
+
+def enqueue_sms(recipient, body):
+    message = OutboundMessage.objects.create(
+        channel=OutboundMessage.Channel.SMS,
+        recipient=recipient,
+        body=body,
+    )
+    _schedule_dispatch()
+    return message
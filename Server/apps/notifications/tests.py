@@ -0,0 +1,110 @@
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from common.checks import sms_backend_check
+
+from . import backends
+from .backends import BaseSmsBackend, FileSmsBackend
+from .dispatcher import OutboxDispatcher
+from .models import OutboundMessage
+from .services import outbox_settings
+
+Status = OutboundMessage.Status
+
+
+class FailingSmsBackend(BaseSmsBackend):
+    def send_messages(self, messages):
+        raise ConnectionError('SMS-шлюз недоступен')
+
+
+def dispatcher(backend='apps.notifications.backends.LocMemSmsBackend', **options):
+    return OutboxDispatcher({**outbox_settings(), 'SMS_BACKEND': backend, 'SMS_BACKEND_OPTIONS': {}, **options})
+
+
+class OutboxDispatcherTests(TestCase):
+    def setUp(self):
+        backends.outbox.clear()
+
+    def sms(self, **kwargs):
+        return OutboundMessage.objects.create(channel=OutboundMessage.Channel.SMS, recipient='+998900000000',
+                                              body='Код: 123456', **kwargs)
+
+    def test_claim_takes_due_and_stale_messages_once(self):
+        now = timezone.now()
+        due = self.sms()
+        self.sms(next_attempt_at=now + timedelta(minutes=1))
+        stale = self.sms(status=Status.SENDING, claimed_at=now - timedelta(seconds=301))
+        self.sms(status=Status.SENDING, claimed_at=now)
+
+        claimed = dispatcher().claim_batch()
+        self.assertEqual({message.id for message in claimed}, {due.id, stale.id})
+        self.assertTrue(all(message.status == Status.SENDING for message in claimed))
+        # Забранные сообщения не достаются второму воркеру
+        self.assertEqual(dispatcher().claim_batch(), [])
+
+    def test_sent_messages(self):
+        message = self.sms()
+        self.assertEqual(dispatcher().run_until_empty(), 1)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (Status.SENT, 1))
+        self.assertIsNotNone(message.sent_at)
+        self.assertEqual(backends.outbox, [message])
+
+    def test_failed_message_is_retried_with_backoff_then_given_up(self):
+        message = self.sms()
+        failing = dispatcher('apps.notifications.tests.FailingSmsBackend', RETRY_BASE_DELAY=30,
+                             RETRY_MAX_DELAY=100, MAX_ATTEMPTS=4)
+        with self.assertLogs('apps.notifications.dispatcher', 'WARNING') as logs:
+            delays = []
+            for _ in range(3):
+                before = timezone.now()
+                self.assertEqual(failing.dispatch_batch(), 1)
+                message.refresh_from_db()
+                self.assertEqual(message.status, Status.PENDING)
+                self.assertEqual(message.last_error, 'SMS-шлюз недоступен')
+                delays.append(round((message.next_attempt_at - before).total_seconds()))
+                # Следующая попытка еще не наступила
+                self.assertEqual(failing.dispatch_batch(), 0)
+                OutboundMessage.objects.filter(id=message.id).update(next_attempt_at=timezone.now())
+            self.assertEqual(delays, [30, 60, 100])
+
+            failing.dispatch_batch()
+            message.refresh_from_db()
+            self.assertEqual((message.status, message.attempts), (Status.FAILED, 4))
+        self.assertEqual(len(logs.records), 4)
+        self.assertEqual(failing.dispatch_batch(), 0)
+
+
+class FileSmsBackendTests(TestCase):
+    def test_file_path(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'sms' / 'sent.log'
+            message = OutboundMessage(recipient='+998900000000', body='Код: 123456')
+            self.assertEqual(FileSmsBackend(file_path=path).send_messages([message]), 1)
+            self.assertIn('+998900000000\tКод: 123456', path.read_text(encoding='utf-8'))
+
+            with override_settings(SMS_FILE_PATH=path):
+                FileSmsBackend().send_messages([message])
+            self.assertEqual(len(path.read_text(encoding='utf-8').splitlines()), 2)
+
+    def test_missing_file_path(self):
+        with self.assertRaises(ImproperlyConfigured):
+            FileSmsBackend()
+
+
+class SmsBackendCheckTests(TestCase):
+    def outbox(self, backend):
+        return override_settings(OUTBOX={**outbox_settings(), 'SMS_BACKEND': backend})
+
+    def test_console_backend_is_rejected_outside_debug(self):
+        with self.outbox('apps.notifications.backends.ConsoleSmsBackend'):
+            self.assertEqual([error.id for error in sms_backend_check(None)], ['common.E002'])
+            with override_settings(DEBUG=True):
+                self.assertEqual(sms_backend_check(None), [])
+        with self.outbox('apps.notifications.backends.FileSmsBackend'):
+            self.assertEqual(sms_backend_check(None), [])
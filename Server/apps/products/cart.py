@@ -0,0 +1,249 @@
+"""
+Корзина покупателя.
+
+Позиции хранятся в БД (Cart/CartItem) — это источник истины. Кэш только
+ускоряет чтение: в нем уже проверенное состояние корзины (цены и наличие
+всех позиций проверяются одним запросом к товарам при каждом изменении).
+Чтение идет из кэша; при промахе или если проверка старше CART['MAX_AGE'] —
+из БД одним запросом с JOIN на товары. Для нескольких воркеров кэш должен
+быть общим (CACHES), иначе GET может показать устаревшую корзину.
+
+Оформление заказа читает позиции из БД внутри транзакции: остатки
+списываются одним UPDATE по всем товарам, а условие на цену и is_active
+и CHECK quantity >= 0 не дают продать больше, чем есть, снятый с продажи
+товар или товар по цене, которую покупатель не видел.
+"""
+import time
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+
+from .conditional import touch
+from .models import Cart, CartItem, Order, OrderItem, Product
+
+DEFAULTS = {
+    'CACHE_TTL': 24 * 3600,
+    # Через сколько секунд проверка в кэше устаревает (цены и остатки меняются)
+    'MAX_AGE': 15 * 60,
+    'MAX_ITEMS': 100,
+}
+
+UNAVAILABLE = 'Товар недоступен'
+OUT_OF_STOCK = 'Недостаточно товара на складе'
+
+
+class CartError(ValueError):
+    pass
+
+
+class CartChanged(CartError):
+    """Цены, остатки или позиции изменились после проверки — корзина перепроверена"""
+
+    def __init__(self, message, cart):
+        super().__init__(message)
+        self.cart = cart
+
+
+def cart_settings():
+    return {**DEFAULTS, **getattr(settings, 'CART', {})}
+
+
+def _cache_key(user_id):
+    return f'cart:{user_id}'
+
+
+def _build(quantities, products):
+    """
+    Состояние корзины из {product_id: quantity} и строк товаров
+    {id: {'title', 'price', 'quantity', 'is_active'}}
+    """
+    items = []
+    subtotal = Decimal('0.00')
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None or not product['is_active']:
+            error = UNAVAILABLE
+        elif product['quantity'] < quantity:
+            error = OUT_OF_STOCK
+        else:
+            error = None
+        price = product['price'] if product else None
+        total_cost = price * quantity if price is not None else None
+        if error is None:
+            subtotal += total_cost
+        items.append({
+            'product_id': product_id,
+            'title': product['title'] if product else None,
+            'quantity': quantity,
+            'price': price,
+            'total_cost': total_cost,
+            'available_quantity': product['quantity'] if product and product['is_active'] else 0,
+            'error': error,
+        })
+    return {
+        'items': items,
+        'subtotal': subtotal,
+        'is_valid': bool(items) and all(item['error'] is None for item in items),
+        'validated_at': time.time(),
+    }
+
+
+def _products(product_ids):
+    """Цены и остатки всех позиций — один запрос"""
+    return {
+        row['id']: row
+        for row in Product.objects.filter(id__in=product_ids).values('id', 'title', 'price', 'quantity', 'is_active')
+    }
+
+
+def _store(user_id, state):
+    cache.set(_cache_key(user_id), state, cart_settings()['CACHE_TTL'])
+    return state
+
+
+def _load(user_id):
+    """Промах кэша: позиции и данные товаров одним запросом"""
+    quantities, products = {}, {}
+    rows = CartItem.objects.filter(cart__user_id=user_id).values(
+        'product_id', 'quantity', 'product__title', 'product__price', 'product__quantity', 'product__is_active',
+    )
+    for row in rows:
+        quantities[row['product_id']] = row['quantity']
+        products[row['product_id']] = {
+            'id': row['product_id'], 'title': row['product__title'], 'price': row['product__price'],
+            'quantity': row['product__quantity'], 'is_active': row['product__is_active'],
+        }
+    return _build(quantities, products)
+
+
+def get_cart(user_id):
+    state = cache.get(_cache_key(user_id))
+    if state is None or time.time() - state['validated_at'] > cart_settings()['MAX_AGE']:
+        state = refresh_cart(user_id)
+    return state
+
+
+def refresh_cart(user_id):
+    """Перепроверить корзину по БД"""
+    return _store(user_id, _load(user_id))
+
+
+def update_cart(user_id, changes):
+    """
+    Изменить количества {product_id: quantity}; 0 — удалить позицию.
+    Позиции корзины и проверка всех товаров — по одному запросу
+    """
+    # Позиции из БД, а не из кэша: кэш другого воркера может не знать о последних изменениях
+    quantities = dict(CartItem.objects.filter(cart__user_id=user_id).values_list('product_id', 'quantity'))
+    for product_id, quantity in changes.items():
+        if quantity:
+            quantities[product_id] = quantity
+        else:
+            quantities.pop(product_id, None)
+    if len(quantities) > cart_settings()['MAX_ITEMS']:
+        raise CartError(f'В корзине может быть не больше {cart_settings()["MAX_ITEMS"]} товаров')
+
+    products = _products(quantities)
+    added = [product_id for product_id, quantity in changes.items() if quantity]
+    missing = [
+        product_id for product_id in added
+        if product_id not in products or not products[product_id]['is_active']
+    ]
+    if missing:
+        raise CartError(f'Товар не найден: {", ".join(map(str, missing))}')
+
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user_id=user_id)
+        removed = [product_id for product_id, quantity in changes.items() if not quantity]
+        if removed:
+            CartItem.objects.filter(cart=cart, product_id__in=removed).delete()
+        if added:
+            CartItem.objects.bulk_create(
+                [CartItem(cart=cart, product_id=product_id, quantity=changes[product_id]) for product_id in added],
+                update_conflicts=True, unique_fields=['cart', 'product'], update_fields=['quantity', 'updated_at'],
+            )
+    return _store(user_id, _build(quantities, products))
+
+
+def clear_cart(user_id):
+    CartItem.objects.filter(cart__user_id=user_id).delete()
+    cache.delete(_cache_key(user_id))
+
+
+class _Conflict(Exception):
+    pass
+
+
+def checkout(user_id, shipping_address, shipping_phone, shipping_cost=Decimal('0.00')):
+    """
+    Оформить заказ из корзины. Если товар сняли с продажи, остатка не
+    хватило, цена изменилась с последней проверки или корзину уже оформили
+    параллельно, заказ не создается, а корзина перепроверяется (CartChanged)
+    """
+    try:
+        with transaction.atomic():
+            return _place_order(user_id, shipping_address, shipping_phone, shipping_cost)
+    except _Conflict as exc:
+        # Транзакция уже откатилась: перепроверяем по текущим данным
+        raise CartChanged(str(exc), refresh_cart(user_id))
+
+
+def _place_order(user_id, shipping_address, shipping_phone, shipping_cost):
+    # Проверка, которую видел покупатель (если она есть в кэше этого воркера)
+    seen = cache.get(_cache_key(user_id))
+    state = _load(user_id)
+    items = state['items']
+    if not items:
+        raise CartError('Корзина пуста')
+    if not state['is_valid']:
+        raise _Conflict('В корзине есть недоступные товары')
+    if seen is not None:
+        seen_prices = {item['product_id']: item['price'] for item in seen['items']}
+        if any(seen_prices.get(item['product_id'], item['price']) != item['price'] for item in items):
+            raise _Conflict('Цены в корзине изменились, проверьте заказ')
+
+    # Параллельное оформление той же корзины удалит позиции первым
+    deleted, _ = CartItem.objects.filter(cart__user_id=user_id).delete()
+    if deleted != len(items):
+        raise _Conflict('Корзина изменилась, проверьте заказ')
+
+    same_price = Q()
+    for item in items:
+        same_price |= Q(id=item['product_id'], price=item['price'])
+    try:
+        updated = Product.objects.filter(same_price, is_active=True).update(quantity=Case(
+            *[When(id=item['product_id'], then=F('quantity') - item['quantity']) for item in items],
+            default=F('quantity'),
+            output_field=PositiveIntegerField(),
+        ))
+    except IntegrityError:
+        # Остатка не хватило: CHECK quantity >= 0
+        updated = None
+    if updated != len(items):
+        raise _Conflict('Товары в корзине изменились, проверьте заказ')
+
+    order = Order.objects.create(
+        buyer_id=user_id,
+        order_number=f"ORD-{uuid.uuid4().hex[:12].upper()}",
+        shipping_address=shipping_address,
+        shipping_phone=shipping_phone,
+        shipping_cost=shipping_cost,
+        subtotal=state['subtotal'],
+        total_price=state['subtotal'] + shipping_cost,
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product_id=item['product_id'], quantity=item['quantity'], price=item['price'])
+        for item in items
+    ])
+
+    def after_commit():
+        cache.delete(_cache_key(user_id))
+        # UPDATE не отправляет сигналы: остатки видны в списках и карточках товаров
+        touch('products', *[f'product:{item["product_id"]}' for item in items])
+
+    transaction.on_commit(after_commit)
+    return order
@@ -0,0 +1,169 @@
+"""
+Условные GET-запросы (ETag / Last-Modified) для каталога.
+
+Валидаторы строятся из версий в кэше — времени последнего изменения
+группы данных, которое обновляют сигналы (signals.py):
+
+- products      — любой товар, его изображения, категории (для списка товаров)
+- product:<id>  — товар, его изображения и отзывы (для карточки товара)
+- categories    — дерево категорий
+- users         — email пользователей, который показывается в карточке товара
+
+Сигналы срабатывают и на save(update_fields=[...]), который не обновляет
+updated_at (например, списание остатков при заказе), поэтому версии
+точнее, чем max(updated_at). При ответе 304 сериализатор не вызывается.
+Версии хранятся в кэше по умолчанию, и он должен быть общим для воркеров
+(CACHES, common/checks.py): иначе воркер, не видевший изменения, отвечает
+304 на устаревшие данные.
+
+single_flight() кэширует сам ответ под теми же валидаторами: изменение
+версии сигналом делает запись устаревшей. Пересчитывает ее один воркер,
+остальные в это время получают устаревшую копию (stale-while-revalidate)
+или, если записи нет, недолго ждут результат. Блокировка — cache.add,
+атомарный для всех процессов только в общем кэше, поэтому с LocMem кэш
+ответов по умолчанию выключен вне DEBUG (CATALOG_RESPONSE_CACHE).
+
+Один URL отдается разными рендерерами (JSON, Browsable API), поэтому ETag
+включает согласованный media type, а ответ помечается Vary: Accept.
+Версии и кэш ответов (данные до рендера) от рендерера не зависят.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+VERSION_TIMEOUT = None
+
+RESPONSE_CACHE_DEFAULTS = {
+    'ENABLED': True,
+    'TTL': 3600,
+    # Сколько держится блокировка пересчета, если воркер упал
+    'LOCK_TIMEOUT': 10,
+    # Сколько ждать чужой пересчет, если записи в кэше нет
+    'WAIT': 2.0,
+    'POLL_INTERVAL': 0.02,
+}
+
+
+def response_cache_settings():
+    return {**RESPONSE_CACHE_DEFAULTS, **getattr(settings, 'CATALOG_RESPONSE_CACHE', {})}
+
+
+def _version_key(name):
+    return f'catalog:version:{name}'
+
+
+def touch(*names):
+    """Отметить изменение групп данных"""
+    now = time.time()
+    cache.set_many({_version_key(name): now for name in names}, VERSION_TIMEOUT)
+
+
+def versions(*names):
+    """
+    Время последнего изменения групп. Отсутствующая в кэше версия
+    (после очистки кэша) считается изменившейся сейчас
+    """
+    keys = [_version_key(name) for name in names]
+    found = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, VERSION_TIMEOUT)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def validators(*parts, timestamps):
+    """(etag, last_modified) для частей ключа и времен изменения"""
+    raw = '|'.join(str(part) for part in (*parts, *timestamps))
+    etag = hashlib.md5(raw.encode()).hexdigest()
+    last_modified = datetime.fromtimestamp(max(timestamps), tz=timezone.utc)
+    return etag, last_modified
+
+
+def representation_etag(request, etag):
+    """ETag ответа: версия данных + media type, выбранный при согласовании"""
+    media_type = getattr(request, 'accepted_media_type', '')
+    return hashlib.md5(f'{etag}|{media_type}'.encode()).hexdigest()
+
+
+def conditional_get(compute):
+    """
+    Декоратор get() у APIView: compute(request, *args, **kwargs) возвращает
+    (etag, last_modified) или None (валидаторов нет — обычный ответ).
+    Совпадение с If-None-Match / If-Modified-Since дает 304 без вызова view.
+    ETag считается для согласованного рендерера (representation_etag)
+    """
+    def cached(request, *args, **kwargs):
+        if not hasattr(request, '_catalog_validators'):
+            request._catalog_validators = compute(request, *args, **kwargs)
+        return request._catalog_validators
+
+    def etag_func(request, *args, **kwargs):
+        result = cached(request, *args, **kwargs)
+        return result and representation_etag(request, result[0])
+
+    def last_modified_func(request, *args, **kwargs):
+        result = cached(request, *args, **kwargs)
+        return result and result[1]
+
+    conditioned = condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+    def decorator(view):
+        view = conditioned(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            # И для 304: кэши не должны отдавать JSON вместо HTML и наоборот
+            patch_vary_headers(response, ['Accept'])
+            return response
+
+        return wrapper
+
+    return method_decorator(decorator)
+
+
+def request_validators(request):
+    """(etag, last_modified), вычисленные conditional_get для запроса, или None"""
+    return getattr(request, '_catalog_validators', None)
+
+
+def single_flight(key, version, compute):
+    """
+    compute() из кэша по ключу key для версии version (валидаторы ответа).
+    Возвращает (значение, версия): при отдаче устаревшей копии версия —
+    ее собственная, чтобы ETag соответствовал содержимому
+    """
+    options = response_cache_settings()
+    if not options['ENABLED']:
+        return compute(), version
+    entry = cache.get(key)
+    if entry is not None and entry['version'] == version:
+        return entry['value'], version
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, True, options['LOCK_TIMEOUT']):
+        try:
+            value = compute()
+            cache.set(key, {'version': version, 'value': value}, options['TTL'])
+            return value, version
+        finally:
+            cache.delete(lock_key)
+
+    # Пересчитывает другой воркер
+    if entry is not None:
+        return entry['value'], entry['version']
+    deadline = time.monotonic() + options['WAIT']
+    while time.monotonic() < deadline:
+        time.sleep(options['POLL_INTERVAL'])
+        entry = cache.get(key)
+        if entry is not None and entry['version'] == version:
+            return entry['value'], version
+    return compute(), version
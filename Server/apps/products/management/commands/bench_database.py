@@ -0,0 +1,150 @@
+import random
+import tempfile
+import threading
+import time
+import uuid
+from decimal import Decimal
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections, transaction
+from django.db.models import F
+
+from apps.accounts.models import CustomUser, SellerProfile
+from apps.products.models import Category, Order, OrderItem, Product
+from apps.products.slugs import bulk_create_with_slugs
+from common.benchmark import Benchmark, format_summary, write_results
+from core.settings.database import database_from_env, postgres_database, sqlite_database
+
+ALIAS = 'bench'
+PROFILES = ['sqlite-rollback', 'sqlite-wal', 'postgresql', 'postgresql-pool']
+
+
+class Command(BaseCommand):
+    help = (
+        'Бенчмарк профилей БД: конкурентные чтения каталога и создание заказов '
+        'на SQLite (rollback journal / WAL) и PostgreSQL (постоянные соединения / пул)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default='sqlite-rollback,sqlite-wal',
+                            help=f'Профили через запятую: {", ".join(PROFILES)}. '
+                                 f'PostgreSQL берет параметры подключения из DB_*')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('-n', '--iterations', type=int, default=200, help='Операций на поток')
+        parser.add_argument('--write-ratio', type=float, default=0.1, help='Доля операций записи')
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON')
+
+    def handle(self, *args, profiles, threads, iterations, write_ratio, products, json_path, **options):
+        profiles = [p.strip() for p in profiles.split(',') if p.strip()]
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            raise CommandError(f'Неизвестные профили: {", ".join(sorted(unknown))}')
+
+        results = []
+        for profile in profiles:
+            with tempfile.TemporaryDirectory() as tmp:
+                reads, writes, errors = self._run_profile(
+                    profile, self._profile_settings(profile, Path(tmp)), threads, iterations, write_ratio, products,
+                )
+            for bench in (reads, writes):
+                summary = {**bench.summary(), 'profile': profile, 'errors': errors}
+                results.append(summary)
+                self.stdout.write(format_summary(summary) + f'  errors={errors}')
+
+        if json_path:
+            write_results(json_path, results, benchmark='database', threads=threads,
+                          iterations=iterations, write_ratio=write_ratio)
+
+    def _profile_settings(self, profile, tmp):
+        if profile.startswith('sqlite'):
+            name = str(tmp / 'bench.sqlite3')
+            database = sqlite_database(name, wal=profile == 'sqlite-wal')
+            database['TEST'] = {'NAME': name}
+            return database
+        database = database_from_env('postgresql', '')
+        if database['ENGINE'] != 'django.db.backends.postgresql':
+            raise CommandError('Для профилей PostgreSQL задайте DB_ENGINE=postgresql и DB_*')
+        return postgres_database(
+            database['NAME'], database['USER'], database['PASSWORD'], database['HOST'],
+            port=database['PORT'], pool=profile == 'postgresql-pool',
+        )
+
+    def _run_profile(self, profile, database, threads, iterations, write_ratio, products):
+        connections.settings[ALIAS] = connections.configure_settings(
+            {'default': connections.settings['default'], ALIAS: database}
+        )[ALIAS]
+        creation = connections[ALIAS].creation
+        old_name = creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            product_ids = self._seed(products)
+            reads, writes = Benchmark(f'{profile}:catalog_read'), Benchmark(f'{profile}:order_write')
+            errors = []
+            lock = threading.Lock()
+            workers = [
+                threading.Thread(
+                    target=self._worker,
+                    args=(random.Random(i), product_ids, iterations, write_ratio, reads, writes, errors, lock),
+                )
+                for i in range(threads)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            return reads, writes, len(errors)
+        finally:
+            connections[ALIAS].close()
+            creation.destroy_test_db(old_name, verbosity=0)
+            del connections[ALIAS]
+            del connections.settings[ALIAS]
+
+    def _seed(self, count):
+        user = CustomUser.objects.db_manager(ALIAS).create_user(
+            email='bench-seller@example.com', username='bench-seller', password='x',
+        )
+        seller = SellerProfile.objects.using(ALIAS).create(user=user, shop_name='Bench')
+        category = Category.objects.using(ALIAS).create(name='Bench')
+        bulk_create_with_slugs([
+            Product(seller=seller, category=category, title=f'Товар {i}',
+                    description='', price=Decimal('100.00'), quantity=1_000_000)
+            for i in range(count)
+        ], 'title', using=ALIAS)
+        return list(Product.objects.using(ALIAS).values_list('id', flat=True))
+
+    def _worker(self, rng, product_ids, iterations, write_ratio, reads, writes, errors, lock):
+        connection = connections[ALIAS]
+        try:
+            for _ in range(iterations):
+                is_write = rng.random() < write_ratio
+                start = time.perf_counter()
+                try:
+                    if is_write:
+                        self._create_order(rng.sample(product_ids, 3))
+                    else:
+                        list(Product.objects.using(ALIAS).filter(is_active=True)
+                             .select_related('category').order_by('-created_at')[:20])
+                except DatabaseError as exc:
+                    with lock:
+                        errors.append(exc)
+                    continue
+                finally:
+                    # Конец "запроса": соединение закрывается или остается по CONN_MAX_AGE
+                    connection.close_if_unusable_or_obsolete()
+                with lock:
+                    (writes if is_write else reads).add(time.perf_counter() - start)
+        finally:
+            connection.close()
+
+    def _create_order(self, product_ids):
+        with transaction.atomic(using=ALIAS):
+            order = Order.objects.using(ALIAS).create(
+                order_number=uuid.uuid4().hex[:20], shipping_address='Bench',
+                shipping_phone='+998900000000', shipping_cost=Decimal('0.00'),
+            )
+            OrderItem.objects.using(ALIAS).bulk_create([
+                OrderItem(order=order, product_id=product_id, quantity=1, price=Decimal('100.00'))
+                for product_id in product_ids
+            ])
+            Product.objects.using(ALIAS).filter(id__in=product_ids).update(quantity=F('quantity') - 1)
@@ -0,0 +1,107 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from apps.accounts.models import CustomUser, SellerProfile
+from apps.products.models import Category, Order, OrderItem, Product, ProductReview
+from apps.products.slugs import bulk_create_with_slugs
+from apps.products.serializers import OrderSerializer, ProductDetailSerializer, ProductListSerializer
+from common.benchmark import Benchmark, format_summary, test_database, write_results
+from common.renderers import ORJSONParser, ORJSONRenderer
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк JSON: JSONRenderer/JSONParser против ORJSONRenderer/ORJSONParser на данных сериализаторов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--iterations', type=int, default=2000)
+        parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON')
+
+    def handle(self, *args, iterations=2000, json_path=None, **options):
+        with test_database():
+            payloads = self._payloads()
+
+        results = []
+        for name, data in payloads.items():
+            expected = JSONRenderer().render(data)
+            actual = ORJSONRenderer().render(data)
+            if actual != expected:
+                raise CommandError(f'{name}: вывод ORJSONRenderer отличается от JSONRenderer')
+
+            for renderer in (JSONRenderer(), ORJSONRenderer()):
+                bench = Benchmark(f'render:{name}:{type(renderer).__name__}')
+                for _ in range(iterations):
+                    with bench.measure(count_queries=False):
+                        renderer.render(data)
+                results.append(bench.summary())
+
+            for parser in (JSONParser(), ORJSONParser()):
+                bench = Benchmark(f'parse:{name}:{type(parser).__name__}')
+                for _ in range(iterations):
+                    stream = io.BytesIO(expected)
+                    with bench.measure(count_queries=False):
+                        parser.parse(stream, 'application/json', {})
+                results.append(bench.summary())
+
+        for summary in results:
+            self.stdout.write(format_summary(summary))
+        if json_path:
+            write_results(json_path, results, benchmark='json', iterations=iterations)
+
+    def _payloads(self):
+        user = CustomUser.objects.create_user(email='bench@example.com', username='bench', password='x')
+        seller = SellerProfile.objects.create(user=user, shop_name='Bench')
+        category = Category.objects.create(name='Электроника')
+        products = bulk_create_with_slugs([
+            Product(seller=seller, category=category, title=f'Товар №{i} — «описание»',
+                    description='Подробное описание товара ' * 20, price=Decimal('1299.90') + i,
+                    old_price=Decimal('1499.00') + i, quantity=100)
+            for i in range(50)
+        ], 'title')
+        reviewers = CustomUser.objects.bulk_create([
+            CustomUser(email=f'reviewer{i}@example.com', username=f'reviewer{i}', phone=f'+99890000{i:04d}')
+            for i in range(10)
+        ])
+        ProductReview.objects.bulk_create([
+            ProductReview(product=products[0], user=reviewer, rating=5, title='Отзыв',
+                          comment='Отличный товар', is_approved=True)
+            for reviewer in reviewers
+        ])
+        order = Order.objects.create(
+            buyer=user, order_number='BENCH-1', shipping_address='Ташкент',
+            shipping_phone='+998900000000', shipping_cost=Decimal('15000.00'),
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=2, price=product.price)
+            for product in products
+        ])
+
+        page = Product.objects.select_related('category', 'seller').order_by('id')[:20]
+        now = timezone.now()
+        return {
+            'product_page': {
+                'count': 50, 'next': 2, 'previous': None,
+                'results': ProductListSerializer(page, many=True, context={}).data,
+            },
+            'product_detail': ProductDetailSerializer(
+                Product.objects.select_related('category', 'seller__user').get(id=products[0].id)
+            ).data,
+            'order': OrderSerializer(Order.objects.prefetch_related('items__product').get(id=order.id)).data,
+            # Значения, которые кодирует сам рендерер, а не сериализатор
+            'native_types': [
+                {
+                    'price': Decimal('1299.90') + i,
+                    'created_at': now - timedelta(minutes=i),
+                    'date': now.date(),
+                    'status': gettext_lazy('В ожидании'),
+                    'ttl': timedelta(seconds=90),
+                }
+                for i in range(100)
+            ],
+        }
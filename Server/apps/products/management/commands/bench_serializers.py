@@ -0,0 +1,111 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from apps.accounts.models import CustomUser, SellerProfile
+from apps.products.models import Category, Order, OrderItem, Product, ProductImage, ProductReview
+from apps.products.serializers import (
+    OrderSerializer, OrderValues, ProductListSerializer, ProductListValues,
+    ProductReviewSerializer, ProductReviewValues, with_main_image,
+)
+from apps.products.slugs import bulk_create_with_slugs
+from common.benchmark import Benchmark, format_summary, test_database, write_results
+
+
+class Command(BaseCommand):
+    help = (
+        'Бенчмарк списков: ModelSerializer против ValuesSerializer (.values()) '
+        'для товаров, отзывов и заказов; перед замером проверяет, что JSON совпадает побайтно'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--iterations', type=int, default=300)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON')
+
+    def handle(self, *args, iterations, page_size, json_path, **options):
+        results = []
+        with test_database():
+            request = RequestFactory().get('/api/v1/products/products/')
+            context = {'request': request}
+            cases = self._cases(page_size)
+            for name, (serializer_class, values_class, queryset, fast_queryset) in cases.items():
+                def model_serializer():
+                    return serializer_class(queryset.all(), many=True, context=context).data
+
+                def values_serializer():
+                    serializer = values_class(context)
+                    return serializer.serialize(serializer.values(fast_queryset.all()))
+
+                expected = JSONRenderer().render(model_serializer())
+                if JSONRenderer().render(values_serializer()) != expected:
+                    raise CommandError(f'{name}: вывод {values_class.__name__} отличается от {serializer_class.__name__}')
+
+                for label, build in ((serializer_class.__name__, model_serializer),
+                                     (values_class.__name__, values_serializer)):
+                    bench = Benchmark(f'{name}:{label}')
+                    for _ in range(iterations):
+                        with bench.measure():
+                            build()
+                    summary = bench.summary()
+                    summary['rows_per_s'] = round(summary['throughput_per_s'] * page_size, 1)
+                    results.append(summary)
+                    self.stdout.write(format_summary(summary) + f"  rows/s={summary['rows_per_s']}")
+
+        if json_path:
+            write_results(json_path, results, benchmark='serializers', iterations=iterations, page_size=page_size)
+
+    def _cases(self, page_size):
+        users = CustomUser.objects.bulk_create([
+            CustomUser(email=f'bench{i}@example.com', username=f'bench{i}') for i in range(page_size)
+        ])
+        seller = SellerProfile.objects.create(user=users[0], shop_name='Bench')
+        category = Category.objects.create(name='Электроника')
+        products = bulk_create_with_slugs([
+            Product(
+                seller=seller, category=category if i % 5 else None, title=f'Товар №{i} — «описание»',
+                description='Описание', price=Decimal('1299.90') + i,
+                old_price=Decimal('1499.00') + i if i % 2 else None, quantity=100 + i,
+            )
+            for i in range(page_size)
+        ], 'title')
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=f'products/images/bench-{product.id}-{n}.jpg', is_main=n < 2,
+                         sort_order=n)
+            for product in products[::2] for n in range(3)
+        ])
+        ProductReview.objects.bulk_create([
+            ProductReview(product=products[0], user=user, rating=i % 5 + 1, title='Отзыв',
+                          comment='Отличный товар', is_approved=True)
+            for i, user in enumerate(users)
+        ])
+        orders = Order.objects.bulk_create([
+            Order(buyer=users[i] if i % 4 else None, order_number=f'BENCH-{i}', status=Order.Status.values[i % 5],
+                  shipping_address='Ташкент', shipping_phone='+998900000000', shipping_cost=Decimal('15000.00'),
+                  subtotal=Decimal('2599.80'), total_price=Decimal('17599.80'))
+            for i in range(page_size)
+        ])
+        OrderItem.objects.bulk_create([
+            # Позиция с удаленным товаром (product=None): product_title отсутствует в выводе
+            OrderItem(order=order, product=None if (i, n) == (1, 0) else products[(i + n) % page_size],
+                      quantity=n + 1, price=products[(i + n) % page_size].price)
+            for i, order in enumerate(orders) for n in range(3)
+        ])
+
+        product_page = Product.objects.filter(is_active=True).order_by('-created_at', 'id')[:page_size]
+        review_page = ProductReview.objects.filter(is_approved=True).order_by('-created_at', 'id')[:page_size]
+        order_page = Order.objects.order_by('-created_at', 'id')[:page_size]
+        # Запросы как во view до перехода на ValuesSerializer
+        return {
+            'products': (
+                ProductListSerializer, ProductListValues,
+                with_main_image(product_page.select_related('category', 'seller')), product_page,
+            ),
+            'reviews': (ProductReviewSerializer, ProductReviewValues, review_page, review_page),
+            'orders': (
+                OrderSerializer, OrderValues,
+                order_page.prefetch_related('items', 'items__product'), order_page,
+            ),
+        }
@@ -0,0 +1,226 @@
+import random
+import time
+from array import array
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.accounts.models import CustomUser, SellerProfile
+from apps.products.conditional import touch
+from apps.products.models import Category, Order, OrderItem, Product, ProductReview
+from apps.products.slugs import bulk_create_with_slugs
+
+# Объемы по умолчанию (--scale 1); для локальной проверки: --scale 0.001
+VOLUMES = {
+    'users': 200_000,
+    'sellers': 2_000,
+    'categories': 10_000,
+    'products': 1_000_000,
+    'reviews': 5_000_000,
+    'orders': 2_000_000,
+}
+
+SEED_PASSWORD = 'seed-password'
+
+WORDS = (
+    'смартфон', 'ноутбук', 'чайник', 'кроссовки', 'куртка', 'рюкзак', 'наушники', 'часы',
+    'лампа', 'кресло', 'стол', 'пылесос', 'планшет', 'монитор', 'клавиатура', 'термос',
+)
+ADJECTIVES = (
+    'новый', 'компактный', 'беспроводной', 'детский', 'кожаный', 'складной', 'умный',
+    'игровой', 'домашний', 'спортивный', 'легкий', 'прочный',
+)
+REVIEW_TITLES = ('Отлично', 'Хорошо', 'Нормально', 'Так себе', 'Не понравилось')
+
+
+class Command(BaseCommand):
+    help = 'Синтетические данные для нагрузочных тестов (bulk_create, воспроизводимо по --seed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help='Множитель объемов по умолчанию')
+        for name, volume in VOLUMES.items():
+            parser.add_argument(f'--{name}', type=int, help=f'Количество ({volume} при --scale 1)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='seed', help='Префикс username/email, чтобы не пересекаться с данными')
+
+    def handle(self, *args, scale=1.0, batch_size=5000, seed=42, prefix='seed', **options):
+        counts = {
+            name: options[name] if options.get(name) is not None else max(1, int(volume * scale))
+            for name, volume in VOLUMES.items()
+        }
+        counts['sellers'] = min(counts['sellers'], counts['users'])
+        if counts['reviews'] > counts['products'] * counts['users']:
+            raise CommandError('Отзывов больше, чем пар (товар, пользователь)')
+        if CustomUser.objects.filter(username=f'{prefix}_user0').exists():
+            raise CommandError(f'Данные с префиксом "{prefix}" уже есть, укажите другой --prefix')
+
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.prefix = prefix
+
+        start = time.perf_counter()
+        user_ids = self._users(counts['users'])
+        seller_ids = self._sellers(user_ids[:counts['sellers']])
+        category_ids = self._categories(counts['categories'])
+        product_ids, product_prices = self._products(counts['products'], seller_ids, category_ids)
+        self._reviews(counts['reviews'], product_ids, user_ids)
+        self._orders(counts['orders'], user_ids, product_ids, product_prices)
+        # bulk_create не отправляет сигналы: сбрасываем версии каталога вручную
+        touch('categories', 'products', 'users')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - start:.1f} с: '
+            + ', '.join(f'{name}={count}' for name, count in counts.items())
+            + f'. Пароль пользователей: {SEED_PASSWORD}'
+        ))
+
+    def _batches(self, total):
+        for offset in range(0, total, self.batch_size):
+            yield range(offset, min(offset + self.batch_size, total))
+
+    def _create(self, model, objects):
+        with transaction.atomic():
+            return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def _create_with_slugs(self, objects, source):
+        # slug из названий; занятые параллельно (другим импортом) подбираются заново
+        with transaction.atomic():
+            return bulk_create_with_slugs(objects, source, batch_size=self.batch_size)
+
+    def _progress(self, label, done, total):
+        self.stdout.write(f'{label}: {done}/{total}', ending='\r' if done < total else '\n')
+        self.stdout.flush()
+
+    def _users(self, total):
+        # Один хэш на всех: PBKDF2 на каждого пользователя занял бы часы
+        password = make_password(SEED_PASSWORD)
+        ids = array('q')
+        for batch in self._batches(total):
+            users = self._create(CustomUser, [
+                CustomUser(
+                    username=f'{self.prefix}_user{i}', email=f'{self.prefix}_user{i}@example.com',
+                    password=password, is_email_verified=True,
+                )
+                for i in batch
+            ])
+            ids.extend(user.id for user in users)
+            self._progress('Пользователи', len(ids), total)
+        return ids
+
+    def _sellers(self, user_ids):
+        ids = array('q')
+        for batch in self._batches(len(user_ids)):
+            sellers = self._create(SellerProfile, [
+                SellerProfile(user_id=user_ids[i], shop_name=f'Магазин {i}') for i in batch
+            ])
+            ids.extend(seller.id for seller in sellers)
+            self._progress('Продавцы', len(ids), len(user_ids))
+        return ids
+
+    def _categories(self, total):
+        rng = self.rng
+        roots = max(1, total // 100)
+        ids = array('q')
+        for batch in self._batches(total):
+            categories = []
+            for i in batch:
+                # Корни создаются первыми, родитель — уже созданная категория
+                parent_id = ids[rng.randrange(len(ids))] if i >= roots and ids else None
+                categories.append(Category(
+                    name=f'{rng.choice(WORDS).capitalize()} {i}',
+                    parent_id=parent_id, is_active=rng.random() < 0.97, sort_order=i % 10,
+                ))
+            if batch.start < roots < batch.stop:
+                # Родители из этой же пачки еще не имеют id
+                self._create_with_slugs(categories[:roots - batch.start], 'name')
+                for category in categories[:roots - batch.start]:
+                    ids.append(category.id)
+                for category in categories[roots - batch.start:]:
+                    category.parent_id = ids[rng.randrange(len(ids))]
+                created = self._create_with_slugs(categories[roots - batch.start:], 'name')
+            else:
+                created = self._create_with_slugs(categories, 'name')
+            ids.extend(category.id for category in created)
+            self._progress('Категории', len(ids), total)
+        return ids
+
+    def _products(self, total, seller_ids, category_ids):
+        rng = self.rng
+        ids = array('q')
+        prices = array('q')  # в копейках, для позиций заказов
+        for batch in self._batches(total):
+            products = []
+            for i in batch:
+                cents = rng.randrange(1000, 5_000_000)
+                title = f'{rng.choice(ADJECTIVES).capitalize()} {rng.choice(WORDS)} {i}'
+                products.append(Product(
+                    seller_id=seller_ids[rng.randrange(len(seller_ids))],
+                    category_id=category_ids[rng.randrange(len(category_ids))],
+                    title=title,
+                    description=f'{title}. ' * rng.randint(3, 15),
+                    price=Decimal(cents) / 100,
+                    old_price=Decimal(cents * rng.randint(110, 150) // 100) / 100 if rng.random() < 0.3 else None,
+                    quantity=rng.randint(0, 500), is_active=rng.random() < 0.95,
+                ))
+                prices.append(cents)
+            ids.extend(product.id for product in self._create_with_slugs(products, 'title'))
+            self._progress('Товары', len(ids), total)
+        return ids, prices
+
+    def _reviews(self, total, product_ids, user_ids):
+        rng = self.rng
+        products, users = len(product_ids), len(user_ids)
+        done = 0
+        for batch in self._batches(total):
+            reviews = []
+            for i in batch:
+                # Пара (товар, пользователь) уникальна: k-й отзыв товара p пишет пользователь p*7919+k
+                p, k = i % products, i // products
+                rating = rng.choices((1, 2, 3, 4, 5), weights=(5, 5, 15, 35, 40))[0]
+                reviews.append(ProductReview(
+                    product_id=product_ids[p], user_id=user_ids[(p * 7919 + k) % users],
+                    rating=rating, title=REVIEW_TITLES[5 - rating],
+                    comment='Отзыв покупателя. ' * rng.randint(1, 10), is_approved=rng.random() < 0.9,
+                ))
+            self._create(ProductReview, reviews)
+            done += len(reviews)
+            self._progress('Отзывы', done, total)
+
+    def _orders(self, total, user_ids, product_ids, product_prices):
+        rng = self.rng
+        statuses = Order.Status.values
+        done = 0
+        for batch in self._batches(total):
+            orders, order_lines = [], []
+            for i in batch:
+                lines = [
+                    (index, rng.randint(1, 3))
+                    for index in rng.sample(range(len(product_ids)), min(len(product_ids), rng.randint(1, 3)))
+                ]
+                subtotal = Decimal(sum(product_prices[index] * quantity for index, quantity in lines)) / 100
+                shipping_cost = Decimal(rng.choice((0, 15000, 30000)))
+                orders.append(Order(
+                    buyer_id=user_ids[rng.randrange(len(user_ids))],
+                    order_number=f'{self.prefix[:4].upper()}{i:012d}',
+                    status=rng.choice(statuses), subtotal=subtotal, shipping_cost=shipping_cost,
+                    total_price=subtotal + shipping_cost,
+                    shipping_address=f'Ташкент, ул. Навои, {i % 200 + 1}',
+                    shipping_phone=f'+998{900000000 + i % 100000000}',
+                ))
+                order_lines.append(lines)
+
+            with transaction.atomic():
+                orders = Order.objects.bulk_create(orders, batch_size=self.batch_size)
+                OrderItem.objects.bulk_create([
+                    OrderItem(
+                        order_id=order.id, product_id=product_ids[index], quantity=quantity,
+                        price=Decimal(product_prices[index]) / 100,
+                    )
+                    for order, lines in zip(orders, order_lines)
+                    for index, quantity in lines
+                ], batch_size=self.batch_size)
+            done += len(orders)
+            self._progress('Заказы', done, total)
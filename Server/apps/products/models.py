@@ -1,9 +1,96 @@
-from django.db import models
-from django.utils.text import slugify
+from django.db import connection, models, transaction
 from django.core.exceptions import ValidationError
-from django.db.models import Sum, F
+from django.db.models import Case, F, Q, Sum, When
+from django.db.models.expressions import RawSQL
 from decimal import Decimal
 
+from .conditional import touch
+from .slugs import save_with_slug
+
+
+# Рекурсивный обход дерева одним запросом (WITH RECURSIVE есть в SQLite и PostgreSQL).
+# UNION, а не UNION ALL: при цикле в данных рекурсия останавливается
+ANCESTORS_SQL = """
+    WITH RECURSIVE ancestry(id) AS (
+        SELECT {pk} FROM {table} WHERE {pk} IN ({ids})
+        UNION
+        SELECT c.{parent} FROM {table} c JOIN ancestry a ON c.{pk} = a.id WHERE c.{parent} IS NOT NULL
+    )
+    SELECT id FROM ancestry
+"""
+
+DESCENDANTS_SQL = """
+    WITH RECURSIVE subtree(id) AS (
+        SELECT {pk} FROM {table} WHERE {pk} IN ({ids})
+        UNION
+        SELECT c.{pk} FROM {table} c JOIN subtree s ON c.{parent} = s.id
+    )
+    SELECT id FROM subtree
+"""
+
+
+class CategoryQuerySet(models.QuerySet):
+    def _recursive(self, template, ids):
+        ids = [category_id for category_id in ids if category_id is not None]
+        if not ids:
+            return self.none()
+        qn = connection.ops.quote_name
+        sql = template.format(
+            table=qn(self.model._meta.db_table),
+            pk=qn(self.model._meta.pk.column),
+            parent=qn(self.model._meta.get_field('parent').column),
+            ids=', '.join(['%s'] * len(ids)),
+        )
+        return self.filter(pk__in=RawSQL(sql, ids))
+
+    def ancestors(self, *category_ids):
+        """Категории и все их предки — один запрос"""
+        return self._recursive(ANCESTORS_SQL, category_ids)
+
+    def subtree(self, *category_ids):
+        """Категории и все их потомки — один запрос"""
+        return self._recursive(DESCENDANTS_SQL, category_ids)
+
+    def cycle_moves(self, moves):
+        """
+        Перемещения {category_id: new_parent_id}, которые создали бы цикл,
+        с учетом всех перемещений сразу. Один запрос: цепочки предков новых
+        родителей, дальше обход в памяти
+        """
+        parents = dict(self.ancestors(*moves.values()).values_list('id', 'parent_id'))
+        parents.update(moves)
+        cycles = set()
+        for category_id, parent_id in moves.items():
+            seen = set()
+            while parent_id is not None and parent_id not in seen:
+                if parent_id == category_id:
+                    cycles.add(category_id)
+                    break
+                seen.add(parent_id)
+                parent_id = parents.get(parent_id)
+        return cycles
+
+    def move(self, moves):
+        """
+        Перенести поддеревья {category_id: new_parent_id} одним UPDATE.
+        ValidationError, если перемещение создает цикл
+        """
+        if not moves:
+            return 0
+        cycles = self.cycle_moves(moves)
+        if cycles:
+            raise ValidationError(
+                f"Перемещение создает циклическую зависимость в категориях: {', '.join(map(str, sorted(cycles)))}"
+            )
+        with transaction.atomic():
+            updated = self.filter(id__in=moves).update(parent_id=Case(
+                *[When(id=category_id, then=parent_id) for category_id, parent_id in moves.items()],
+                output_field=models.BigIntegerField(),
+            ))
+            # update() не отправляет сигналы: версии дерева для conditional.py
+            transaction.on_commit(lambda: touch('categories', 'products'))
+        return updated
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100, db_index=True)
@@ -14,6 +101,7 @@ class Category(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CategoryQuerySet.as_manager()
 
     class Meta:
         ordering = ['sort_order', 'name']
@@ -27,21 +115,33 @@ class Category(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
+            return save_with_slug(self, 'name', super().save, *args, **kwargs)
         super().save(*args, **kwargs)
 
 
     def clean(self):
-        if self.parent and self.parent == self:
+        if self.parent_id and self.parent_id == self.pk:
             raise ValidationError("Категория не может быть родителем самой себя")
         
-        # Проверка на циклические зависимости
-        if self.parent:
-            current = self.parent
-            while current:
-                if current == self:
-                    raise ValidationError("Обнаружена циклическая зависимость в категориях")
-                current = current.parent
+        # Проверка на циклические зависимости — один запрос (CategoryQuerySet.cycle_moves)
+        if self.pk and self.parent_id and Category.objects.cycle_moves({self.pk: self.parent_id}):
+            raise ValidationError("Обнаружена циклическая зависимость в категориях")
+
+    def breadcrumbs(self):
+        """Путь от корня до категории — один запрос"""
+        by_id = {category.id: category for category in Category.objects.ancestors(self.pk)}
+        path = []
+        current = by_id.get(self.pk)
+        while current is not None and current not in path:
+            path.append(current)
+            current = by_id.get(current.parent_id)
+        return path[::-1]
+
+    def is_descendant_of(self, other):
+        """Вложена ли категория в other (на любую глубину) — один запрос"""
+        if self.pk is None or self.pk == other.pk:
+            return False
+        return Category.objects.ancestors(self.parent_id).filter(pk=other.pk).exists()
 
 
 class Product(models.Model):
@@ -72,7 +172,7 @@ class Product(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.title)
+            return save_with_slug(self, 'title', super().save, *args, **kwargs)
         super().save(*args, **kwargs)
 
     def clean(self):
@@ -242,4 +342,28 @@ class ProductReview(models.Model):
 
     def __str__(self):
         return f"Отзыв на {self.product.title} от {self.user.email}"
-    
\ No newline at end of file
+    
+
+class Cart(models.Model):
+    """Корзина покупателя; проверенное состояние кэшируется (см. cart.py)"""
+    user = models.OneToOneField('accounts.CustomUser', on_delete=models.CASCADE, related_name='cart')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Cart {self.id} of user {self.user_id}'
+
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cart_items')
+    quantity = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        unique_together = ('cart', 'product')
+
+    def __str__(self):
+        return f'{self.product_id} x {self.quantity}'
@@ -1,49 +1,91 @@
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Q, Value
 from rest_framework import permissions
+from .models import OrderItem
+
+
+def with_product_ownership(queryset, request):
+    """
+    Аннотирует товары флагом is_owned: проверка владельца выполняется
+    тем же запросом, что и поиск товара
+    """
+    profile_id = request.seller.profile_id
+    if profile_id is None:
+        return queryset.annotate(is_owned=Value(False, output_field=BooleanField()))
+    return queryset.annotate(
+        is_owned=ExpressionWrapper(Q(seller_id=profile_id), output_field=BooleanField())
+    )
+
+
+def with_order_seller_access(queryset, request):
+    """
+    Аннотирует заказы флагом has_seller_items — есть ли в заказе товары
+    текущего продавца (подзапрос EXISTS вместо отдельного запроса)
+    """
+    profile_id = request.seller.profile_id
+    if profile_id is None:
+        return queryset.annotate(has_seller_items=Value(False, output_field=BooleanField()))
+    return queryset.annotate(
+        has_seller_items=Exists(
+            OrderItem.objects.filter(order=OuterRef('pk'), product__seller_id=profile_id)
+        )
+    )
 
 
 class IsSellerOrReadOnly(permissions.BasePermission):
     """
-    Разрешение для продавцов: только чтение для всех, 
+    Разрешение для продавцов: только чтение для всех,
     запись только для продавцов
     """
-    
+
     def has_permission(self, request, view):
         # Разрешаем безопасные методы (GET, HEAD, OPTIONS) для всех
         if request.method in permissions.SAFE_METHODS:
             return True
-        
+
         # Для остальных методов требуется аутентификация и профиль продавца
-        return (
-            request.user and 
-            request.user.is_authenticated and 
-            hasattr(request.user, 'seller_profile')
-        )
-    
+        return request.seller.is_seller
+
     def has_object_permission(self, request, view, obj):
         # Разрешаем безопасные методы для всех
         if request.method in permissions.SAFE_METHODS:
             return True
-        
+
         # Проверяем, что пользователь - владелец объекта
-        return obj.seller == request.user.seller_profile
+        return IsProductOwner().has_object_permission(request, view, obj)
+
+
+class IsProductOwner(permissions.BasePermission):
+    """
+    Разрешение для владельца товара. Для товаров, полученных через
+    with_product_ownership, использует готовый флаг is_owned
+    """
+
+    def has_object_permission(self, request, view, obj):
+        is_owned = getattr(obj, 'is_owned', None)
+        if is_owned is not None:
+            return is_owned
+        return request.seller.is_seller and obj.seller_id == request.seller.profile_id
 
 
 class IsOrderOwner(permissions.BasePermission):
     """
     Разрешение для владельцев заказов
     """
-    
+
     def has_object_permission(self, request, view, obj):
         # Покупатель может управлять своими заказами
-        if obj.buyer == request.user:
+        if obj.buyer_id == request.user.id:
             return True
-        
+
         # Продавец может управлять заказами со своими товарами
-        if hasattr(request.user, 'seller_profile'):
+        if request.seller.is_seller:
+            has_seller_items = getattr(obj, 'has_seller_items', None)
+            if has_seller_items is not None:
+                return has_seller_items
             return obj.items.filter(
-                product__seller=request.user.seller_profile
+                product__seller_id=request.seller.profile_id
             ).exists()
-        
+
         return False
 
 
@@ -51,7 +93,7 @@ class IsReviewOwner(permissions.BasePermission):
     """
     Разрешение для владельцев отзывов
     """
-    
+
     def has_object_permission(self, request, view, obj):
         # Только владелец отзыва может его редактировать
-        return obj.user == request.user
\ No newline at end of file
+        return obj.user_id == request.user.id
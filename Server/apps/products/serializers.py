@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from .models import Category, Product, Order, OrderItem, ProductImage, ProductReview
 from django.db import transaction
+from django.db.models import Avg, Prefetch, Q
+from common.serializers import SparseFieldsMixin, ValuesSerializer, sparse_queryset
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -12,12 +14,30 @@ class CategorySerializer(serializers.ModelSerializer):
                   'created_at', 'updated_at', 'children']
         read_only_fields = ['slug', 'created_at', 'updated_at']
     
+    def validate_parent(self, parent):
+        # Цикл возможен только при переносе существующей категории
+        if parent is not None and self.instance is not None and Category.objects.cycle_moves({self.instance.id: parent.id}):
+            raise serializers.ValidationError("Категория не может быть вложена в саму себя или в свою подкатегорию")
+        return parent
+    
     def get_children(self, obj):
+        # context['children'] — {parent_id: [категории]}, см. active_children_map
+        children_map = self.context.get('children')
+        if children_map is not None:
+            return CategorySerializer(children_map.get(obj.id, []), many=True, context=self.context).data
         if obj.children.exists():
             return CategorySerializer(obj.children.filter(is_active=True), many=True).data
         return []
 
 
+def active_children_map(categories):
+    """Дерево активных категорий одним запросом: {parent_id: [дочерние категории]}"""
+    children_map = {}
+    for category in categories:
+        children_map.setdefault(category.parent_id, []).append(category)
+    return children_map
+
+
 class ProductImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductImage
@@ -35,6 +55,36 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'created_at', 'updated_at', 'is_approved']
 
 
+def with_main_image(queryset):
+    """Предзагрузить главное изображение для ProductListSerializer одним запросом на страницу"""
+    return queryset.prefetch_related(
+        Prefetch('images', queryset=ProductImage.objects.filter(is_main=True), to_attr='main_images')
+    )
+
+
+def product_detail_queryset(queryset, serializer):
+    """Колонки и связи для ProductDetailSerializer — только для выбранных полей (?fields=&expand=)"""
+    queryset = sparse_queryset(queryset, serializer)
+    if 'images' in serializer.fields:
+        queryset = queryset.prefetch_related('images')
+    if 'reviews' in serializer.fields:
+        queryset = queryset.prefetch_related(Prefetch(
+            'reviews', queryset=ProductReview.objects.filter(is_approved=True).select_related('user'),
+            to_attr='approved_reviews',
+        ))
+    elif 'average_rating' in serializer.fields:
+        queryset = queryset.annotate(approved_rating=Avg('reviews__rating', filter=Q(reviews__is_approved=True)))
+    return queryset
+
+
+def order_detail_queryset(queryset, serializer, *extra):
+    """Колонки и связи для OrderSerializer; extra — колонки, нужные view"""
+    queryset = sparse_queryset(queryset, serializer, *extra)
+    if 'items' in serializer.fields:
+        queryset = queryset.prefetch_related('items', 'items__product')
+    return queryset
+
+
 class ProductListSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     main_image = serializers.SerializerMethodField()
@@ -45,7 +95,11 @@ class ProductListSerializer(serializers.ModelSerializer):
                   'category_name', 'main_image', 'is_active']
     
     def get_main_image(self, obj):
-        main_image = obj.images.filter(is_main=True).first()
+        main_images = getattr(obj, 'main_images', None)
+        if main_images is not None:
+            main_image = main_images[0] if main_images else None
+        else:
+            main_image = obj.images.filter(is_main=True).first()
         if main_image:
             request = self.context.get('request')
             if request:
@@ -53,7 +107,7 @@ class ProductListSerializer(serializers.ModelSerializer):
         return None
 
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     seller_name = serializers.CharField(source='seller.user.email', read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
@@ -67,12 +121,20 @@ class ProductDetailSerializer(serializers.ModelSerializer):
                   'is_active', 'created_at', 'updated_at', 'images', 'reviews', 
                   'average_rating']
         read_only_fields = ['seller', 'slug', 'created_at', 'updated_at']
+        expandable_fields = ['images', 'reviews']
     
     def get_reviews(self, obj):
-        approved_reviews = obj.reviews.filter(is_approved=True)
+        approved_reviews = getattr(obj, 'approved_reviews', None)
+        if approved_reviews is None:
+            approved_reviews = obj.reviews.filter(is_approved=True)
         return ProductReviewSerializer(approved_reviews, many=True).data
     
     def get_average_rating(self, obj):
+        if hasattr(obj, 'approved_rating'):
+            return round(obj.approved_rating, 1) if obj.approved_rating is not None else 0
+        reviews = getattr(obj, 'approved_reviews', None)
+        if reviews is not None:
+            return round(sum(r.rating for r in reviews) / len(reviews), 1) if reviews else 0
         reviews = obj.reviews.filter(is_approved=True)
         if reviews.exists():
             return round(sum(r.rating for r in reviews) / reviews.count(), 1)
@@ -95,6 +157,60 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
         return data
 
 
+PRODUCT_BATCH_MAX_SIZE = 200
+
+
+class ProductBatchSerializer(serializers.Serializer):
+    """Товары по id и/или slug (корзина, избранное, недавно просмотренные)"""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+    slugs = serializers.ListField(child=serializers.SlugField(max_length=255), required=False, default=list)
+
+    def validate(self, data):
+        total = len(data['ids']) + len(data['slugs'])
+        if not total:
+            raise serializers.ValidationError("Укажите ids или slugs")
+        if total > PRODUCT_BATCH_MAX_SIZE:
+            raise serializers.ValidationError(f"Не больше {PRODUCT_BATCH_MAX_SIZE} товаров за запрос")
+        return data
+
+
+class CartLineSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=0)
+
+
+class CartUpdateSerializer(serializers.Serializer):
+    """Новые количества позиций; quantity 0 удаляет позицию"""
+    items = CartLineSerializer(many=True)
+
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError("Укажите хотя бы один товар")
+        return value
+
+
+class CartItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    title = serializers.CharField(allow_null=True)
+    quantity = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True)
+    total_cost = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
+    available_quantity = serializers.IntegerField()
+    error = serializers.CharField(allow_null=True)
+
+
+class CartSerializer(serializers.Serializer):
+    items = CartItemSerializer(many=True)
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
+    is_valid = serializers.BooleanField()
+
+
+class CartCheckoutSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Order
+        fields = ['shipping_address', 'shipping_phone', 'shipping_cost']
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     product_title = serializers.CharField(source='product.title', read_only=True)
     total_cost = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
@@ -105,7 +221,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['price', 'total_cost']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     buyer_email = serializers.EmailField(source='buyer.email', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -118,6 +234,8 @@ class OrderSerializer(serializers.ModelSerializer):
                   'shipped_at', 'delivered_at', 'items']
         read_only_fields = ['buyer', 'order_number', 'subtotal', 'total_price', 
                             'created_at', 'updated_at']
+        expandable_fields = ['items']
+        source_lookups = {'status_display': ['status']}
 
 
 class OrderCreateSerializer(serializers.ModelSerializer):
@@ -157,7 +275,7 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         
         # Создание заказа
         order = Order.objects.create(
-            buyer=user,
+            buyer_id=user.id,
             order_number=order_number,
             **validated_data
         )
@@ -187,4 +305,60 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         # Расчет итоговых сумм
         order.calculate_totals()
         
-        return order
\ No newline at end of file
+        return order
+
+# ==================== БЫСТРЫЙ ВЫВОД СПИСКОВ ====================
+# Тот же вывод, что у сериализаторов выше, из строк .values() (см. common.serializers)
+
+class ProductListValues(ValuesSerializer):
+    serializer_class = ProductListSerializer
+    method_lookups = {'main_image': ['id']}
+
+    def prepare(self, rows):
+        # Как with_main_image: первое главное изображение в порядке ProductImage.Meta.ordering
+        self.main_images = {}
+        if rows and self.context.get('request') and 'main_image' in self.field_names:
+            images = ProductImage.objects.filter(
+                is_main=True, product_id__in=[row['id'] for row in rows]
+            ).values_list('product_id', 'image')
+            for product_id, image in images:
+                self.main_images.setdefault(product_id, image)
+
+    def get_main_image(self, row):
+        image = self.main_images.get(row['id'])
+        if image:
+            storage = ProductImage._meta.get_field('image').storage
+            return self.context['request'].build_absolute_uri(storage.url(image))
+        return None
+
+
+class ProductReviewValues(ValuesSerializer):
+    serializer_class = ProductReviewSerializer
+
+
+class OrderItemValues(ValuesSerializer):
+    serializer_class = OrderItemSerializer
+    extra_lookups = ['order']
+    method_lookups = {'total_cost': ['price', 'quantity']}
+
+    def get_total_cost(self, row):
+        return row['price'] * row['quantity']
+
+
+class OrderValues(ValuesSerializer):
+    serializer_class = OrderSerializer
+    method_lookups = {'status_display': ['status'], 'items': ['id']}
+
+    def prepare(self, rows):
+        self.items = {}
+        if rows and 'items' in self.field_names:
+            serializer = OrderItemValues(self.context)
+            items = list(serializer.values(OrderItem.objects.filter(order_id__in=[row['id'] for row in rows])))
+            for row, item in zip(items, serializer.serialize(items)):
+                self.items.setdefault(row['order'], []).append(item)
+
+    def get_status_display(self, row):
+        return Order.Status(row['status']).label if row['status'] in Order.Status.values else row['status']
+
+    def get_items(self, row):
+        return self.items.get(row['id'], [])
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Product, OrderItem, Order, ProductReview
+from .conditional import touch
+from .models import Category, Product, ProductImage, OrderItem, Order, ProductReview
 
 
 @receiver(post_save, sender=Order)
@@ -18,4 +20,33 @@ def update_order_item_total(sender, instance, created, **kwargs):
             product.quantity += instance.quantity
             product.save(update_fields=['quantity', 'updated_at'])
             
-        
\ No newline at end of file
+        
+
+# ==================== ВЕРСИИ КАТАЛОГА (conditional.py) ====================
+# Новая версия меняет валидаторы: кэш карточки товара (single_flight) устаревает
+
+@receiver([post_save, post_delete], sender=Product)
+def touch_product(sender, instance, **kwargs):
+    touch('products', f'product:{instance.id}')
+
+
+@receiver([post_save, post_delete], sender=ProductImage)
+def touch_product_image(sender, instance, **kwargs):
+    touch('products', f'product:{instance.product_id}')
+
+
+@receiver([post_save, post_delete], sender=ProductReview)
+def touch_product_review(sender, instance, **kwargs):
+    touch(f'product:{instance.product_id}')
+
+
+@receiver([post_save, post_delete], sender=Category)
+def touch_category(sender, instance, **kwargs):
+    touch('categories', 'products')
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def touch_user(sender, instance, created, update_fields=None, **kwargs):
+    # Email показывается в карточке товара; регистрация и вход (last_login) версию не меняют
+    if not created and (update_fields is None or 'email' in update_fields):
+        touch('users')
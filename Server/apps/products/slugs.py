@@ -0,0 +1,161 @@
+"""
+Уникальные slug для товаров и категорий.
+
+Название транслитерируется (кириллица, включая узбекские буквы), затем
+slugify. Если slug занят, берется следующий свободный суффикс: base-2,
+base-3, ... Занятые суффиксы для всех названий пачки находятся одним
+запросом по префиксу (slug = base OR slug LIKE 'base-%', по индексу на slug),
+поэтому bulk-импорт не делает запрос на каждую строку.
+
+Между выбором и вставкой slug может занять параллельный запрос:
+save_with_slug() и bulk_create_with_slugs() повторяют вставку в savepoint
+с новыми суффиксами.
+"""
+import re
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya',
+    # Узбекская кириллица
+    'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h',
+    # Украинская
+    'і': 'i', 'ї': 'yi', 'є': 'ye', 'ґ': 'g',
+})
+
+# Место под суффикс "-<число>"
+SUFFIX_RESERVE = 11
+
+# Сколько названий в одном запросе по префиксам
+PREFIX_BATCH_SIZE = 200
+
+SAVE_ATTEMPTS = 5
+
+
+def transliterate(text):
+    return text.lower().translate(TRANSLIT)
+
+
+def base_slug(text, max_length, fallback):
+    """slug из названия без суффикса; пустой (эмодзи, иероглифы) — fallback"""
+    slug = slugify(transliterate(text))[:max_length - SUFFIX_RESERVE].strip('-')
+    return slug or fallback
+
+
+_SUFFIXED = re.compile(r'(.+)-(\d+)')
+
+
+def _prefix_condition(field, base, vendor):
+    if vendor == 'sqlite':
+        # LIKE в SQLite регистронезависимый и не использует индекс, а диапазон —
+        # использует: после '-' в ASCII идет '.'
+        return Q(**{f'{field}__gte': f'{base}-', f'{field}__lt': f'{base}.'})
+    # В PostgreSQL для LIKE 'base-%' есть индекс varchar_pattern_ops
+    return Q(**{f'{field}__startswith': f'{base}-'})
+
+
+def _taken_suffixes(model, field, bases, using):
+    """{base: {занятые суффиксы}}; сам base без суффикса — 1"""
+    taken = {base: set() for base in bases}
+    unique = list(taken)
+    vendor = connections[using].vendor
+    for start in range(0, len(unique), PREFIX_BATCH_SIZE):
+        condition = Q()
+        for base in unique[start:start + PREFIX_BATCH_SIZE]:
+            condition |= Q(**{field: base}) | _prefix_condition(field, base, vendor)
+        for slug in model._default_manager.using(using).filter(condition).values_list(field, flat=True):
+            if slug in taken:
+                taken[slug].add(1)
+            match = _SUFFIXED.fullmatch(slug)
+            if match and match.group(1) in taken:
+                taken[match.group(1)].add(int(match.group(2)))
+    return taken
+
+
+def allocate_slugs(model, texts, field='slug', using=None):
+    """
+    Свободные slug для названий texts (в том же порядке), уникальные и
+    между собой. Один запрос на PREFIX_BATCH_SIZE названий
+    """
+    using = using or router.db_for_write(model)
+    max_length = model._meta.get_field(field).max_length
+    fallback = model._meta.model_name
+    bases = [base_slug(text, max_length, fallback) for text in texts]
+    taken = _taken_suffixes(model, field, bases, using)
+    slugs = []
+    for base in bases:
+        suffix = 1
+        while suffix in taken[base]:
+            suffix += 1
+        taken[base].add(suffix)
+        slugs.append(base if suffix == 1 else f'{base}-{suffix}')
+    return slugs
+
+
+def assign_slugs(objs, source, field='slug', using=None):
+    """Заполнить пустые slug у объектов перед bulk_create"""
+    pending = [obj for obj in objs if not getattr(obj, field)]
+    if pending:
+        slugs = allocate_slugs(type(pending[0]), [getattr(obj, source) for obj in pending], field, using)
+        for obj, slug in zip(pending, slugs):
+            setattr(obj, field, slug)
+    return objs
+
+
+def _slug_taken(model, field, slugs, using):
+    return model._default_manager.using(using).filter(**{f'{field}__in': slugs}).exists()
+
+
+def bulk_create_with_slugs(objs, source, field='slug', using=None, **kwargs):
+    """
+    bulk_create с подобранными slug для объектов без slug. Если slug из
+    пачки успели занять параллельно (IntegrityError), пачка откатывается
+    в savepoint, slug подбираются заново и вставка повторяется
+    """
+    objs = list(objs)
+    if not objs:
+        return objs
+    model = type(objs[0])
+    using = using or router.db_for_write(model)
+    generated = [obj for obj in objs if not getattr(obj, field)]
+    pks = [obj.pk for obj in objs]
+    for attempt in range(SAVE_ATTEMPTS):
+        assign_slugs(generated, source, field, using)
+        try:
+            with transaction.atomic(using=using):
+                return model._default_manager.using(using).bulk_create(objs, **kwargs)
+        except IntegrityError:
+            slugs = [getattr(obj, field) for obj in generated]
+            # Вставка откатилась целиком: pk из уже вставленных batch_size-пачек недействительны
+            for obj, pk in zip(objs, pks):
+                obj.pk = pk
+                obj._state.adding = True
+            for obj in generated:
+                setattr(obj, field, '')
+            if not slugs or attempt == SAVE_ATTEMPTS - 1 or not _slug_taken(model, field, slugs, using):
+                raise
+
+
+def save_with_slug(instance, source, save, *args, field='slug', **kwargs):
+    """
+    save(*args, **kwargs) с подобранным slug. Если slug успели занять
+    параллельно (IntegrityError), подбирается следующий
+    """
+    model = type(instance)
+    using = kwargs.get('using') or router.db_for_write(model, instance=instance)
+    for attempt in range(SAVE_ATTEMPTS):
+        setattr(instance, field, allocate_slugs(model, [getattr(instance, source)], field, using)[0])
+        try:
+            with transaction.atomic(using=using):
+                return save(*args, **kwargs)
+        except IntegrityError:
+            conflict = _slug_taken(model, field, [getattr(instance, field)], using)
+            if not conflict or attempt == SAVE_ATTEMPTS - 1:
+                setattr(instance, field, '')
+                raise
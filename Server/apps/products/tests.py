@@ -1,3 +1,633 @@
-from django.test import TestCase
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.fields import DateTimeField
+from rest_framework.renderers import JSONRenderer
+
+from apps.accounts.middleware import SellerContextMiddleware
+from apps.accounts.models import CustomUser, SellerProfile
+from apps.accounts.tokens import UserRefreshToken
+
+from . import cart, slugs
+from .conditional import single_flight
+from .permissions import IsProductOwner, with_product_ownership
+from .models import CartItem, Category, Order, OrderItem, Product, ProductImage, ProductReview
+from .serializers import (
+    OrderSerializer, OrderValues, ProductListSerializer, ProductListValues, ProductReviewSerializer,
+    ProductReviewValues, with_main_image,
+)
+from .slugs import assign_slugs, bulk_create_with_slugs
+from .views import ProductDetailView
+
+
+@override_settings(CATALOG_RESPONSE_CACHE={'ENABLED': True})
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _stampede(self, version, workers=20):
+        calls = []
+        results = []
+        start = threading.Barrier(workers)
+
+        def compute():
+            calls.append(version)
+            time.sleep(0.2)
+            return {'version': version}
+
+        def worker():
+            start.wait()
+            results.append(single_flight('test:stampede', version, compute))
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return calls, results
+
+    def test_missing_entry_is_computed_once(self):
+        calls, results = self._stampede('v1')
+        self.assertEqual(calls, ['v1'])
+        self.assertEqual(results, [({'version': 'v1'}, 'v1')] * 20)
+
+    def test_stale_entry_is_served_while_one_worker_recomputes(self):
+        self._stampede('v1')
+        calls, results = self._stampede('v2')
+        self.assertEqual(calls, ['v2'])
+        self.assertIn(({'version': 'v2'}, 'v2'), results)
+        # Остальные не ждали пересчет, а получили прежнюю копию со своей версией
+        self.assertEqual(results.count(({'version': 'v1'}, 'v1')), 19)
+        self.assertEqual(single_flight('test:stampede', 'v2', lambda: None), ({'version': 'v2'}, 'v2'))
+
+
+@override_settings(CATALOG_RESPONSE_CACHE={'ENABLED': True})
+class ProductDetailCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = CustomUser.objects.create_user(email='seller@example.com', username='seller', password='x')
+        seller = SellerProfile.objects.create(user=user, shop_name='Shop')
+        self.product = Product.objects.create(
+            seller=seller, title='Phone', slug='phone', description='d', price=Decimal('100.00'), quantity=5,
+        )
+        self.factory = RequestFactory()
+
+    def get(self, **headers):
+        request = self.factory.get('/api/v1/products/products/detail/', headers=headers)
+        response = ProductDetailView.as_view()(request, slug='phone')
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def test_signals_invalidate_cached_detail(self):
+        first = self.get()
+        # Только запрос валидаторов
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get().content, first.content)
+
+        Product.objects.filter(id=self.product.id).update(title='Phone 2')
+        # update() сигналы не отправляет: версия прежняя, ответ из кэша
+        self.assertEqual(self.get()['ETag'], first['ETag'])
+
+        self.product.refresh_from_db()
+        self.product.save()
+        second = self.get()
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.data['title'], 'Phone 2')
+
+        ProductReview.objects.create(product=self.product, user=self.product.seller.user, rating=5,
+                                     title='t', comment='c', is_approved=True)
+        third = self.get()
+        self.assertEqual(len(third.data['reviews']), 1)
+        self.assertEqual(self.get(if_none_match=third['ETag']).status_code, 304)
+
+
+class SlugAllocationTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email='seller@example.com', username='seller', password='x')
+        self.seller = SellerProfile.objects.create(user=user, shop_name='Shop')
+
+    def product(self, title, **kwargs):
+        return Product(seller=self.seller, title=title, description='d', price=Decimal('1.00'), **kwargs)
+
+    def test_duplicate_and_cyrillic_titles(self):
+        slugs = [Product.objects.create(seller=self.seller, title=title, description='d', price=Decimal('1.00')).slug
+                 for title in ['iPhone 15', 'iPhone 15', 'Телефон Samsung', 'Ўзбек қовун', '★', '★']]
+        self.assertEqual(slugs, ['iphone-15', 'iphone-15-2', 'telefon-samsung', 'ozbek-qovun', 'product', 'product-2'])
+        self.assertEqual(Category.objects.create(name='Электроника').slug, 'elektronika')
+
+    def test_bulk_allocation_is_one_query(self):
+        Product.objects.create(seller=self.seller, title='iPhone 15', description='d', price=Decimal('1.00'))
+        products = [self.product('iPhone 15'), self.product('iPhone 15'), self.product('Новый', slug='own')]
+        with self.assertNumQueries(1):
+            assign_slugs(products, 'title')
+        self.assertEqual([product.slug for product in products], ['iphone-15-2', 'iphone-15-3', 'own'])
+
+    def test_bulk_create_reallocates_on_conflict(self):
+        Product.objects.create(seller=self.seller, title='iPhone 15', description='d', price=Decimal('1.00'))
+        taken_suffixes = slugs._taken_suffixes
+        calls = []
+
+        def stale(model, field, bases, using):
+            # Первая проверка не видит slug, вставленный параллельно
+            calls.append(bases)
+            return {base: set() for base in bases} if len(calls) == 1 else taken_suffixes(model, field, bases, using)
+
+        with mock.patch.object(slugs, '_taken_suffixes', stale):
+            created = bulk_create_with_slugs([self.product('iPhone 15'), self.product('Новый')], 'title')
+        self.assertEqual(len(calls), 2)
+        self.assertEqual([product.slug for product in created], ['iphone-15-2', 'novyy'])
+        self.assertEqual(Product.objects.filter(slug__startswith='iphone-15').count(), 2)
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        self.chain = []
+        parent = None
+        for i in range(10):
+            parent = Category.objects.create(name=f'Уровень {i}', parent=parent)
+            self.chain.append(parent)
+        self.other = Category.objects.create(name='Другая')
+
+    def test_ancestry_queries_do_not_depend_on_depth(self):
+        root, leaf = self.chain[0], self.chain[-1]
+        with self.assertNumQueries(1):
+            self.assertEqual(leaf.breadcrumbs(), self.chain)
+        with self.assertNumQueries(1):
+            self.assertTrue(leaf.is_descendant_of(root))
+        with self.assertNumQueries(1):
+            root.parent = leaf
+            with self.assertRaises(ValidationError):
+                root.clean()
+
+    def test_bulk_moves_are_checked_together(self):
+        root = self.chain[0]
+        # Каждое перемещение по отдельности допустимо, вместе — цикл
+        moves = {root.id: self.other.id, self.other.id: self.chain[5].id}
+        self.assertEqual(Category.objects.cycle_moves(moves), {root.id, self.other.id})
+        with self.assertRaises(ValidationError):
+            Category.objects.move(moves)
+
+        self.assertEqual(Category.objects.move({self.chain[5].id: self.other.id}), 1)
+        self.assertEqual(self.chain[-1].breadcrumbs()[:2], [self.other, self.chain[5]])
+        self.assertEqual(Category.objects.subtree(self.other.id).count(), 6)
+
+
+class CartTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='buyer@example.com', username='buyer', password='x')
+        seller = SellerProfile.objects.create(
+            user=CustomUser.objects.create_user(email='seller@example.com', username='seller', password='x'),
+            shop_name='Shop',
+        )
+        self.products = [
+            Product.objects.create(seller=seller, title=f'Товар {i}', description='d',
+                                   price=Decimal('10.00') + i, quantity=5)
+            for i in range(3)
+        ]
+        self.headers = {'Authorization': f'Bearer {UserRefreshToken.for_user(self.user).access_token}'}
+
+    def add(self, *quantities):
+        return cart.update_cart(self.user.id, {
+            product.id: quantity for product, quantity in zip(self.products, quantities)
+        })
+
+    def checkout(self):
+        return self.client.post('/api/v1/products/cart/checkout/', {
+            'shipping_address': 'Ташкент', 'shipping_phone': '+998900000000',
+        }, content_type='application/json', headers=self.headers)
+
+    def test_update_validates_all_lines_with_one_product_query(self):
+        self.add(2, 1)
+        # Позиции корзины, товары, транзакция (get_or_create, bulk upsert)
+        with self.assertNumQueries(6):
+            state = self.add(2, 1, 9)
+        self.assertFalse(state['is_valid'])
+        self.assertEqual([item['error'] for item in state['items']], [None, None, cart.OUT_OF_STOCK])
+        self.assertEqual(state['subtotal'], Decimal('31.00'))
+        with self.assertNumQueries(0):
+            self.assertEqual(cart.get_cart(self.user.id), state)
+
+    def test_checkout_decrements_stock_and_clears_cart(self):
+        self.add(2, 1)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['subtotal'], '31.00')
+        self.assertEqual([p.quantity for p in Product.objects.order_by('id')], [3, 4, 5])
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(self.checkout().status_code, 400)
+
+    def test_race_after_validation_returns_409(self):
+        # Параллельная запись между чтением корзины и списанием остатков
+        for change in ({'quantity': 1}, {'is_active': False}, {'price': Decimal('99.00')}):
+            self.add(2, 1)
+            load = cart._load
+            calls = []
+
+            def load_then_race(user_id):
+                state = load(user_id)
+                if not calls:
+                    # Гонка только при чтении в транзакции заказа, перепроверка после отката — обычная
+                    Product.objects.filter(id=self.products[0].id).update(**change)
+                calls.append(user_id)
+                return state
+
+            with mock.patch.object(cart, '_load', load_then_race):
+                response = self.checkout()
+            self.assertEqual(response.status_code, 409, change)
+            self.assertIn('cart', response.json())
+            self.assertEqual(CartItem.objects.count(), 2)
+            self.assertFalse(Order.objects.exists())
+            self.assertEqual(Product.objects.get(id=self.products[1].id).quantity, 5)
+
+    def test_price_change_after_validation_returns_409(self):
+        self.add(1)
+        Product.objects.filter(id=self.products[0].id).update(price=Decimal('99.00'))
+        response = self.checkout()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['cart']['items'][0]['price'], '99.00')
+        self.assertEqual(self.checkout().status_code, 201)
+        self.assertEqual(Order.objects.get().subtotal, Decimal('99.00'))
+
+    def test_stale_cache_of_another_worker_does_not_create_order(self):
+        state = self.add(1)
+        cart.clear_cart(self.user.id)
+        # Кэш воркера, который не видел очистку корзины
+        cache.set(f'cart:{self.user.id}', state)
+        self.assertEqual(self.checkout().status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Product.objects.get(id=self.products[0].id).quantity, 5)
+
+
+class ValuesSerializerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seller_user = CustomUser.objects.create_user(email='seller@example.com', username='seller', password='x')
+        self.buyer = CustomUser.objects.create_user(email='buyer@example.com', username='buyer', password='x')
+        seller = SellerProfile.objects.create(user=seller_user, shop_name='Shop')
+        category = Category.objects.create(name='Телефоны')
+        self.products = [
+            Product.objects.create(seller=seller, category=category, title='С фото', description='d',
+                                   price=Decimal('1999.90'), old_price=Decimal('2500.00'), quantity=3),
+            # Главного изображения нет, есть только обычное
+            Product.objects.create(seller=seller, category=category, title='Без главного', description='d',
+                                   price=Decimal('10.05'), quantity=0),
+            # Без категории и изображений
+            Product.objects.create(seller=seller, title='Без категории', description='d', price=Decimal('0.99')),
+        ]
+        ProductImage.objects.create(product=self.products[0], image='products/images/main.jpg')
+        ProductImage.objects.bulk_create([
+            ProductImage(product=self.products[0], image='products/images/other.jpg'),
+            ProductImage(product=self.products[1], image='products/images/side.jpg'),
+        ])
+        for product, rating in zip(self.products, (5, 3)):
+            ProductReview.objects.create(product=product, user=self.buyer, rating=rating,
+                                         title='Отзыв', comment='Текст', is_approved=rating > 3)
+        self.orders = [
+            Order.objects.create(buyer=self.buyer, order_number='ORD-1', shipping_address='Ташкент',
+                                 shipping_phone='+998900000000', shipping_cost=Decimal('15.50'),
+                                 status=Order.Status.COMPLETED, shipped_at=timezone.now()),
+            # Без покупателя и без позиций
+            Order.objects.create(order_number='ORD-2', shipping_address='Самарканд', shipping_phone='+998900000001',
+                                 shipping_cost=Decimal('0.00')),
+        ]
+        OrderItem.objects.bulk_create([
+            OrderItem(order=self.orders[0], product=self.products[0], quantity=2, price=Decimal('1999.90')),
+            OrderItem(order=self.orders[0], product=self.products[1], quantity=1, price=Decimal('10.05')),
+        ])
+        # Товар удален из каталога: product=None
+        OrderItem.objects.create(order=self.orders[0], quantity=3, price=Decimal('7.10'))
+        for order in self.orders:
+            order.calculate_totals()
+
+    def assertSameOutput(self, serializer, values, queryset):
+        expected = serializer(queryset, many=True, context=values.context).data
+        actual = values.serialize(values.values(queryset))
+        self.assertEqual(actual, expected)
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+        return actual
+
+    def test_products_match_drf_serializer(self):
+        products = Product.objects.select_related('category').order_by('id')
+        request = RequestFactory().get('/api/v1/products/products/')
+        data = self.assertSameOutput(ProductListSerializer, ProductListValues({'request': request}),
+                                     with_main_image(products))
+        self.assertEqual([row['main_image'] for row in data],
+                         ['http://testserver/media/products/images/main.jpg', None, None])
+        self.assertEqual((data[0]['price'], data[0]['old_price'], data[1]['old_price']), ('1999.90', '2500.00', None))
+        self.assertNotIn('category_name', data[2])
+        # Без запроса в контексте ссылку на изображение не построить
+        data = self.assertSameOutput(ProductListSerializer, ProductListValues(), products)
+        self.assertEqual([row['main_image'] for row in data], [None, None, None])
+
+    def test_orders_with_items_match_drf_serializer(self):
+        orders = Order.objects.select_related('buyer').prefetch_related('items', 'items__product').order_by('id')
+        data = self.assertSameOutput(OrderSerializer, OrderValues(), orders)
+        first, second = data
+        self.assertEqual((first['subtotal'], first['shipping_cost'], first['total_price']),
+                         ('4031.15', '15.50', '4046.65'))
+        self.assertEqual(first['shipped_at'], DateTimeField().to_representation(self.orders[0].shipped_at))
+        self.assertIsNone(first['delivered_at'])
+        self.assertEqual([item['total_cost'] for item in first['items']], ['3999.80', '10.05', '21.30'])
+        self.assertNotIn('product_title', first['items'][2])
+        self.assertEqual(second['items'], [])
+        self.assertNotIn('buyer_email', second)
+
+    def test_reviews_match_drf_serializer(self):
+        reviews = ProductReview.objects.select_related('user').order_by('id')
+        data = self.assertSameOutput(ProductReviewSerializer, ProductReviewValues(), reviews)
+        self.assertEqual([row['user_email'] for row in data], ['buyer@example.com'] * 2)
+
+    @override_settings(INSTRUMENTATION={'ENABLED': True, 'SAMPLE_RATE': 1.0, 'SERVER_TIMING': True})
+    def test_serialize_is_timed_for_instrumentation(self):
+        headers = {'Authorization': f'Bearer {UserRefreshToken.for_user(self.buyer).access_token}'}
+        for path in ('/api/v1/products/products/', '/api/v1/products/orders/', '/api/v1/products/reviews/'):
+            response = self.client.get(path, headers=headers)
+            self.assertEqual(response.status_code, 200, path)
+            timing = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+            self.assertGreater(float(timing['serializer'].removeprefix('dur=')), 0, path)
+
+
+class ProductOwnershipTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner, self.other = [
+            CustomUser.objects.create_user(email=f'{name}@example.com', username=name, password='x')
+            for name in ('owner', 'other')
+        ]
+        self.buyer = CustomUser.objects.create_user(email='buyer@example.com', username='buyer', password='x')
+        profile = SellerProfile.objects.create(user=self.owner, shop_name='Shop')
+        SellerProfile.objects.create(user=self.other, shop_name='Other')
+        self.product = Product.objects.create(seller=profile, title='Phone', slug='phone', description='d',
+                                              price=Decimal('100.00'))
+        self.factory = RequestFactory()
+        self.tokens = {user: UserRefreshToken.for_user(user).access_token for user in (self.owner, self.other, self.buyer)}
+
+    def call(self, method, user, data=None):
+        """ProductDetailView с SellerContextMiddleware, как в полном стеке"""
+        request = getattr(self.factory, method)(
+            '/api/v1/products/products/detail/', data or {}, content_type='application/json',
+            headers={'Authorization': f'Bearer {self.tokens[user]}'},
+        )
+        response = SellerContextMiddleware(lambda request: ProductDetailView.as_view()(request, slug='phone'))(request)
+        response.render()
+        return response
+
+    def test_owner_can_update_and_delete(self):
+        response = self.call('patch', self.owner, {'title': 'Phone 2', 'price': '120.00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['title'], response.data['price']), ('Phone 2', '120.00'))
+        response = self.call('put', self.owner, {'title': 'Phone 3', 'description': 'd', 'price': '90.00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.call('delete', self.owner).status_code, 204)
+        self.assertFalse(Product.objects.exists())
+
+    def test_non_owner_gets_403(self):
+        for user in (self.other, self.buyer):
+            for method, data in (('patch', {'title': 'x', 'price': '1.00'}),
+                                 ('put', {'title': 'x', 'description': 'd', 'price': '1.00'}),
+                                 ('delete', None)):
+                self.assertEqual(self.call(method, user, data).status_code, 403, (user, method))
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.title, self.product.price), ('Phone', Decimal('100.00')))
+
+    def test_ownership_is_resolved_in_the_product_query(self):
+        # Отказ — один запрос: поиск товара с флагом is_owned, без пользователя и профиля продавца
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.call('delete', self.other).status_code, 403)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('is_owned', queries[0]['sql'])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.call('delete', self.owner).status_code, 204)
+        self.assertIn('is_owned', queries[0]['sql'])
+        self.assertFalse(any('accounts_' in query['sql'] for query in queries))
+
+    def test_permission_uses_annotation(self):
+        request = mock.Mock(seller=mock.Mock(profile_id=self.product.seller_id, is_seller=True))
+        with self.assertNumQueries(1):
+            product = with_product_ownership(Product.objects.all(), request).get()
+        with self.assertNumQueries(0):
+            self.assertTrue(IsProductOwner().has_object_permission(request, None, product))
+            request.seller.profile_id += 1
+            self.assertTrue(IsProductOwner().has_object_permission(request, None, product))
+            # Без аннотации — сравнение seller_id, тоже без запросов
+            self.assertFalse(IsProductOwner().has_object_permission(request, None, self.product))
+
+
+class FieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seller_user = CustomUser.objects.create_user(email='seller@example.com', username='seller', password='x')
+        other_user = CustomUser.objects.create_user(email='other@example.com', username='other', password='x')
+        self.buyer = CustomUser.objects.create_user(email='buyer@example.com', username='buyer', password='x')
+        seller = SellerProfile.objects.create(user=seller_user, shop_name='Shop')
+        other = SellerProfile.objects.create(user=other_user, shop_name='Other')
+        self.products = [
+            Product.objects.create(seller=seller, title=f'Товар {i}', slug=f'product-{i}', description='d',
+                                   price=Decimal('10.00'), quantity=5)
+            for i in range(2)
+        ]
+        foreign = Product.objects.create(seller=other, title='Чужой', description='d', price=Decimal('5.00'))
+        ProductImage.objects.create(product=self.products[0], image='products/images/a.jpg')
+        ProductReview.objects.create(product=self.products[0], user=self.buyer, rating=5, title='t', comment='c',
+                                     is_approved=True)
+        # Два заказа с одинаковым статусом, в каждом по два товара продавца
+        self.orders = []
+        for i in range(2):
+            order = Order.objects.create(buyer=self.buyer, order_number=f'ORD-{i}', shipping_address='Ташкент',
+                                         shipping_phone='+998900000000', shipping_cost=Decimal('0.00'))
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=1, price=product.price)
+                for product in [*self.products, foreign]
+            ])
+            self.orders.append(order)
+        self.seller_headers = {'Authorization': f'Bearer {UserRefreshToken.for_user(seller_user).access_token}'}
+
+    def detail(self, **params):
+        request = RequestFactory().get('/api/v1/products/products/detail/', params)
+        response = ProductDetailView.as_view()(request, slug='product-0')
+        response.render()
+        return response
+
+    def test_fields_narrow_output_and_selected_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/products/products/', {'fields': 'price,id,title'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([list(row) for row in response.json()['results']], [['id', 'title', 'price']] * 3)
+        sql = [query['sql'] for query in queries if 'FROM "products_product"' in query['sql']][-1]
+        self.assertIn('"title"', sql)
+        for column in ('"description"', '"old_price"', '"quantity"'):
+            self.assertNotIn(column, sql)
+        # main_image не запрошен — изображения не загружаются
+        self.assertFalse(any('products_productimage' in query['sql'] for query in queries))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.detail(fields='id,title')
+        self.assertEqual(list(response.data), ['id', 'title'])
+        self.assertNotIn('"description"', queries[-1]['sql'])
+
+    def test_unknown_field_is_400(self):
+        response = self.client.get('/api/v1/products/products/', {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+        self.assertEqual(self.detail(expand='seller').status_code, 400)
+        response = self.client.get('/api/v1/products/orders/', {'expand': 'buyer'}, headers=self.seller_headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_expand_adds_nested_data(self):
+        self.assertEqual(list(self.detail(fields='id', expand='images').data), ['id', 'images'])
+        data = self.detail(fields='id', expand='images,reviews').data
+        self.assertEqual(data['images'][0]['image'], 'http://testserver/media/products/images/a.jpg')
+        self.assertEqual(data['reviews'][0]['rating'], 5)
+        # Без expand — все связи, пустой expand — ни одной
+        self.assertIn('reviews', self.detail().data)
+        self.assertFalse({'images', 'reviews'} & set(self.detail(expand='').data))
+
+        response = self.client.get('/api/v1/products/orders/', {'fields': 'id', 'expand': 'items'},
+                                   headers=self.seller_headers)
+        self.assertEqual([len(order['items']) for order in response.json()['results']], [3, 3])
+
+    def test_seller_orders_are_not_duplicated(self):
+        for params in ({}, {'fields': 'status'}, {'fields': 'id', 'expand': ''}):
+            response = self.client.get('/api/v1/products/orders/', params, headers=self.seller_headers)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertEqual((data['count'], len(data['results'])), (2, 2), params)
+        ids = [order['id'] for order in response.json()['results']]
+        self.assertEqual(sorted(ids), sorted(order.id for order in self.orders))
+
+
+class ProductBatchTests(TestCase):
+    url = '/api/v1/products/products/batch/'
+
+    def setUp(self):
+        cache.clear()
+        user = CustomUser.objects.create_user(email='seller@example.com', username='seller', password='x')
+        seller = SellerProfile.objects.create(user=user, shop_name='Shop')
+        self.products = [
+            Product.objects.create(seller=seller, title=f'Товар {i}', slug=f'product-{i}', description='d',
+                                   price=Decimal('10.00'), is_active=i < 2)
+            for i in range(3)
+        ]
+        ProductImage.objects.create(product=self.products[0], image='products/images/a.jpg')
+
+    def get(self, ids=(), slugs=(), **params):
+        params.update({key: ','.join(map(str, values)) for key, values in (('ids', ids), ('slugs', slugs)) if values})
+        return self.client.get(self.url, params)
+
+    def post(self, ids=(), slugs=(), **params):
+        url = self.url + ('?fields=' + params['fields'] if 'fields' in params else '')
+        return self.client.post(url, {'ids': list(ids), 'slugs': list(slugs)}, content_type='application/json')
+
+    def test_results_follow_request_order(self):
+        p0, p1, inactive = self.products
+        ids = [p1.id, 10 ** 6, p0.id]
+        slugs = ['missing', p0.slug, inactive.slug]
+        for call in (self.get, self.post):
+            response = call(ids, slugs, fields='id,slug,main_image')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['results'], [
+                {'id': p1.id, 'slug': p1.slug, 'main_image': None},
+                {'id': 10 ** 6, 'error': 'Товар не найден'},
+                {'id': p0.id, 'slug': p0.slug, 'main_image': 'http://testserver/media/products/images/a.jpg'},
+                {'slug': 'missing', 'error': 'Товар не найден'},
+                {'id': p0.id, 'slug': p0.slug, 'main_image': 'http://testserver/media/products/images/a.jpg'},
+                {'slug': inactive.slug, 'error': 'Товар не найден'},
+            ])
+
+    def test_get_and_post_match(self):
+        ids = [product.id for product in self.products]
+        self.assertEqual(self.get(ids, ['product-1']).json(), self.post(ids, ['product-1']).json())
+
+    def test_two_queries(self):
+        ids = [product.id for product in self.products]
+        for call in (self.get, self.post):
+            cache.clear()
+            with self.assertNumQueries(2):
+                response = call(ids, ['product-0', 'product-1'])
+            self.assertEqual(len(response.json()['results']), 5)
+
+    def test_invalid_requests(self):
+        for call in (self.get, self.post):
+            self.assertEqual(call().status_code, 400)
+            self.assertEqual(call(range(1, 151), [f'slug-{i}' for i in range(51)]).status_code, 400)
+            self.assertEqual(call(range(1, 151), [f'slug-{i}' for i in range(50)]).status_code, 200)
+        self.assertEqual(self.get(['abc']).status_code, 400)
+        self.assertEqual(self.get([1], fields='id,nope').status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    list_url = '/api/v1/products/products/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='buyer@example.com', username='buyer', password='x')
+        seller = SellerProfile.objects.create(
+            user=CustomUser.objects.create_user(email='seller@example.com', username='seller', password='x'),
+            shop_name='Shop',
+        )
+        self.product = Product.objects.create(seller=seller, title='Phone', slug='phone', description='d',
+                                              price=Decimal('100.00'), quantity=5)
+        self.headers = {'Authorization': f'Bearer {UserRefreshToken.for_user(self.user).access_token}'}
+
+    def detail(self, **headers):
+        request = RequestFactory().get('/api/v1/products/products/detail/', headers=headers)
+        # Browsable API проверяет права на PUT — нужен request.seller
+        response = SellerContextMiddleware(lambda r: ProductDetailView.as_view()(r, slug='phone'))(request)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def etags(self):
+        return self.client.get(self.list_url)['ETag'], self.detail()['ETag']
+
+    def test_etag_depends_on_renderer(self):
+        for get in (lambda **headers: self.client.get(self.list_url, headers=headers), self.detail):
+            json = get(accept='application/json')
+            html = get(accept='text/html')
+            self.assertEqual((json.status_code, html.status_code), (200, 200))
+            self.assertIn('html', html['Content-Type'])
+            self.assertNotEqual(json['ETag'], html['ETag'])
+            for response in (json, html):
+                self.assertIn('Accept', response['Vary'])
+
+            not_modified = get(accept='application/json', if_none_match=json['ETag'])
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertIn('Accept', not_modified['Vary'])
+            # ETag JSON-ответа не подходит для HTML
+            self.assertEqual(get(accept='text/html', if_none_match=json['ETag']).status_code, 200)
+
+    def test_product_save_changes_etag(self):
+        list_etag, detail_etag = self.etags()
+        self.assertEqual(self.client.get(self.list_url, headers={'if_none_match': list_etag}).status_code, 304)
+        self.assertEqual(self.detail(if_none_match=detail_etag).status_code, 304)
+
+        self.product.title = 'Phone 2'
+        self.product.save()
+        self.assertEqual(self.client.get(self.list_url, headers={'if_none_match': list_etag}).status_code, 200)
+        response = self.detail(if_none_match=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'Phone 2')
+
+    def test_checkout_changes_etag(self):
+        list_etag, detail_etag = self.etags()
+        cart.update_cart(self.user.id, {self.product.id: 2})
+        # Остатки списываются через UPDATE, версии обновляет touch() после коммита
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/products/cart/checkout/', {
+                'shipping_address': 'Ташкент', 'shipping_phone': '+998900000000',
+            }, content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.get(self.list_url, headers={'if_none_match': list_etag}).status_code, 200)
+        response = self.detail(if_none_match=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['quantity'], 3)
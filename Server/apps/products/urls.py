@@ -9,11 +9,16 @@ from .views import (
     # Товары
     ProductListView,
     ProductDetailView,
+    ProductBatchView,
     ProductByCategoryView,
     MyProductsView,
     ProductAddImageView,
     ProductAddReviewView,
     
+    # Корзина
+    CartView,
+    CartCheckoutView,
+    
     # Заказы
     OrderListView,
     OrderDetailView,
@@ -38,8 +43,11 @@ urlpatterns = [
     path('products/my/', MyProductsView.as_view(), name='my-products'),
     path('products/<int:product_id>/add-image/', ProductAddImageView.as_view(), name='product-add-image'),
     path('products/<int:product_id>/add-review/', ProductAddReviewView.as_view(), name='product-add-review'),  
+    path('products/batch/', ProductBatchView.as_view(), name='product-batch'),
     path('products/', ProductListView.as_view(), name='product-list'),
     path('products/detail/', ProductDetailView.as_view(), name='product-detail'),       
+    path('cart/', CartView.as_view(), name='cart'),
+    path('cart/checkout/', CartCheckoutView.as_view(), name='cart-checkout'),
     path('orders/', OrderListView.as_view(), name='order-list'),
     path('orders/detail/', OrderDetailView.as_view(), name='order-detail'),
     path('orders/<int:order_id>/cancel/', OrderCancelView.as_view(), name='order-cancel'),
@@ -1,3 +1,5 @@
+import hashlib
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -7,13 +9,64 @@ from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.http import http_date, quote_etag
 from .models import Category, Product, Order, OrderItem, ProductImage, ProductReview
 from .serializers import (
     CategorySerializer, ProductListSerializer, ProductDetailSerializer,
     ProductCreateUpdateSerializer, OrderSerializer, OrderCreateSerializer,
-    ProductImageSerializer, ProductReviewSerializer
+    ProductImageSerializer, ProductReviewSerializer, ProductBatchSerializer, active_children_map,
+    CartSerializer, CartUpdateSerializer, CartCheckoutSerializer,
+    ProductListValues, ProductReviewValues, OrderValues, product_detail_queryset, order_detail_queryset
+)
+from .permissions import (
+    IsSellerOrReadOnly, IsOrderOwner, with_product_ownership, with_order_seller_access
+)
+from . import cart
+from .conditional import (
+    conditional_get, representation_etag, request_validators, single_flight, validators, versions,
 )
-from .permissions import IsSellerOrReadOnly, IsOrderOwner
+from common.instrumentation import serializer_data
+from common.serializers import fieldset_params
+
+
+FIELDS_PARAMETER = openapi.Parameter(
+    'fields', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+    description="Только эти поля, через запятую (например, id,title,price,main_image)",
+)
+EXPAND_PARAMETER = openapi.Parameter(
+    'expand', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+    description="Вложенные связи, через запятую; без параметра — все, пустое значение — ни одной",
+)
+
+
+def category_tree_validators(request, *args, **kwargs):
+    return validators('categories', request.path, timestamps=versions('categories'))
+
+
+def product_list_validators(request, *args, **kwargs):
+    # Ссылки на изображения абсолютные — учитываем хост
+    return validators(
+        'products', request.get_host(), request.get_full_path(),
+        timestamps=versions('products'),
+    )
+
+
+def product_detail_validators(request, slug, *args, **kwargs):
+    row = Product.objects.filter(slug=slug, is_active=True).values_list('id', 'updated_at').first()
+    if row is None:
+        return None
+    product_id, updated_at = row
+    # ?fields=&expand= меняют ответ
+    return validators(
+        'product', product_id, request.get_host(), request.get_full_path(),
+        timestamps=[updated_at.timestamp(), *versions(f'product:{product_id}', 'categories', 'users')],
+    )
+
+
+def product_detail_cache_key(request, slug):
+    raw = '|'.join((slug, request.get_host(), request.get_full_path()))
+    return f'catalog:response:product:{hashlib.md5(raw.encode()).hexdigest()}'
 
 
 # ==================== КАТЕГОРИИ ====================
@@ -28,10 +81,11 @@ class CategoryListView(APIView):
         operation_description="Получить список всех активных категорий",
         responses={200: CategorySerializer(many=True)}
     )
+    @conditional_get(category_tree_validators)
     def get(self, request):
-        categories = Category.objects.filter(is_active=True)
-        serializer = CategorySerializer(categories, many=True)
-        return Response(serializer.data)
+        categories = list(Category.objects.filter(is_active=True))
+        serializer = CategorySerializer(categories, many=True, context={'children': active_children_map(categories)})
+        return Response(serializer_data(serializer))
     
     @swagger_auto_schema(
         operation_description="Создать новую категорию",
@@ -42,7 +96,7 @@ class CategoryListView(APIView):
         serializer = CategorySerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(serializer_data(serializer), status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -59,7 +113,7 @@ class CategoryDetailView(APIView):
     def get(self, request, slug):
         category = get_object_or_404(Category, slug=slug, is_active=True)
         serializer = CategorySerializer(category)
-        return Response(serializer.data)
+        return Response(serializer_data(serializer))
     
     @swagger_auto_schema(
         operation_description="Обновить категорию",
@@ -71,7 +125,7 @@ class CategoryDetailView(APIView):
         serializer = CategorySerializer(category, data=request.data)
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data)
+            return Response(serializer_data(serializer))
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @swagger_auto_schema(
@@ -84,7 +138,7 @@ class CategoryDetailView(APIView):
         serializer = CategorySerializer(category, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data)
+            return Response(serializer_data(serializer))
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @swagger_auto_schema(
@@ -107,10 +161,11 @@ class RootCategoriesView(APIView):
         operation_description="Получить все корневые категории",
         responses={200: CategorySerializer(many=True)}
     )
+    @conditional_get(category_tree_validators)
     def get(self, request):
-        categories = Category.objects.filter(is_active=True, parent=None)
-        serializer = CategorySerializer(categories, many=True)
-        return Response(serializer.data)
+        children_map = active_children_map(Category.objects.filter(is_active=True))
+        serializer = CategorySerializer(children_map.get(None, []), many=True, context={'children': children_map})
+        return Response(serializer_data(serializer))
 
 
 class CategorySubcategoriesView(APIView):
@@ -125,9 +180,9 @@ class CategorySubcategoriesView(APIView):
     )
     def get(self, request, slug):
         category = get_object_or_404(Category, slug=slug, is_active=True)
-        subcategories = category.children.filter(is_active=True)
-        serializer = CategorySerializer(subcategories, many=True)
-        return Response(serializer.data)
+        children_map = active_children_map(Category.objects.filter(is_active=True))
+        serializer = CategorySerializer(children_map.get(category.id, []), many=True, context={'children': children_map})
+        return Response(serializer_data(serializer))
 
 
 # ==================== ТОВАРЫ ====================
@@ -147,11 +202,15 @@ class ProductListView(APIView):
             openapi.Parameter('max_price', openapi.IN_QUERY, description="Максимальная цена", type=openapi.TYPE_NUMBER),
             openapi.Parameter('ordering', openapi.IN_QUERY, description="Сортировка (price, -price, created_at)", type=openapi.TYPE_STRING),
             openapi.Parameter('page', openapi.IN_QUERY, description="Номер страницы", type=openapi.TYPE_INTEGER),
+            FIELDS_PARAMETER,
         ],
         responses={200: ProductListSerializer(many=True)}
     )
+    @conditional_get(product_list_validators)
     def get(self, request):
-        products = Product.objects.filter(is_active=True).select_related('category', 'seller')
+        fields, _ = fieldset_params(request.query_params)
+        serializer = ProductListValues(context={'request': request}, fields=fields)
+        products = serializer.values(Product.objects.filter(is_active=True))
         
         # Фильтрация по категории
         category_id = request.query_params.get('category')
@@ -180,13 +239,13 @@ class ProductListView(APIView):
         paginator = Paginator(products, 20)
         page_obj = paginator.get_page(page_number)
         
-        serializer = ProductListSerializer(page_obj, many=True, context={'request': request})
+        results = serializer.serialize(page_obj)
         
         return Response({
             'count': paginator.count,
             'next': page_obj.has_next() and page_obj.next_page_number() or None,
             'previous': page_obj.has_previous() and page_obj.previous_page_number() or None,
-            'results': serializer.data
+            'results': results
         })
     
     @swagger_auto_schema(
@@ -195,7 +254,7 @@ class ProductListView(APIView):
         responses={201: ProductDetailSerializer()}
     )
     def post(self, request):
-        if not hasattr(request.user, 'seller_profile'):
+        if not request.seller.is_seller:
             return Response(
                 {'error': 'Только продавцы могут создавать товары'},
                 status=status.HTTP_403_FORBIDDEN
@@ -203,9 +262,9 @@ class ProductListView(APIView):
         
         serializer = ProductCreateUpdateSerializer(data=request.data)
         if serializer.is_valid():
-            product = serializer.save(seller=request.user.seller_profile)
+            product = serializer.save(seller_id=request.seller.profile_id)
             detail_serializer = ProductDetailSerializer(product, context={'request': request})
-            return Response(detail_serializer.data, status=status.HTTP_201_CREATED)
+            return Response(serializer_data(detail_serializer), status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -217,16 +276,32 @@ class ProductDetailView(APIView):
     
     @swagger_auto_schema(
         operation_description="Получить детали товара",
+        manual_parameters=[FIELDS_PARAMETER, EXPAND_PARAMETER],
         responses={200: ProductDetailSerializer()}
     )
+    @conditional_get(product_detail_validators)
     def get(self, request, slug):
-        product = get_object_or_404(
-            Product.objects.select_related('category', 'seller'),
-            slug=slug,
-            is_active=True
-        )
-        serializer = ProductDetailSerializer(product, context={'request': request})
-        return Response(serializer.data)
+        fields, expand = fieldset_params(request.query_params)
+        serializer = ProductDetailSerializer(context={'request': request}, fields=fields, expand=expand)
+
+        def render():
+            serializer.instance = get_object_or_404(
+                product_detail_queryset(Product.objects.all(), serializer),
+                slug=slug,
+                is_active=True
+            )
+            return serializer_data(serializer)
+
+        current = request_validators(request)
+        if current is None:
+            return Response(render())
+        # Популярную карточку пересчитывает один воркер (conditional.single_flight)
+        data, (etag, last_modified) = single_flight(product_detail_cache_key(request, slug), current, render)
+        response = Response(data)
+        # Устаревшая копия отдается со своими валидаторами
+        response['ETag'] = quote_etag(representation_etag(request, etag))
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
     
     @swagger_auto_schema(
         operation_description="Обновить товар",
@@ -234,10 +309,10 @@ class ProductDetailView(APIView):
         responses={200: ProductDetailSerializer()}
     )
     def put(self, request, slug):
-        product = get_object_or_404(Product, slug=slug)
+        product = get_object_or_404(with_product_ownership(Product.objects.all(), request), slug=slug)
         
-        # Проверка прав доступа
-        if not hasattr(request.user, 'seller_profile') or product.seller != request.user.seller_profile:
+        # Проверка прав доступа (is_owned вычислен в запросе выше)
+        if not product.is_owned:
             return Response(
                 {'error': 'У вас нет прав на редактирование этого товара'},
                 status=status.HTTP_403_FORBIDDEN
@@ -247,7 +322,7 @@ class ProductDetailView(APIView):
         if serializer.is_valid():
             serializer.save()
             detail_serializer = ProductDetailSerializer(product, context={'request': request})
-            return Response(detail_serializer.data)
+            return Response(serializer_data(detail_serializer))
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @swagger_auto_schema(
@@ -256,10 +331,10 @@ class ProductDetailView(APIView):
         responses={200: ProductDetailSerializer()}
     )
     def patch(self, request, slug):
-        product = get_object_or_404(Product, slug=slug)
+        product = get_object_or_404(with_product_ownership(Product.objects.all(), request), slug=slug)
         
-        # Проверка прав доступа
-        if not hasattr(request.user, 'seller_profile') or product.seller != request.user.seller_profile:
+        # Проверка прав доступа (is_owned вычислен в запросе выше)
+        if not product.is_owned:
             return Response(
                 {'error': 'У вас нет прав на редактирование этого товара'},
                 status=status.HTTP_403_FORBIDDEN
@@ -269,7 +344,7 @@ class ProductDetailView(APIView):
         if serializer.is_valid():
             serializer.save()
             detail_serializer = ProductDetailSerializer(product, context={'request': request})
-            return Response(detail_serializer.data)
+            return Response(serializer_data(detail_serializer))
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @swagger_auto_schema(
@@ -277,10 +352,10 @@ class ProductDetailView(APIView):
         responses={204: 'Товар удален'}
     )
     def delete(self, request, slug):
-        product = get_object_or_404(Product, slug=slug)
+        product = get_object_or_404(with_product_ownership(Product.objects.all(), request), slug=slug)
         
-        # Проверка прав доступа
-        if not hasattr(request.user, 'seller_profile') or product.seller != request.user.seller_profile:
+        # Проверка прав доступа (is_owned вычислен в запросе выше)
+        if not product.is_owned:
             return Response(
                 {'error': 'У вас нет прав на удаление этого товара'},
                 status=status.HTTP_403_FORBIDDEN
@@ -290,6 +365,64 @@ class ProductDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class ProductBatchView(APIView):
+    """
+    Несколько товаров за один запрос: один запрос IN по id/slug и один
+    на главные изображения. Результаты — в порядке запроса (сначала ids,
+    затем slugs), для ненайденных — {'id' или 'slug', 'error'}
+    """
+    permission_classes = [AllowAny]
+    
+    @swagger_auto_schema(
+        operation_description="Получить несколько товаров по id и/или slug",
+        manual_parameters=[
+            openapi.Parameter('ids', openapi.IN_QUERY, description="ID товаров через запятую", type=openapi.TYPE_STRING),
+            openapi.Parameter('slugs', openapi.IN_QUERY, description="Slug товаров через запятую", type=openapi.TYPE_STRING),
+            FIELDS_PARAMETER,
+        ],
+        responses={200: ProductListSerializer(many=True)}
+    )
+    @conditional_get(product_list_validators)
+    def get(self, request):
+        data = {
+            key: [value.strip() for value in request.query_params[key].split(',') if value.strip()]
+            for key in ('ids', 'slugs') if key in request.query_params
+        }
+        return self._batch(request, data)
+    
+    @swagger_auto_schema(
+        operation_description="Получить несколько товаров по id и/или slug (длинные списки)",
+        manual_parameters=[FIELDS_PARAMETER],
+        request_body=ProductBatchSerializer,
+        responses={200: ProductListSerializer(many=True)}
+    )
+    def post(self, request):
+        return self._batch(request, request.data)
+    
+    def _batch(self, request, data):
+        serializer = ProductBatchSerializer(data=data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        ids = serializer.validated_data['ids']
+        slugs = serializer.validated_data['slugs']
+        
+        fields, _ = fieldset_params(request.query_params)
+        values = ProductListValues(context={'request': request}, fields=fields)
+        rows = list(values.values(
+            Product.objects.filter(Q(id__in=ids) | Q(slug__in=slugs), is_active=True), 'id', 'slug'
+        ))
+        products = dict(zip((row['id'] for row in rows), values.serialize(rows)))
+        by_slug = {row['slug']: row['id'] for row in rows}
+        
+        not_found = 'Товар не найден'
+        results = [products[pk] if pk in products else {'id': pk, 'error': not_found} for pk in ids]
+        results += [
+            products[by_slug[slug]] if slug in by_slug else {'slug': slug, 'error': not_found}
+            for slug in slugs
+        ]
+        return Response({'results': results})
+
+
 class ProductByCategoryView(APIView):
     """
     Получить товары по категории
@@ -298,27 +431,30 @@ class ProductByCategoryView(APIView):
     
     @swagger_auto_schema(
         operation_description="Получить товары конкретной категории",
+        manual_parameters=[FIELDS_PARAMETER],
         responses={200: ProductListSerializer(many=True)}
     )
     def get(self, request, category_slug):
+        fields, _ = fieldset_params(request.query_params)
+        serializer = ProductListValues(context={'request': request}, fields=fields)
         category = get_object_or_404(Category, slug=category_slug, is_active=True)
-        products = Product.objects.filter(
+        products = serializer.values(Product.objects.filter(
             category=category,
             is_active=True
-        ).select_related('category', 'seller')
+        ))
         
         # Пагинация
         page_number = request.query_params.get('page', 1)
         paginator = Paginator(products, 20)
         page_obj = paginator.get_page(page_number)
         
-        serializer = ProductListSerializer(page_obj, many=True, context={'request': request})
+        results = serializer.serialize(page_obj)
         
         return Response({
             'count': paginator.count,
             'next': page_obj.has_next() and page_obj.next_page_number() or None,
             'previous': page_obj.has_previous() and page_obj.previous_page_number() or None,
-            'results': serializer.data
+            'results': results
         })
 
 
@@ -330,31 +466,34 @@ class MyProductsView(APIView):
     
     @swagger_auto_schema(
         operation_description="Получить товары текущего продавца",
+        manual_parameters=[FIELDS_PARAMETER],
         responses={200: ProductListSerializer(many=True)}
     )
     def get(self, request):
-        if not hasattr(request.user, 'seller_profile'):
+        if not request.seller.is_seller:
             return Response(
                 {'error': 'У вас нет профиля продавца'},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        products = Product.objects.filter(
-            seller=request.user.seller_profile
-        ).select_related('category')
+        fields, _ = fieldset_params(request.query_params)
+        serializer = ProductListValues(context={'request': request}, fields=fields)
+        products = serializer.values(Product.objects.filter(
+            seller_id=request.seller.profile_id
+        ))
         
         # Пагинация
         page_number = request.query_params.get('page', 1)
         paginator = Paginator(products, 20)
         page_obj = paginator.get_page(page_number)
         
-        serializer = ProductListSerializer(page_obj, many=True, context={'request': request})
+        results = serializer.serialize(page_obj)
         
         return Response({
             'count': paginator.count,
             'next': page_obj.has_next() and page_obj.next_page_number() or None,
             'previous': page_obj.has_previous() and page_obj.previous_page_number() or None,
-            'results': serializer.data
+            'results': results
         })
 
 
@@ -370,10 +509,10 @@ class ProductAddImageView(APIView):
         responses={201: ProductImageSerializer()}
     )
     def post(self, request, slug):
-        product = get_object_or_404(Product, slug=slug)
+        product = get_object_or_404(with_product_ownership(Product.objects.all(), request), slug=slug)
         
-        # Проверка прав доступа
-        if not hasattr(request.user, 'seller_profile') or product.seller != request.user.seller_profile:
+        # Проверка прав доступа (is_owned вычислен в запросе выше)
+        if not product.is_owned:
             return Response(
                 {'error': 'У вас нет прав на добавление изображений к этому товару'},
                 status=status.HTTP_403_FORBIDDEN
@@ -382,7 +521,7 @@ class ProductAddImageView(APIView):
         serializer = ProductImageSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save(product=product)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(serializer_data(serializer), status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -402,11 +541,81 @@ class ProductAddReviewView(APIView):
         
         serializer = ProductReviewSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(product=product, user=request.user)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            serializer.save(product=product, user_id=request.user.id)
+            return Response(serializer_data(serializer), status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+# ==================== КОРЗИНА ====================
+
+class CartView(APIView):
+    """
+    Корзина текущего пользователя
+    """
+    permission_classes = [IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Получить корзину с проверенными ценами и наличием",
+        responses={200: CartSerializer()}
+    )
+    def get(self, request):
+        return Response(serializer_data(CartSerializer(cart.get_cart(request.user.id))))
+    
+    @swagger_auto_schema(
+        operation_description="Изменить количество товаров в корзине (0 — удалить)",
+        request_body=CartUpdateSerializer,
+        responses={200: CartSerializer()}
+    )
+    def post(self, request):
+        serializer = CartUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        changes = {item['product_id']: item['quantity'] for item in serializer.validated_data['items']}
+        try:
+            state = cart.update_cart(request.user.id, changes)
+        except cart.CartError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer_data(CartSerializer(state)))
+    
+    @swagger_auto_schema(
+        operation_description="Очистить корзину",
+        responses={204: 'Корзина очищена'}
+    )
+    def delete(self, request):
+        cart.clear_cart(request.user.id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CartCheckoutView(APIView):
+    """
+    Оформить заказ из корзины
+    """
+    permission_classes = [IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Оформить заказ из корзины",
+        request_body=CartCheckoutSerializer,
+        responses={201: OrderSerializer(), 409: CartSerializer()}
+    )
+    def post(self, request):
+        serializer = CartCheckoutSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            order = cart.checkout(request.user.id, **serializer.validated_data)
+        except cart.CartChanged as exc:
+            return Response(
+                {'error': str(exc), 'cart': serializer_data(CartSerializer(exc.cart))},
+                status=status.HTTP_409_CONFLICT
+            )
+        except cart.CartError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        order_values = OrderValues()
+        order_data = order_values.serialize(order_values.values(Order.objects.filter(id=order.id)))[0]
+        return Response(order_data, status=status.HTTP_201_CREATED)
+
+
 # ==================== ЗАКАЗЫ ====================
 
 class OrderListView(APIView):
@@ -417,32 +626,32 @@ class OrderListView(APIView):
     
     @swagger_auto_schema(
         operation_description="Получить список заказов пользователя",
+        manual_parameters=[FIELDS_PARAMETER, EXPAND_PARAMETER],
         responses={200: OrderSerializer(many=True)}
     )
     def get(self, request):
-        if hasattr(request.user, 'seller_profile'):
-            # Продавец видит заказы со своими товарами
-            orders = Order.objects.filter(
-                items__product__seller=request.user.seller_profile
-            ).distinct().prefetch_related('items', 'items__product')
+        fields, expand = fieldset_params(request.query_params)
+        serializer = OrderValues(fields=fields, expand=expand)
+        if request.seller.is_seller:
+            # Продавец видит заказы со своими товарами. Подзапрос вместо
+            # distinct(): DISTINCT по выбранным ?fields= колонкам склеил бы разные заказы
+            orders = serializer.values(Order.objects.filter(id__in=OrderItem.objects.filter(
+                product__seller_id=request.seller.profile_id
+            ).values('order_id')))
         else:
             # Покупатель видит только свои заказы
-            orders = Order.objects.filter(
-                buyer=request.user
-            ).prefetch_related('items', 'items__product')
+            orders = serializer.values(Order.objects.filter(buyer_id=request.user.id))
         
         # Пагинация
         page_number = request.query_params.get('page', 1)
         paginator = Paginator(orders, 20)
         page_obj = paginator.get_page(page_number)
         
-        serializer = OrderSerializer(page_obj, many=True)
-        
         return Response({
             'count': paginator.count,
             'next': page_obj.has_next() and page_obj.next_page_number() or None,
             'previous': page_obj.has_previous() and page_obj.previous_page_number() or None,
-            'results': serializer.data
+            'results': serializer.serialize(page_obj)
         })
     
     @swagger_auto_schema(
@@ -455,7 +664,7 @@ class OrderListView(APIView):
         if serializer.is_valid():
             order = serializer.save()
             order_serializer = OrderSerializer(order)
-            return Response(order_serializer.data, status=status.HTTP_201_CREATED)
+            return Response(serializer_data(order_serializer), status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -467,25 +676,27 @@ class OrderDetailView(APIView):
     
     @swagger_auto_schema(
         operation_description="Получить детали заказа",
+        manual_parameters=[FIELDS_PARAMETER, EXPAND_PARAMETER],
         responses={200: OrderSerializer()}
     )
     def get(self, request, pk):
+        fields, expand = fieldset_params(request.query_params)
+        serializer = OrderSerializer(fields=fields, expand=expand)
         order = get_object_or_404(
-            Order.objects.prefetch_related('items', 'items__product'),
+            with_order_seller_access(order_detail_queryset(Order.objects.all(), serializer, 'buyer'), request),
             pk=pk
         )
         
         # Проверка прав доступа
-        if order.buyer != request.user:
-            if not (hasattr(request.user, 'seller_profile') and 
-                    order.items.filter(product__seller=request.user.seller_profile).exists()):
+        if order.buyer_id != request.user.id:
+            if not order.has_seller_items:
                 return Response(
                     {'error': 'У вас нет доступа к этому заказу'},
                     status=status.HTTP_403_FORBIDDEN
                 )
         
-        serializer = OrderSerializer(order)
-        return Response(serializer.data)
+        serializer.instance = order
+        return Response(serializer_data(serializer))
 
 
 class OrderCancelView(APIView):
@@ -502,7 +713,7 @@ class OrderCancelView(APIView):
         order = get_object_or_404(Order, pk=pk)
         
         # Проверка прав доступа
-        if order.buyer != request.user:
+        if order.buyer_id != request.user.id:
             return Response(
                 {'error': 'Только покупатель может отменить заказ'},
                 status=status.HTTP_403_FORBIDDEN
@@ -524,7 +735,7 @@ class OrderCancelView(APIView):
         order.save(update_fields=['status', 'updated_at'])
         
         serializer = OrderSerializer(order)
-        return Response(serializer.data)
+        return Response(serializer_data(serializer))
 
 
 class OrderRefundView(APIView):
@@ -541,7 +752,7 @@ class OrderRefundView(APIView):
         order = get_object_or_404(Order, pk=pk)
         
         # Проверка прав доступа
-        if order.buyer != request.user:
+        if order.buyer_id != request.user.id:
             return Response(
                 {'error': 'Только покупатель может запросить возврат'},
                 status=status.HTTP_403_FORBIDDEN
@@ -557,7 +768,7 @@ class OrderRefundView(APIView):
         order.save(update_fields=['status', 'updated_at'])
         
         serializer = OrderSerializer(order)
-        return Response(serializer.data)
+        return Response(serializer_data(serializer))
 
 
 class OrderUpdateStatusView(APIView):
@@ -581,16 +792,15 @@ class OrderUpdateStatusView(APIView):
         responses={200: OrderSerializer()}
     )
     def patch(self, request, pk):
-        order = get_object_or_404(Order, pk=pk)
-        
         # Проверка, что пользователь - продавец товаров в заказе
-        if not hasattr(request.user, 'seller_profile'):
+        if not request.seller.is_seller:
             return Response(
                 {'error': 'Только продавец может обновлять статус'},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        if not order.items.filter(product__seller=request.user.seller_profile).exists():
+        order = get_object_or_404(with_order_seller_access(Order.objects.all(), request), pk=pk)
+        if not order.has_seller_items:
             return Response(
                 {'error': 'У вас нет прав на обновление этого заказа'},
                 status=status.HTTP_403_FORBIDDEN
@@ -607,7 +817,7 @@ class OrderUpdateStatusView(APIView):
         order.save(update_fields=['status', 'updated_at'])
         
         serializer = OrderSerializer(order)
-        return Response(serializer.data)
+        return Response(serializer_data(serializer))
 
 
 # ==================== ОТЗЫВЫ ====================
@@ -627,7 +837,8 @@ class ReviewListView(APIView):
         responses={200: ProductReviewSerializer(many=True)}
     )
     def get(self, request):
-        reviews = ProductReview.objects.filter(is_approved=True)
+        serializer = ProductReviewValues()
+        reviews = serializer.values(ProductReview.objects.filter(is_approved=True))
         
         # Фильтрация по товару
         product_id = request.query_params.get('product')
@@ -646,13 +857,11 @@ class ReviewListView(APIView):
         paginator = Paginator(reviews, 20)
         page_obj = paginator.get_page(page_number)
         
-        serializer = ProductReviewSerializer(page_obj, many=True)
-        
         return Response({
             'count': paginator.count,
             'next': page_obj.has_next() and page_obj.next_page_number() or None,
             'previous': page_obj.has_previous() and page_obj.previous_page_number() or None,
-            'results': serializer.data
+            'results': serializer.serialize(page_obj)
         })
 
 
@@ -667,9 +876,11 @@ class MyReviewsView(APIView):
         responses={200: ProductReviewSerializer(many=True)}
     )
     def get(self, request):
-        reviews = ProductReview.objects.filter(user=request.user).order_by('-created_at')
-        serializer = ProductReviewSerializer(reviews, many=True)
-        return Response(serializer.data)
+        serializer = ProductReviewValues()
+        reviews = serializer.values(
+            ProductReview.objects.filter(user_id=request.user.id).order_by('-created_at')
+        )
+        return Response(serializer.serialize(reviews))
 
 
 class ReviewDetailView(APIView):
@@ -685,7 +896,7 @@ class ReviewDetailView(APIView):
     def get(self, request, pk):
         review = get_object_or_404(ProductReview, pk=pk)
         serializer = ProductReviewSerializer(review)
-        return Response(serializer.data)
+        return Response(serializer_data(serializer))
     
     @swagger_auto_schema(
         operation_description="Обновить отзыв",
@@ -696,7 +907,7 @@ class ReviewDetailView(APIView):
         review = get_object_or_404(ProductReview, pk=pk)
         
         # Проверка прав доступа
-        if review.user != request.user:
+        if review.user_id != request.user.id:
             return Response(
                 {'error': 'У вас нет прав на редактирование этого отзыва'},
                 status=status.HTTP_403_FORBIDDEN
@@ -705,7 +916,7 @@ class ReviewDetailView(APIView):
         serializer = ProductReviewSerializer(review, data=request.data)
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data)
+            return Response(serializer_data(serializer))
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @swagger_auto_schema(
@@ -717,7 +928,7 @@ class ReviewDetailView(APIView):
         review = get_object_or_404(ProductReview, pk=pk)
         
         # Проверка прав доступа
-        if review.user != request.user:
+        if review.user_id != request.user.id:
             return Response(
                 {'error': 'У вас нет прав на редактирование этого отзыва'},
                 status=status.HTTP_403_FORBIDDEN
@@ -726,7 +937,7 @@ class ReviewDetailView(APIView):
         serializer = ProductReviewSerializer(review, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data)
+            return Response(serializer_data(serializer))
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @swagger_auto_schema(
@@ -737,7 +948,7 @@ class ReviewDetailView(APIView):
         review = get_object_or_404(ProductReview, pk=pk)
         
         # Проверка прав доступа
-        if review.user != request.user:
+        if review.user_id != request.user.id:
             return Response(
                 {'error': 'У вас нет прав на удаление этого отзыва'},
                 status=status.HTTP_403_FORBIDDEN
@@ -0,0 +1,159 @@
+"""
+Архивация старых сообщений чата.
+
+Сообщения старше SUPPORT_RETENTION['ARCHIVE_AFTER_DAYS'] переносятся
+в MessageArchive блоками (один блок — подряд идущие сообщения одного
+чата, сжатый JSON) и удаляются из Message. Каждый пакет — отдельная
+короткая транзакция, чтобы не держать долгие блокировки.
+
+Последнее сообщение чата (Chat.last_message) не архивируется, поэтому
+в каждом чате архивные сообщения всегда старше оперативных — история
+читается сначала из Message, затем из архива (см. pagination.py).
+"""
+import json
+import time
+import zlib
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Chat, Message, MessageArchive
+
+DEFAULTS = {
+    'ARCHIVE_AFTER_DAYS': 180,
+    'BATCH_SIZE': 500,
+}
+
+
+def retention_settings():
+    return {**DEFAULTS, **getattr(settings, 'SUPPORT_RETENTION', {})}
+
+
+def _pack(rows):
+    data = [
+        [row['id'], row['sender_id'], row['content'], row['created_at'].isoformat()]
+        for row in rows
+    ]
+    return zlib.compress(json.dumps(data, ensure_ascii=False).encode())
+
+
+def unpack(block):
+    """Сообщения блока в порядке (created_at, id)"""
+    data = json.loads(zlib.decompress(bytes(block.payload)))
+    return [
+        Message(
+            id=message_id,
+            chat_id=block.chat_id,
+            sender_id=sender_id,
+            content=content,
+            created_at=datetime.fromisoformat(created_at),
+        )
+        for message_id, sender_id, content, created_at in data
+    ]
+
+
+def _archive_batch(cutoff, batch_size):
+    is_last_message = Exists(Chat.objects.filter(last_message_id=OuterRef('pk')))
+    with transaction.atomic():
+        rows = list(
+            Message.objects.filter(created_at__lt=cutoff)
+            .filter(~is_last_message)
+            .order_by('chat_id', 'created_at', 'id')
+            .select_for_update(skip_locked=True)
+            .values('id', 'chat_id', 'sender_id', 'content', 'created_at')[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        blocks = []
+        for chat_id, chat_rows in groupby(rows, key=lambda row: row['chat_id']):
+            chat_rows = list(chat_rows)
+            ids = [row['id'] for row in chat_rows]
+            blocks.append(MessageArchive(
+                chat_id=chat_id,
+                first_created_at=chat_rows[0]['created_at'],
+                first_id=chat_rows[0]['id'],
+                last_created_at=chat_rows[-1]['created_at'],
+                last_id=chat_rows[-1]['id'],
+                min_message_id=min(ids),
+                max_message_id=max(ids),
+                message_count=len(chat_rows),
+                payload=_pack(chat_rows),
+            ))
+        MessageArchive.objects.bulk_create(blocks)
+        Message.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def archive_messages(older_than=None, batch_size=None, pause=0.0):
+    """
+    Перенести в архив сообщения старше older_than (по умолчанию —
+    ARCHIVE_AFTER_DAYS дней). Возвращает число перенесенных сообщений
+    """
+    config = retention_settings()
+    if older_than is None:
+        older_than = timedelta(days=config['ARCHIVE_AFTER_DAYS'])
+    batch_size = batch_size or config['BATCH_SIZE']
+    cutoff = timezone.now() - older_than
+
+    total = 0
+    while True:
+        archived = _archive_batch(cutoff, batch_size)
+        total += archived
+        if archived < batch_size:
+            return total
+        if pause:
+            time.sleep(pause)
+
+
+def archived_before(chat_id, position=None, limit=50):
+    """
+    Архивные сообщения чата старше позиции (created_at, id), от новых
+    к старым. Блоки читаются по одному, пока не наберется limit
+    """
+    blocks = MessageArchive.objects.filter(chat_id=chat_id)
+    if position is not None:
+        created_at, message_id = position
+        blocks = blocks.filter(
+            Q(first_created_at__lt=created_at) | Q(first_created_at=created_at, first_id__lt=message_id)
+        )
+    result = []
+    for block in blocks.order_by('-last_created_at', '-last_id').iterator(chunk_size=4):
+        for message in reversed(unpack(block)):
+            if position is None or (message.created_at, message.id) < position:
+                result.append(message)
+                if len(result) >= limit:
+                    return result
+    return result
+
+
+def archived_after(chat_id, position, limit):
+    """Архивные сообщения чата новее позиции (created_at, id), в порядке отправки"""
+    created_at, message_id = position
+    blocks = MessageArchive.objects.filter(chat_id=chat_id).filter(
+        Q(last_created_at__gt=created_at) | Q(last_created_at=created_at, last_id__gt=message_id)
+    )
+    result = []
+    for block in blocks.order_by('last_created_at', 'last_id').iterator(chunk_size=4):
+        for message in unpack(block):
+            if (message.created_at, message.id) > position:
+                result.append(message)
+                if len(result) >= limit:
+                    return result
+    return result
+
+
+def find_archived(chat_id, message_id):
+    """Архивное сообщение по id или None"""
+    blocks = MessageArchive.objects.filter(
+        chat_id=chat_id, min_message_id__lte=message_id, max_message_id__gte=message_id,
+    )
+    for block in blocks.iterator(chunk_size=4):
+        for message in unpack(block):
+            if message.id == message_id:
+                return message
+    return None
@@ -0,0 +1,155 @@
+"""
+WebSocket-обработчик чата поддержки (чистый ASGI, без сторонних библиотек).
+
+Клиент подключается к /ws/support/chats/<chat_id>/?token=<access JWT>,
+получает новые сообщения чата в реальном времени и может отправлять
+свои: {"content": "..."}.
+"""
+import asyncio
+import json
+import logging
+import re
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .layers import chat_group, get_channel_layer
+from .models import Chat
+from .services import send_message
+
+logger = logging.getLogger(__name__)
+
+CHAT_PATH = re.compile(r'^/ws/support/chats/(?P<chat_id>\d+)/$')
+
+# Коды закрытия WebSocket
+CLOSE_NOT_FOUND = 4404
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_FORBIDDEN = 4403
+
+MAX_MESSAGE_LENGTH = 5000
+
+
+def database_sync_to_async(func):
+    """sync_to_async для ORM: закрывает устаревшие соединения вокруг вызова"""
+
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(inner, thread_sensitive=True)
+
+
+def _user_id_from_scope(scope):
+    params = parse_qs(scope.get('query_string', b'').decode())
+    raw_token = (params.get('token') or [None])[0]
+    if not raw_token:
+        return None
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return None
+    # Подписанный токен без id пользователя — тоже 4401, а не исключение
+    try:
+        return int(token.get(api_settings.USER_ID_CLAIM))
+    except (TypeError, ValueError):
+        return None
+
+
+@database_sync_to_async
+def _is_participant(chat_id, user_id):
+    return Chat.objects.for_user(user_id).filter(id=chat_id).exists()
+
+
+class ChatConsumer:
+    """Одно WebSocket-соединение с чатом"""
+
+    def __init__(self, scope, receive, send, chat_id):
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        self.chat_id = chat_id
+        self.group = chat_group(chat_id)
+        self.layer = get_channel_layer()
+        self.channel = None
+        self.user_id = None
+
+    async def run(self):
+        event = await self.receive()
+        if event['type'] != 'websocket.connect':
+            return
+
+        self.user_id = _user_id_from_scope(self.scope)
+        if self.user_id is None:
+            await self.send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+            return
+        # Участие проверяется один раз при подключении
+        if not await _is_participant(self.chat_id, self.user_id):
+            await self.send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+            return
+
+        self.channel = self.layer.new_channel()
+        await self.layer.group_add(self.group, self.channel)
+        await self.send({'type': 'websocket.accept'})
+        try:
+            await self._loop()
+        finally:
+            await self.layer.group_discard(self.group, self.channel)
+            self.layer.close_channel(self.channel)
+
+    async def _loop(self):
+        client = asyncio.ensure_future(self.receive())
+        layer = asyncio.ensure_future(self.layer.receive(self.channel))
+        try:
+            while True:
+                done, _ = await asyncio.wait({client, layer}, return_when=asyncio.FIRST_COMPLETED)
+                if layer in done:
+                    await self.chat_event(layer.result())
+                    layer = asyncio.ensure_future(self.layer.receive(self.channel))
+                if client in done:
+                    event = client.result()
+                    if event['type'] == 'websocket.disconnect':
+                        return
+                    if event['type'] == 'websocket.receive':
+                        await self.client_message(event)
+                    client = asyncio.ensure_future(self.receive())
+        finally:
+            client.cancel()
+            layer.cancel()
+
+    async def chat_event(self, event):
+        if event.get('type') == 'chat.message':
+            await self._send_json({'type': 'message', 'message': event['message']})
+
+    async def client_message(self, event):
+        try:
+            data = json.loads(event.get('text') or '')
+        except ValueError:
+            await self._send_json({'type': 'error', 'error': 'Некорректный JSON'})
+            return
+
+        content = str(data.get('content', '')).strip() if isinstance(data, dict) else ''
+        if not content or len(content) > MAX_MESSAGE_LENGTH:
+            await self._send_json({'type': 'error', 'error': 'Некорректное сообщение'})
+            return
+
+        # Отправитель получит свое сообщение через группу, как и собеседник
+        await database_sync_to_async(send_message)(self.chat_id, self.user_id, content)
+
+    async def _send_json(self, data):
+        await self.send({'type': 'websocket.send', 'text': json.dumps(data, ensure_ascii=False)})
+
+
+async def websocket_application(scope, receive, send):
+    match = CHAT_PATH.match(scope['path'])
+    if match is None:
+        await receive()
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    await ChatConsumer(scope, receive, send, int(match['chat_id'])).run()
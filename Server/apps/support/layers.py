@@ -0,0 +1,100 @@
+"""
+Слой каналов для доставки сообщений чата по WebSocket.
+
+Каждое WebSocket-соединение получает свой канал; каналы объединяются
+в группы (одна группа на чат), group_send рассылает событие всем
+участникам группы. InMemoryChannelLayer работает в пределах одного
+процесса — для одного узла и тестов. Для нескольких узлов нужен слой
+с тем же интерфейсом поверх брокера (SUPPORT_CHANNEL_LAYER['BACKEND']).
+"""
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class BaseChannelLayer:
+    def new_channel(self):
+        raise NotImplementedError
+
+    async def receive(self, channel):
+        raise NotImplementedError
+
+    async def group_add(self, group, channel):
+        raise NotImplementedError
+
+    async def group_discard(self, group, channel):
+        raise NotImplementedError
+
+    async def group_send(self, group, message):
+        raise NotImplementedError
+
+    def close_channel(self, channel):
+        raise NotImplementedError
+
+
+class InMemoryChannelLayer(BaseChannelLayer):
+    """Очереди asyncio в памяти процесса"""
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self._channels = {}
+        self._groups = defaultdict(set)
+
+    def new_channel(self):
+        channel = f'inmemory.{uuid.uuid4().hex}'
+        self._channels[channel] = asyncio.Queue(maxsize=self.capacity)
+        return channel
+
+    async def receive(self, channel):
+        return await self._channels[channel].get()
+
+    async def group_add(self, group, channel):
+        self._groups[group].add(channel)
+
+    async def group_discard(self, group, channel):
+        members = self._groups.get(group)
+        if members is None:
+            return
+        members.discard(channel)
+        if not members:
+            del self._groups[group]
+
+    async def group_send(self, group, message):
+        for channel in list(self._groups.get(group, ())):
+            queue = self._channels.get(channel)
+            if queue is None:
+                continue
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Медленный клиент не должен задерживать остальных
+                logger.warning('Канал %s переполнен, событие отброшено', channel)
+
+    def close_channel(self, channel):
+        self._channels.pop(channel, None)
+        for group in [g for g, members in self._groups.items() if channel in members]:
+            self._groups[group].discard(channel)
+            if not self._groups[group]:
+                del self._groups[group]
+
+
+_layer = None
+
+
+def get_channel_layer():
+    global _layer
+    if _layer is None:
+        config = getattr(settings, 'SUPPORT_CHANNEL_LAYER', {})
+        backend = import_string(config.get('BACKEND', 'apps.support.layers.InMemoryChannelLayer'))
+        _layer = backend(**config.get('OPTIONS', {}))
+    return _layer
+
+
+def chat_group(chat_id):
+    return f'chat.{chat_id}'
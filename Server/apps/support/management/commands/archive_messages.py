@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.support.archive import archive_messages, retention_settings
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые сообщения чатов в сжатый архив (MessageArchive)'
+
+    def add_arguments(self, parser):
+        config = retention_settings()
+        parser.add_argument('--days', type=int, default=config['ARCHIVE_AFTER_DAYS'],
+                            help='Архивировать сообщения старше указанного числа дней')
+        parser.add_argument('--batch-size', type=int, default=config['BATCH_SIZE'],
+                            help='Сообщений в одной транзакции')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Пауза между пакетами, сек')
+
+    def handle(self, *args, days, batch_size, pause, **options):
+        archived = archive_messages(timedelta(days=days), batch_size, pause)
+        self.stdout.write(f'Перенесено в архив сообщений: {archived}')
@@ -1,6 +1,13 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
+class ChatQuerySet(models.QuerySet):
+    def for_user(self, user_id):
+        """Чаты, в которых участвует пользователь"""
+        return self.filter(models.Q(user1_id=user_id) | models.Q(user2_id=user_id))
+
+
 class Chat(models.Model):
     """Чат (диалог) между двумя пользователями"""
     user1 = models.ForeignKey(
@@ -15,7 +22,25 @@ class Chat(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Денормализация для списка чатов; обновляется в services.send_message
+    last_message_at = models.DateTimeField(default=timezone.now)
+    last_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+"
+    )
+    user1_unread = models.PositiveIntegerField(default=0)
+    user2_unread = models.PositiveIntegerField(default=0)
+
+    objects = ChatQuerySet.as_manager()
+
     class Meta:
+        indexes = [
+            models.Index(fields=['user1', '-last_message_at']),
+            models.Index(fields=['user2', '-last_message_at']),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user1', 'user2'],
@@ -34,6 +59,9 @@ class Chat(models.Model):
     def __str__(self):
         return f"Чат между {self.user1} и {self.user2}"
 
+    def unread_for(self, user_id):
+        return self.user1_unread if self.user1_id == user_id else self.user2_unread
+
 
 class Message(models.Model):
     """Сообщения внутри чата"""
@@ -51,7 +79,40 @@ class Message(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ["created_at"]
+        ordering = ["created_at", "id"]
+        indexes = [
+            # История чата: постраничный обход по курсору (created_at, id)
+            models.Index(fields=["chat", "created_at", "id"]),
+        ]
+
+    def __str__(self):
+        return f"Сообщение от {self.sender} в чате {self.chat.id}"
+
+
+class MessageArchive(models.Model):
+    """
+    Блок архивных сообщений одного чата (см. archive.py): сообщения
+    хранятся сжатым JSON, границы блока — для выбора блоков по курсору
+    """
+    chat = models.ForeignKey(
+        Chat,
+        on_delete=models.CASCADE,
+        related_name="archives"
+    )
+    first_created_at = models.DateTimeField()
+    first_id = models.BigIntegerField()
+    last_created_at = models.DateTimeField()
+    last_id = models.BigIntegerField()
+    min_message_id = models.BigIntegerField()
+    max_message_id = models.BigIntegerField()
+    message_count = models.PositiveIntegerField()
+    payload = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["chat", "last_created_at", "last_id"]),
+        ]
 
     def __str__(self):
-        return f"Сообщение от {self.sender} в чате {self.chat.id}"
\ No newline at end of file
+        return f"Архив чата {self.chat_id}: {self.message_count} сообщений"
@@ -0,0 +1,114 @@
+"""
+Курсорная пагинация по ключу (время, id): история сообщений
+по (created_at, id), список чатов по (last_message_at, id).
+
+Курсор — непрозрачная строка с позицией последнего выданного сообщения;
+запрос следующей страницы идет по индексу (chat, created_at, id)
+без OFFSET и без сортировки всего чата. Когда оперативные сообщения
+заканчиваются, страница дополняется из архива (archive.py) — для клиента
+курсор остается тем же.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+from .archive import archived_after, archived_before, find_archived
+from .models import Chat, Message
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+MAX_ID = 2 ** 63 - 1
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(position, pk):
+    raw = f'{position.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, message_id = base64.urlsafe_b64decode(padded).decode().split('|')
+        created_at, message_id = datetime.fromisoformat(created_at), int(message_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(cursor) from exc
+    # Курсоры выдаются только с часовым поясом и id в пределах bigint
+    if created_at.tzinfo is None or not 0 < message_id <= MAX_ID:
+        raise InvalidCursor(cursor)
+    return created_at, message_id
+
+
+def parse_limit(value):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def messages_before(chat_id, cursor=None, limit=DEFAULT_LIMIT):
+    """
+    Страница истории от новых к старым. Возвращает (messages, next_cursor),
+    next_cursor указывает на более старые сообщения или равен None
+    """
+    position = decode_cursor(cursor) if cursor else None
+    messages = Message.objects.filter(chat_id=chat_id)
+    if position:
+        created_at, message_id = position
+        messages = messages.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+        )
+    page = list(messages.order_by('-created_at', '-id')[:limit + 1])
+    if len(page) <= limit:
+        # Оперативные сообщения закончились — продолжаем по архиву
+        if page:
+            position = (page[-1].created_at, page[-1].id)
+        page += archived_before(chat_id, position, limit + 1 - len(page))
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_cursor(page[-1].created_at, page[-1].id)
+    return page, None
+
+
+def messages_since(chat_id, message_id, limit=MAX_LIMIT):
+    """
+    Сообщения после message_id в порядке отправки — для догрузки
+    пропущенного после переподключения. Возвращает (messages, has_more)
+    """
+    anchor = Message.objects.filter(chat_id=chat_id, id=message_id).values_list('created_at', flat=True).first()
+    page = []
+    if anchor is None:
+        archived = find_archived(chat_id, message_id)
+        if archived is None:
+            return [], False
+        anchor = archived.created_at
+        page = archived_after(chat_id, (anchor, message_id), limit + 1)
+
+    if len(page) <= limit:
+        page += Message.objects.filter(chat_id=chat_id).filter(
+            Q(created_at__gt=anchor) | Q(created_at=anchor, id__gt=message_id)
+        ).order_by('created_at', 'id')[:limit + 1 - len(page)]
+    return page[:limit], len(page) > limit
+
+
+def inbox_page(user_id, cursor=None, limit=DEFAULT_LIMIT):
+    """
+    Чаты пользователя по времени последнего сообщения — один запрос
+    с последним сообщением и собеседниками. Возвращает (chats, next_cursor)
+    """
+    chats = Chat.objects.for_user(user_id).select_related('last_message', 'user1', 'user2')
+    if cursor:
+        last_message_at, chat_id = decode_cursor(cursor)
+        chats = chats.filter(
+            Q(last_message_at__lt=last_message_at) | Q(last_message_at=last_message_at, id__lt=chat_id)
+        )
+    page = list(chats.order_by('-last_message_at', '-id')[:limit + 1])
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_cursor(page[-1].last_message_at, page[-1].id)
+    return page, None
@@ -0,0 +1,38 @@
+from rest_framework import serializers
+from .models import Chat, Message
+
+
+class MessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Message
+        fields = ['id', 'chat', 'sender', 'content', 'created_at']
+        read_only_fields = ['chat', 'sender', 'created_at']
+
+
+class InboxChatSerializer(serializers.ModelSerializer):
+    """Чат в списке диалогов; context['user_id'] — текущий пользователь"""
+    companion = serializers.SerializerMethodField()
+    last_message = MessageSerializer(read_only=True)
+    unread_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Chat
+        fields = ['id', 'companion', 'last_message', 'last_message_at', 'unread_count']
+
+    def get_companion(self, obj):
+        user = obj.user2 if obj.user1_id == self.context['user_id'] else obj.user1
+        return {'id': user.id, 'username': user.username}
+
+    def get_unread_count(self, obj):
+        return obj.unread_for(self.context['user_id'])
+
+
+class ChatOpenSerializer(serializers.Serializer):
+    """Собеседник: пользователь или продавец товара"""
+    user_id = serializers.IntegerField(required=False)
+    product_id = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        if ('user_id' in data) == ('product_id' in data):
+            raise serializers.ValidationError("Укажите user_id или product_id")
+        return data
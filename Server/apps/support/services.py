@@ -0,0 +1,131 @@
+from asgiref.sync import async_to_sync
+from django.db import connection, transaction
+from django.db.models import (
+    BigIntegerField, Case, DateTimeField, F, PositiveIntegerField, Q, Value, When,
+)
+
+from .layers import chat_group, get_channel_layer
+from .models import Chat, Message
+
+
+class ChatOpenError(ValueError):
+    pass
+
+
+def _insert_chat_returning_id(user1_id, user2_id):
+    """
+    INSERT ... SELECT ... WHERE <оба пользователя существуют>
+    ON CONFLICT DO NOTHING RETURNING id: id нового чата или None, если чат
+    уже существует или пользователя нет. Внешние ключи в PostgreSQL и SQLite
+    проверяются отложенно (при commit), поэтому существование проверяется
+    в самом запросе, а не перехватом IntegrityError. У параметров в SELECT
+    нет столбца, из которого выводится тип, поэтому они приводятся явно
+    (CAST), а не по правилам конкретного драйвера
+    """
+    chat = Chat(user1_id=user1_id, user2_id=user2_id)
+    fields = [f for f in Chat._meta.concrete_fields if not f.primary_key]
+    User = Chat._meta.get_field('user1').related_model
+    qn = connection.ops.quote_name
+    sql = (
+        'INSERT INTO {table} ({columns}) SELECT {values} '
+        'WHERE (SELECT COUNT(*) FROM {users} WHERE {user_pk} IN ({user_ids})) = 2 '
+        'ON CONFLICT ({unique}) DO NOTHING RETURNING {pk}'
+    ).format(
+        table=qn(Chat._meta.db_table),
+        columns=', '.join(qn(f.column) for f in fields),
+        values=', '.join(f'CAST(%s AS {f.cast_db_type(connection)})' for f in fields),
+        users=qn(User._meta.db_table),
+        user_pk=qn(User._meta.pk.column),
+        user_ids=', '.join([f'CAST(%s AS {User._meta.pk.cast_db_type(connection)})'] * 2),
+        unique=', '.join(qn(Chat._meta.get_field(name).column) for name in ('user1', 'user2')),
+        pk=qn(Chat._meta.pk.column),
+    )
+    params = [f.get_db_prep_save(f.pre_save(chat, add=True), connection) for f in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, user1_id, user2_id])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def open_chat(user_id, other_user_id):
+    """
+    Найти или создать чат двух пользователей, не более двух запросов.
+    Пара приводится к порядку user1 < user2 (ограничение user1_lt_user2),
+    гонку при первом сообщении решает уникальный индекс. Возвращает (chat_id, created)
+    """
+    if user_id == other_user_id:
+        raise ChatOpenError("Нельзя открыть чат с самим собой")
+    user1_id, user2_id = sorted((user_id, other_user_id))
+
+    if connection.vendor in ('postgresql', 'sqlite'):
+        chat_id = _insert_chat_returning_id(user1_id, user2_id)
+        if chat_id is not None:
+            return chat_id, True
+        # Чат уже есть — или нет собеседника
+        chat_id = Chat.objects.filter(user1_id=user1_id, user2_id=user2_id).values_list('id', flat=True).first()
+        if chat_id is None:
+            raise ChatOpenError("Пользователь не найден")
+        return chat_id, False
+
+    User = Chat._meta.get_field('user1').related_model
+    if User._default_manager.filter(id__in=(user1_id, user2_id)).count() != 2:
+        raise ChatOpenError("Пользователь не найден")
+    chat, created = Chat.objects.get_or_create(user1_id=user1_id, user2_id=user2_id)
+    return chat.id, created
+
+
+def message_payload(message):
+    return {
+        'id': message.id,
+        'chat': message.chat_id,
+        'sender': message.sender_id,
+        'content': message.content,
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+def send_message(chat_id, sender_id, content):
+    """
+    Сохранить сообщение и разослать его участникам чата: INSERT сообщения,
+    один UPDATE денормализованных полей чата и одно событие в группу чата
+    """
+    with transaction.atomic():
+        message = Message.objects.create(chat_id=chat_id, sender_id=sender_id, content=content)
+        # Параллельная отправка не должна заменить последнее сообщение более старым
+        is_latest = Q(last_message_at__lte=message.created_at)
+        Chat.objects.filter(id=chat_id).update(
+            last_message_at=Case(
+                When(is_latest, then=Value(message.created_at)),
+                default=F('last_message_at'),
+                output_field=DateTimeField(),
+            ),
+            last_message_id=Case(
+                When(is_latest, then=Value(message.id)),
+                default=F('last_message_id'),
+                output_field=BigIntegerField(),
+            ),
+            user1_unread=Case(When(user1_id=sender_id, then=F('user1_unread')), default=F('user1_unread') + 1),
+            user2_unread=Case(When(user2_id=sender_id, then=F('user2_unread')), default=F('user2_unread') + 1),
+        )
+    event = {'type': 'chat.message', 'message': message_payload(message)}
+    # Рассылаем только зафиксированное сообщение
+    transaction.on_commit(
+        lambda: async_to_sync(get_channel_layer().group_send)(chat_group(chat_id), event)
+    )
+    return message
+
+
+def mark_read(chat_id, user_id):
+    """Сбросить счетчик непрочитанных пользователя одним UPDATE; False, если чата нет"""
+    return bool(Chat.objects.for_user(user_id).filter(id=chat_id).update(
+        user1_unread=Case(
+            When(user1_id=user_id, then=Value(0)),
+            default=F('user1_unread'),
+            output_field=PositiveIntegerField(),
+        ),
+        user2_unread=Case(
+            When(user2_id=user_id, then=Value(0)),
+            default=F('user2_unread'),
+            output_field=PositiveIntegerField(),
+        ),
+    ))
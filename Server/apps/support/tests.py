@@ -1,3 +1,339 @@
-from django.test import TestCase
+import asyncio
+import json
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.accounts.models import CustomUser
+from apps.accounts.tokens import UserRefreshToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .archive import archive_messages, find_archived
+from .consumers import (
+    CLOSE_FORBIDDEN, CLOSE_NOT_FOUND, CLOSE_UNAUTHORIZED, database_sync_to_async, websocket_application,
+)
+from .models import Chat, Message, MessageArchive
+from .pagination import encode_cursor, inbox_page, messages_before, messages_since
+from .services import ChatOpenError, mark_read, open_chat, send_message
+
+
+class ChatTestCase(TestCase):
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(email='alice@example.com', username='alice', password='x')
+        self.bob = CustomUser.objects.create_user(email='bob@example.com', username='bob', password='x')
+
+    def headers(self, user):
+        return {'Authorization': f'Bearer {UserRefreshToken.for_user(user).access_token}'}
+
+    def send(self, chat_id, sender, count, prefix='m'):
+        return [send_message(chat_id, sender.id, f'{prefix}{i}') for i in range(count)]
+
+    def backdate(self, messages, start, step=timedelta(minutes=1)):
+        """created_at сообщений: start, start + step, ..."""
+        for n, message in enumerate(messages):
+            message.created_at = start + step * n
+            Message.objects.filter(id=message.id).update(created_at=message.created_at)
+
+    def history(self, chat_id, limit):
+        """Вся история страницами: ([id сообщений страницы], курсор следующей)"""
+        pages, cursor = [], None
+        while True:
+            messages, cursor = messages_before(chat_id, cursor, limit)
+            pages.append(([message.id for message in messages], cursor))
+            if cursor is None:
+                return pages
+
+
+class OpenChatTests(ChatTestCase):
+    def test_creates_once_in_user_order(self):
+        chat_id, created = open_chat(self.bob.id, self.alice.id)
+        self.assertTrue(created)
+        self.assertEqual(open_chat(self.alice.id, self.bob.id), (chat_id, False))
+        chat = Chat.objects.get()
+        self.assertEqual((chat.user1_id, chat.user2_id), (self.alice.id, self.bob.id))
+        self.assertEqual((chat.user1_unread, chat.user2_unread, chat.last_message_id), (0, 0, None))
+        self.assertIsNotNone(chat.created_at)
+
+    def test_insert_parameters_are_cast(self):
+        with CaptureQueriesContext(connection) as queries:
+            open_chat(self.alice.id, self.bob.id)
+        sql = queries[0]['sql']
+        self.assertTrue(sql.startswith('INSERT INTO'))
+        # Тип каждого параметра задан в запросе, а не выводится драйвером
+        self.assertEqual(sql.count('CAST('), len(Chat._meta.concrete_fields) - 1 + 2)
+
+    def test_missing_user_inside_transaction(self):
+        # Внешние ключи проверяются отложенно: ошибка не должна дойти до commit
+        with transaction.atomic():
+            with self.assertRaises(ChatOpenError):
+                open_chat(self.alice.id, self.bob.id + 100)
+        self.assertFalse(Chat.objects.exists())
+        with self.assertRaises(ChatOpenError):
+            open_chat(self.alice.id, self.alice.id)
+
+
+class ArchiveTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.chat_id, _ = open_chat(self.alice.id, self.bob.id)
+        self.messages = self.send(self.chat_id, self.alice, 12)
+        # Все, кроме двух последних, старше срока хранения; у двух старых одинаковое время
+        old = self.messages[:10]
+        self.backdate(old, timezone.now() - timedelta(days=400))
+        self.backdate(old[4:6], old[4].created_at, step=timedelta(0))
+
+    def test_history_is_the_same_across_the_archive_boundary(self):
+        before = self.history(self.chat_id, limit=3)
+        since = [messages_since(self.chat_id, message.id, limit=4) for message in self.messages]
+
+        self.assertEqual(archive_messages(batch_size=4), 10)
+        # Пакеты по 4 сообщения — несколько блоков
+        self.assertEqual(MessageArchive.objects.count(), 3)
+        self.assertEqual(list(Message.objects.values_list('id', flat=True)), [m.id for m in self.messages[10:]])
+
+        self.assertEqual(self.history(self.chat_id, limit=3), before)
+        self.assertEqual([message_ids for message_ids, _ in before],
+                         [[m.id for m in self.messages[::-1][i:i + 3]] for i in range(0, 12, 3)])
+        after = [messages_since(self.chat_id, message.id, limit=4) for message in self.messages]
+        self.assertEqual(
+            [([m.id for m in page], has_more) for page, has_more in after],
+            [([m.id for m in page], has_more) for page, has_more in since],
+        )
+        archived = find_archived(self.chat_id, self.messages[5].id)
+        self.assertEqual((archived.content, archived.sender_id, archived.created_at),
+                         ('m5', self.alice.id, self.messages[5].created_at))
+
+    def test_last_message_is_never_archived(self):
+        Message.objects.update(created_at=timezone.now() - timedelta(days=400))
+        archive_messages()
+        last_message_id = Chat.objects.get(id=self.chat_id).last_message_id
+        self.assertEqual(last_message_id, self.messages[-1].id)
+        self.assertTrue(Message.objects.filter(id=last_message_id).exists())
+        self.assertIsNone(find_archived(self.chat_id, last_message_id))
+
+    def test_second_run_is_idempotent(self):
+        self.assertEqual(archive_messages(batch_size=4), 10)
+        blocks = list(MessageArchive.objects.values_list('id', 'message_count'))
+        self.assertEqual(archive_messages(batch_size=4), 0)
+        self.assertEqual(list(MessageArchive.objects.values_list('id', 'message_count')), blocks)
+        self.assertEqual(sum(count for _, count in blocks), 10)
+        self.assertEqual(Message.objects.count(), 2)
+
+
+class InboxTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.carol = CustomUser.objects.create_user(email='carol@example.com', username='carol', password='x')
+        self.with_bob, _ = open_chat(self.alice.id, self.bob.id)
+        self.with_carol, _ = open_chat(self.carol.id, self.alice.id)
+
+    def unread(self, chat_id):
+        chat = Chat.objects.get(id=chat_id)
+        return {user.username: chat.unread_for(user.id) for user in (self.alice, self.bob, self.carol)
+                if user.id in (chat.user1_id, chat.user2_id)}
+
+    def inbox(self, user):
+        response = self.client.get('/api/v1/support/chats/', headers=self.headers(user))
+        self.assertEqual(response.status_code, 200)
+        return [(chat['id'], chat['companion']['username'], chat['last_message']['content'], chat['unread_count'])
+                for chat in response.json()['results']]
+
+    def test_counters_and_last_message_per_side(self):
+        self.send(self.with_bob, self.alice, 2, prefix='alice')
+        last = send_message(self.with_bob, self.bob.id, 'bob')
+        self.assertEqual(self.unread(self.with_bob), {'alice': 1, 'bob': 2})
+        chat = Chat.objects.get(id=self.with_bob)
+        self.assertEqual((chat.last_message_id, chat.last_message_at), (last.id, last.created_at))
+
+    def test_older_message_does_not_replace_last_message(self):
+        newest = send_message(self.with_bob, self.alice.id, 'new')
+        Chat.objects.filter(id=self.with_bob).update(last_message_at=newest.created_at + timedelta(seconds=5))
+        send_message(self.with_bob, self.bob.id, 'late')
+        chat = Chat.objects.get(id=self.with_bob)
+        self.assertEqual(chat.last_message_id, newest.id)
+        self.assertEqual(self.unread(self.with_bob), {'alice': 1, 'bob': 1})
+
+    def test_inbox_order_follows_latest_message(self):
+        send_message(self.with_bob, self.bob.id, 'от Боба')
+        send_message(self.with_carol, self.carol.id, 'от Кэрол')
+        self.assertEqual(self.inbox(self.alice), [
+            (self.with_carol, 'carol', 'от Кэрол', 1),
+            (self.with_bob, 'bob', 'от Боба', 1),
+        ])
+        send_message(self.with_bob, self.alice.id, 'ответ Бобу')
+        self.assertEqual([chat[:3] for chat in self.inbox(self.alice)], [
+            (self.with_bob, 'bob', 'ответ Бобу'),
+            (self.with_carol, 'carol', 'от Кэрол'),
+        ])
+        self.assertEqual(self.inbox(self.bob), [(self.with_bob, 'alice', 'ответ Бобу', 1)])
+
+    def test_mark_read_resets_only_the_readers_counter(self):
+        self.send(self.with_bob, self.alice, 2)
+        self.send(self.with_bob, self.bob, 3)
+        self.assertTrue(mark_read(self.with_bob, self.alice.id))
+        self.assertEqual(self.unread(self.with_bob), {'alice': 0, 'bob': 2})
+        response = self.client.post(f'/api/v1/support/chats/{self.with_bob}/read/', headers=self.headers(self.bob))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.unread(self.with_bob), {'alice': 0, 'bob': 0})
+        # Чужой чат
+        self.assertFalse(mark_read(self.with_bob, self.carol.id))
+        response = self.client.post(f'/api/v1/support/chats/{self.with_bob}/read/', headers=self.headers(self.carol))
+        self.assertEqual(response.status_code, 404)
+
+
+class CursorPaginationTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.chat_id, _ = open_chat(self.alice.id, self.bob.id)
+        self.messages = self.send(self.chat_id, self.alice, 7)
+        # Три сообщения с одинаковым временем: порядок решает id
+        moment = timezone.now() - timedelta(hours=1)
+        self.backdate(self.messages[:4], moment - timedelta(minutes=1))
+        self.backdate(self.messages[1:4], moment, step=timedelta(0))
+
+    def test_pages_have_no_duplicates_or_gaps(self):
+        newest_first = [message.id for message in reversed(self.messages)]
+        for limit in (1, 2, 3, 7, 8):
+            pages = self.history(self.chat_id, limit)
+            ids = [message_id for page, _ in pages for message_id in page]
+            self.assertEqual(ids, newest_first, limit)
+            # Курсор есть у всех страниц, кроме последней; пустых страниц нет
+            self.assertEqual([cursor is None for _, cursor in pages], [False] * (len(pages) - 1) + [True])
+            self.assertTrue(all(page for page, _ in pages))
+
+    def test_ties_on_created_at_are_split_by_id(self):
+        tied = self.messages[1:4]
+        # Курсор указывает на середину сообщений с одинаковым временем
+        cursor = encode_cursor(tied[1].created_at, tied[1].id)
+        older, _ = messages_before(self.chat_id, cursor, limit=10)
+        self.assertEqual([message.id for message in older], [tied[0].id, self.messages[0].id])
+        newer, has_more = messages_since(self.chat_id, tied[1].id, limit=2)
+        self.assertEqual(([message.id for message in newer], has_more), ([tied[2].id, self.messages[4].id], True))
+
+    def test_inbox_ties_on_last_message_at(self):
+        carol = CustomUser.objects.create_user(email='carol@example.com', username='carol', password='x')
+        chat_ids = [self.chat_id, open_chat(self.alice.id, carol.id)[0]]
+        Chat.objects.update(last_message_at=timezone.now())
+        first, cursor = inbox_page(self.alice.id, limit=1)
+        second, last = inbox_page(self.alice.id, cursor, limit=1)
+        self.assertEqual([chat.id for chat in first + second], sorted(chat_ids, reverse=True))
+        self.assertIsNone(last)
+
+    def test_malformed_cursor_is_400(self):
+        headers = self.headers(self.alice)
+        naive = timezone.make_naive(timezone.now())
+        for cursor in ('zzz', 'ж', encode_cursor(timezone.now(), 1)[:-3], 'MjAyNHxhYmM',
+                       encode_cursor(timezone.now(), 10 ** 30), encode_cursor(naive, 1)):
+            for path in (f'/api/v1/support/chats/{self.chat_id}/messages/', '/api/v1/support/chats/'):
+                response = self.client.get(path, {'cursor': cursor}, headers=headers)
+                self.assertEqual(response.status_code, 400, (path, cursor))
+                self.assertIn('error', response.json())
+
+
+class WebsocketClient:
+    """Подключение к websocket_application через очереди, как WebsocketCommunicator в channels"""
+
+    def __init__(self, path, token=None):
+        self.scope = {
+            'type': 'websocket',
+            'path': path,
+            'query_string': f'token={token}'.encode() if token else b'',
+        }
+        self.incoming = asyncio.Queue()
+        self.outgoing = asyncio.Queue()
+        self.task = None
+
+    async def connect(self):
+        self.task = asyncio.ensure_future(websocket_application(self.scope, self.incoming.get, self.outgoing.put))
+        await self.incoming.put({'type': 'websocket.connect'})
+        return await self.receive()
+
+    async def receive(self, timeout=5):
+        return await asyncio.wait_for(self.outgoing.get(), timeout)
+
+    async def receive_json(self):
+        event = await self.receive()
+        self.assert_type(event, 'websocket.send')
+        return json.loads(event['text'])
+
+    async def send_json(self, data):
+        await self.incoming.put({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def disconnect(self):
+        await self.incoming.put({'type': 'websocket.disconnect'})
+        await asyncio.wait_for(self.task, 5)
+
+    @staticmethod
+    def assert_type(event, event_type):
+        if event['type'] != event_type:
+            raise AssertionError(f'{event_type} expected, got {event}')
+
+
+class ChatConsumerTests(TransactionTestCase):
+    """Настоящие commit: рассылка идет в transaction.on_commit"""
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(email='alice@example.com', username='alice', password='x')
+        self.bob = CustomUser.objects.create_user(email='bob@example.com', username='bob', password='x')
+        self.carol = CustomUser.objects.create_user(email='carol@example.com', username='carol', password='x')
+        self.chat_id, _ = open_chat(self.alice.id, self.bob.id)
+        self.path = f'/ws/support/chats/{self.chat_id}/'
+
+    def token(self, user):
+        return str(UserRefreshToken.for_user(user).access_token)
+
+    def close_code(self, path, token=None):
+        async def connect():
+            return await WebsocketClient(path, token).connect()
+        event = async_to_sync(connect)()
+        WebsocketClient.assert_type(event, 'websocket.close')
+        return event['code']
+
+    def test_rejected_connections(self):
+        # Подписанный токен без id пользователя
+        anonymous = AccessToken()
+        self.assertEqual(self.close_code(self.path), CLOSE_UNAUTHORIZED)
+        self.assertEqual(self.close_code(self.path, 'not-a-jwt'), CLOSE_UNAUTHORIZED)
+        self.assertEqual(self.close_code(self.path, str(anonymous)), CLOSE_UNAUTHORIZED)
+        self.assertEqual(self.close_code(self.path, self.token(self.carol)), CLOSE_FORBIDDEN)
+        self.assertEqual(self.close_code('/ws/support/chats/x/', self.token(self.alice)), CLOSE_NOT_FOUND)
+
+    def test_participants_receive_committed_messages(self):
+        def rolled_back_then_committed():
+            try:
+                with transaction.atomic():
+                    send_message(self.chat_id, self.bob.id, 'откатится')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            return send_message(self.chat_id, self.bob.id, 'из REST')
+
+        alice = WebsocketClient(self.path, self.token(self.alice))
+        bob = WebsocketClient(self.path, self.token(self.bob))
+
+        async def scenario():
+            for client in (alice, bob):
+                WebsocketClient.assert_type(await client.connect(), 'websocket.accept')
+
+            message = await database_sync_to_async(rolled_back_then_committed)()
+            for client in (alice, bob):
+                event = await client.receive_json()
+                self.assertEqual(event['type'], 'message')
+                self.assertEqual((event['message']['id'], event['message']['content']), (message.id, 'из REST'))
+
+            await alice.send_json({'content': 'привет'})
+            for client in (alice, bob):
+                event = await client.receive_json()
+                self.assertEqual((event['message']['sender'], event['message']['content']), (self.alice.id, 'привет'))
+
+            await alice.send_json({'content': ''})
+            self.assertEqual((await alice.receive_json())['type'], 'error')
+            for client in (alice, bob):
+                await client.disconnect()
+
+        async_to_sync(scenario)()
+        self.assertEqual(list(Message.objects.values_list('content', flat=True)), ['из REST', 'привет'])
@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import ChatMessageListView, ChatReadView, InboxView
+
+
+urlpatterns = [
+    path('chats/', InboxView.as_view(), name='inbox'),
+    path('chats/<int:chat_id>/messages/', ChatMessageListView.as_view(), name='chat-messages'),
+    path('chats/<int:chat_id>/read/', ChatReadView.as_view(), name='chat-read'),
+]
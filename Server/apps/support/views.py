@@ -1,3 +1,147 @@
-from django.shortcuts import render
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from apps.products.models import Product
+from common.instrumentation import serializer_data
+from .models import Chat
+from .pagination import InvalidCursor, inbox_page, messages_before, messages_since, parse_limit
+from .serializers import ChatOpenSerializer, InboxChatSerializer, MessageSerializer
+from .services import ChatOpenError, mark_read, open_chat, send_message
 
-# Create your views here.
+
+class InboxView(APIView):
+    """
+    Получить список чатов текущего пользователя или открыть чат
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Список чатов: сначала с самыми свежими сообщениями",
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Курсор из поля next", type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Размер страницы (до 200)", type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: InboxChatSerializer(many=True)}
+    )
+    def get(self, request):
+        limit = parse_limit(request.query_params.get('limit'))
+        try:
+            chats, next_cursor = inbox_page(request.user.id, request.query_params.get('cursor'), limit)
+        except InvalidCursor:
+            return Response({'error': 'Некорректный курсор'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = InboxChatSerializer(chats, many=True, context={'user_id': request.user.id})
+        return Response({
+            'next': next_cursor,
+            'results': serializer_data(serializer)
+        })
+
+    @swagger_auto_schema(
+        operation_description="Открыть чат с пользователем или продавцом товара (создается при первом обращении)",
+        request_body=ChatOpenSerializer,
+        responses={200: 'Чат уже существовал', 201: 'Чат создан'}
+    )
+    def post(self, request):
+        serializer = ChatOpenSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        other_user_id = serializer.validated_data.get('user_id')
+        if other_user_id is None:
+            other_user_id = Product.objects.filter(
+                id=serializer.validated_data['product_id']
+            ).values_list('seller__user_id', flat=True).first()
+            if other_user_id is None:
+                return Response({'error': 'Товар не найден'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            chat_id, created = open_chat(request.user.id, other_user_id)
+        except ChatOpenError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {'id': chat_id, 'created': created},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
+class ChatReadView(APIView):
+    """
+    Отметить сообщения чата прочитанными
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Сбросить счетчик непрочитанных сообщений",
+        responses={204: 'Сообщения отмечены прочитанными'}
+    )
+    def post(self, request, chat_id):
+        if not mark_read(chat_id, request.user.id):
+            return Response(
+                {'error': 'Чат не найден'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ChatMessageListView(APIView):
+    """
+    Получить историю сообщений чата или отправить новое сообщение
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="История чата: сначала новые сообщения, курсор ведет к более старым. "
+                              "С параметром since_id — сообщения после указанного (для переподключения)",
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Курсор из поля next", type=openapi.TYPE_STRING),
+            openapi.Parameter('since_id', openapi.IN_QUERY, description="ID последнего полученного сообщения", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Размер страницы (до 200)", type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: MessageSerializer(many=True)}
+    )
+    def get(self, request, chat_id):
+        if not Chat.objects.for_user(request.user.id).filter(id=chat_id).exists():
+            return Response(
+                {'error': 'Чат не найден'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        limit = parse_limit(request.query_params.get('limit'))
+        since_id = request.query_params.get('since_id')
+        if since_id:
+            if not since_id.isdigit():
+                return Response({'error': 'Некорректный since_id'}, status=status.HTTP_400_BAD_REQUEST)
+            messages, has_more = messages_since(chat_id, int(since_id), limit)
+            return Response({
+                'has_more': has_more,
+                'results': serializer_data(MessageSerializer(messages, many=True))
+            })
+
+        try:
+            messages, next_cursor = messages_before(chat_id, request.query_params.get('cursor'), limit)
+        except InvalidCursor:
+            return Response({'error': 'Некорректный курсор'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'next': next_cursor,
+            'results': serializer_data(MessageSerializer(messages, many=True))
+        })
+
+    @swagger_auto_schema(
+        operation_description="Отправить сообщение в чат (доставляется участникам по WebSocket)",
+        request_body=MessageSerializer,
+        responses={201: MessageSerializer()}
+    )
+    def post(self, request, chat_id):
+        if not Chat.objects.for_user(request.user.id).filter(id=chat_id).exists():
+            return Response(
+                {'error': 'Чат не найден'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        serializer = MessageSerializer(data=request.data)
+        if serializer.is_valid():
+            message = send_message(chat_id, request.user.id, serializer.validated_data['content'])
+            return Response(serializer_data(MessageSerializer(message)), status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
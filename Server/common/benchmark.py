@@ -0,0 +1,102 @@
+"""
+Общие утилиты для бенчмарков (management-команды bench_*).
+
+Бенчмарки работают на временной тестовой БД, чтобы не трогать рабочие данные.
+"""
+import json
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext, setup_test_environment, teardown_test_environment,
+)
+
+
+@contextmanager
+def test_database(verbosity=0, keepdb=False, name=None):
+    """
+    Создать тестовую БД на время бенчмарка и удалить ее после.
+    name — имя тестовой БД; для SQLite путь к файлу вместо БД в памяти,
+    в которой конкурентные записи упираются в блокировки таблиц.
+    """
+    if name is not None:
+        connection.settings_dict['TEST']['NAME'] = name
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, keepdb=keepdb,
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity, keepdb=keepdb)
+        teardown_test_environment()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Benchmark:
+    """Собирает время и число SQL-запросов для каждого замера"""
+
+    def __init__(self, name):
+        self.name = name
+        self.timings = []
+        self.queries = []
+
+    @contextmanager
+    def measure(self, count_queries=True):
+        if count_queries:
+            # Журнал запросов ограничен 9000 записями: после переполнения CaptureQueriesContext считает 0
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                yield
+                elapsed = time.perf_counter() - start
+            self.queries.append(len(ctx))
+        else:
+            start = time.perf_counter()
+            yield
+            elapsed = time.perf_counter() - start
+        self.timings.append(elapsed)
+
+    def add(self, elapsed, queries=None):
+        self.timings.append(elapsed)
+        if queries is not None:
+            self.queries.append(queries)
+
+    def summary(self):
+        total = sum(self.timings)
+        return {
+            'name': self.name,
+            'iterations': len(self.timings),
+            'total_s': round(total, 4),
+            'throughput_per_s': round(len(self.timings) / total, 2) if total else 0.0,
+            'mean_ms': round(statistics.fmean(self.timings) * 1000, 3) if self.timings else 0.0,
+            'p50_ms': round(percentile(self.timings, 50) * 1000, 3),
+            'p95_ms': round(percentile(self.timings, 95) * 1000, 3),
+            'p99_ms': round(percentile(self.timings, 99) * 1000, 3),
+            'queries_per_call': round(statistics.fmean(self.queries), 2) if self.queries else None,
+        }
+
+
+def format_summary(summary):
+    line = (
+        f"{summary['name']:<32} n={summary['iterations']:<6} "
+        f"{summary['throughput_per_s']:>10.1f}/s  "
+        f"p50={summary['p50_ms']:.2f}ms p95={summary['p95_ms']:.2f}ms p99={summary['p99_ms']:.2f}ms"
+    )
+    if summary['queries_per_call'] is not None:
+        line += f"  queries={summary['queries_per_call']}"
+    return line
+
+
+def write_results(path, results, **meta):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({**meta, 'results': results}, f, ensure_ascii=False, indent=2, default=str)
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Версии каталога (ETag), кэш ответов, корзина и коды OTP хранятся в кэше
+    по умолчанию: при нескольких воркерах он должен быть общим
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.DEBUG or backend not in settings.PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+    return [Error(
+        f'Кэш по умолчанию ({backend}) локален для процесса: воркеры не видят изменения друг друга',
+        hint='Укажите общий кэш в CACHE_BACKEND/CACHE_LOCATION, например django.core.cache.backends.redis.RedisCache',
+        id='common.E001',
+    )]
+
+
+@register(deploy=True)
+def sms_backend_check(app_configs, **kwargs):
+    """Бэкенды для разработки выводят SMS с кодами OTP в stdout/логи"""
+    backend = settings.OUTBOX['SMS_BACKEND']
+    if settings.DEBUG or backend not in settings.DEV_SMS_BACKENDS:
+        return []
+    return [Error(
+        f'SMS отправляются через {backend}: коды OTP попадают в логи открытым текстом',
+        hint='Укажите бэкенд SMS-шлюза в SMS_BACKEND',
+        id='common.E002',
+    )]
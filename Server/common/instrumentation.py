@@ -0,0 +1,240 @@
+"""
+Инструментирование запросов: число и время SQL, время сериализаторов
+и общее время, с разбивкой по view (ProductListView, OrderListView, ...).
+
+- InstrumentationMiddleware замеряет выбранные по SAMPLE_RATE запросы
+  и добавляет заголовок Server-Timing;
+- время сериализаторов замеряется явно: serializer_data(serializer)
+  вместо serializer.data или блок with serializer_timer();
+- metrics_view отдает накопленные метрики в формате Prometheus.
+
+Метрики хранятся в памяти процесса: при нескольких воркерах каждый
+отдает свои, а Prometheus суммирует их по меткам instance.
+
+Server-Timing (число и время SQL) по умолчанию отдается только в DEBUG,
+а /metrics вне DEBUG без METRICS_TOKEN отвечает 404.
+"""
+import bisect
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 1.0,
+    # Раскрывает клиентам число и время SQL — по умолчанию только в DEBUG
+    'SERVER_TIMING': False,
+    # /metrics требует заголовок Authorization: Bearer <токен>; без токена доступен только в DEBUG
+    'METRICS_TOKEN': '',
+}
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def instrumentation_settings():
+    return {**DEFAULTS, **getattr(settings, 'INSTRUMENTATION', {})}
+
+
+class RequestMetrics:
+    """Замеры одного запроса"""
+
+    __slots__ = ('queries', 'sql_time', 'serializer_time', 'serializer_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+
+
+def current_metrics():
+    return _current.get()
+
+
+@contextmanager
+def serializer_timer():
+    """
+    Замер времени сериализации для текущего запроса. Вложенные замеры
+    (сериализатор внутри сериализатора) не учитываются повторно
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    metrics.serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_depth -= 1
+        if metrics.serializer_depth == 0:
+            metrics.serializer_time += time.perf_counter() - start
+
+
+def serializer_data(serializer):
+    """serializer.data с замером времени для InstrumentationMiddleware"""
+    with serializer_timer():
+        return serializer.data
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._views = {}
+
+    def observe(self, view, method, status, total, metrics):
+        with self._lock:
+            key = (view, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = {
+                    'duration': Histogram(DURATION_BUCKETS),
+                    'queries': Histogram(QUERY_BUCKETS),
+                    'sql_seconds': 0.0,
+                    'serializer_seconds': 0.0,
+                }
+            stats['duration'].observe(total)
+            stats['queries'].observe(metrics.queries)
+            stats['sql_seconds'] += metrics.sql_time
+            stats['serializer_seconds'] += metrics.serializer_time
+
+    def reset(self):
+        with self._lock:
+            self._requests.clear()
+            self._views.clear()
+
+    def render(self, sample_rate):
+        lines = [
+            '# HELP orderly_instrumentation_sample_rate Доля замеряемых запросов',
+            '# TYPE orderly_instrumentation_sample_rate gauge',
+            f'orderly_instrumentation_sample_rate {sample_rate}',
+            '# HELP orderly_requests_total Замеренные запросы',
+            '# TYPE orderly_requests_total counter',
+        ]
+        with self._lock:
+            for (view, method, status), count in sorted(self._requests.items()):
+                lines.append(
+                    f'orderly_requests_total{{view="{view}",method="{method}",status="{status}"}} {count}'
+                )
+            views = sorted(self._views.items())
+            lines += self._histogram('orderly_request_duration_seconds', 'Время обработки запроса',
+                                     [(view, stats['duration']) for view, stats in views])
+            lines += self._histogram('orderly_db_queries', 'SQL-запросов на HTTP-запрос',
+                                     [(view, stats['queries']) for view, stats in views])
+            for name, field, help_text in (
+                ('orderly_db_duration_seconds_total', 'sql_seconds', 'Суммарное время SQL'),
+                ('orderly_serializer_duration_seconds_total', 'serializer_seconds', 'Суммарное время сериализаторов'),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                lines += [f'{name}{{view="{view}"}} {stats[field]:.6f}' for view, stats in views]
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _histogram(name, help_text, items):
+        lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for view, histogram in items:
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{view="{view}"}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{view="{view}"}} {histogram.count}')
+        return lines
+
+
+registry = MetricsRegistry()
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view_class = getattr(match.func, 'view_class', None) or getattr(match.func, 'cls', None)
+    if view_class is not None:
+        return view_class.__name__
+    return match.view_name or getattr(match.func, '__name__', 'unknown')
+
+
+def server_timing(metrics, total):
+    return ', '.join([
+        f'db;desc="SQL: {metrics.queries}";dur={metrics.sql_time * 1000:.2f}',
+        f'serializer;dur={metrics.serializer_time * 1000:.2f}',
+        f'total;dur={total * 1000:.2f}',
+    ])
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = instrumentation_settings()
+        if not config['ENABLED'] or random.random() >= config['SAMPLE_RATE']:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - start
+
+        registry.observe(view_name(request), request.method, response.status_code, total, metrics)
+        if config['SERVER_TIMING']:
+            response['Server-Timing'] = server_timing(metrics, total)
+        return response
+
+
+def metrics_view(request):
+    config = instrumentation_settings()
+    if not config['METRICS_TOKEN']:
+        if not settings.DEBUG:
+            return HttpResponseNotFound()
+    elif request.headers.get('Authorization') != f'Bearer {config["METRICS_TOKEN"]}':
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(config['SAMPLE_RATE']),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
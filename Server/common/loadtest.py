@@ -0,0 +1,138 @@
+"""
+Нагрузочный прогон HTTP-маршрутов (management-команда bench_api).
+
+Каждый Endpoint выполняется отдельно: N запросов в `concurrency` потоков.
+Запросы идут либо через django.test.Client в этом процессе (по умолчанию),
+либо по HTTP на уже запущенный сервер (base_url). Число SQL-запросов
+берется из заголовка Server-Timing, который добавляет
+InstrumentationMiddleware, поэтому работает в обоих режимах.
+"""
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from common.benchmark import Benchmark
+
+_SQL_COUNT = re.compile(r'desc="SQL: (\d+)"')
+
+
+def queries_from_server_timing(header):
+    match = _SQL_COUNT.search(header or '')
+    return int(match.group(1)) if match else None
+
+
+class Endpoint:
+    """
+    Маршрут для прогона. path и data могут быть функциями (rng, fixtures),
+    чтобы запросы расходились по страницам, товарам и т.п.
+    """
+
+    def __init__(self, name, path, method='get', data=None, auth=None, expect=(200,), writes=False):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.data = data
+        # Ключ токена в fixtures['tokens'] ('buyer', 'seller') или None
+        self.auth = auth
+        self.expect = expect
+        # Меняет данные (заказы, коды OTP в outbox)
+        self.writes = writes
+
+    def build(self, rng, fixtures):
+        path = self.path(rng, fixtures) if callable(self.path) else self.path
+        data = self.data(rng, fixtures) if callable(self.data) else self.data
+        headers = {}
+        if self.auth:
+            headers['Authorization'] = f'Bearer {fixtures["tokens"][self.auth]}'
+        return path, data, headers
+
+
+class LoadRunner:
+    def __init__(self, fixtures, concurrency=8, requests=200, seed=42, base_url=None):
+        self.fixtures = fixtures
+        self.concurrency = concurrency
+        self.requests = requests
+        self.seed = seed
+        self.base_url = base_url.rstrip('/') if base_url else None
+
+    def run(self, endpoint):
+        bench = Benchmark(endpoint.name)
+        statuses = Counter()
+        lock = threading.Lock()
+        per_worker = [
+            self.requests // self.concurrency + (1 if i < self.requests % self.concurrency else 0)
+            for i in range(self.concurrency)
+        ]
+
+        def worker(index, count):
+            rng = random.Random(f'{self.seed}:{endpoint.name}:{index}')
+            send = self._http if self.base_url else self._client()
+            try:
+                for _ in range(count):
+                    path, data, headers = endpoint.build(rng, self.fixtures)
+                    start = time.perf_counter()
+                    status, queries = send(endpoint.method, path, data, headers)
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        bench.add(elapsed, queries)
+                        statuses[status] += 1
+            finally:
+                # У каждого потока свои соединения с БД
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(i, count)) for i, count in enumerate(per_worker) if count]
+        # Server-Timing нужен на каждом ответе для подсчета запросов
+        with override_settings(INSTRUMENTATION={'ENABLED': True, 'SAMPLE_RATE': 1.0, 'SERVER_TIMING': True}):
+            wall_start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            wall = time.perf_counter() - wall_start
+
+        summary = bench.summary()
+        summary.update({
+            'method': endpoint.method.upper(),
+            'concurrency': len(threads),
+            # Пропускная способность всего прогона, а не одного потока
+            'throughput_per_s': round(summary['iterations'] / wall, 2) if wall else 0.0,
+            'wall_s': round(wall, 4),
+            'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            'errors': sum(count for status, count in statuses.items() if status not in endpoint.expect),
+        })
+        return summary
+
+    def _client(self):
+        client = Client(raise_request_exception=False)
+
+        def send(method, path, data, headers):
+            kwargs = {'headers': headers}
+            if data is not None:
+                kwargs.update(data=json.dumps(data), content_type='application/json')
+            response = getattr(client, method)(path, **kwargs)
+            return response.status_code, queries_from_server_timing(response.get('Server-Timing'))
+
+        return send
+
+    def _http(self, method, path, data, headers):
+        body = None
+        if data is not None:
+            body = json.dumps(data).encode()
+            headers = {**headers, 'Content-Type': 'application/json'}
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method.upper())
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status, queries_from_server_timing(response.headers.get('Server-Timing'))
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            return exc.code, queries_from_server_timing(exc.headers.get('Server-Timing'))
@@ -0,0 +1,142 @@
+import subprocess
+import tempfile
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from apps.accounts.models import SellerProfile
+from apps.accounts.tokens import UserRefreshToken
+from apps.notifications.services import outbox_settings
+from apps.products.models import Category, Order, Product
+from common.benchmark import format_summary, test_database, write_results
+from common.loadtest import Endpoint, LoadRunner
+
+User = get_user_model()
+
+PRODUCTS = '/api/v1/products'
+ACCOUNTS = '/api/v1/accounts'
+
+# Маршруты apps/products/urls.py и apps/accounts/urls.py
+ENDPOINTS = [
+    Endpoint('category-list', f'{PRODUCTS}/categories/'),
+    Endpoint('root-categories', f'{PRODUCTS}/categories/root/'),
+    Endpoint('product-list', lambda rng, f: f'{PRODUCTS}/products/?page={rng.randint(1, 50)}'),
+    Endpoint('product-list:search', lambda rng, f: f'{PRODUCTS}/products/?search={quote(rng.choice(f["search"]))}'),
+    Endpoint('product-list:filter', lambda rng, f: (
+        f'{PRODUCTS}/products/?category={rng.choice(f["category_ids"])}&min_price=100&ordering=price'
+    )),
+    Endpoint('product-batch', lambda rng, f: (
+        f'{PRODUCTS}/products/batch/?ids={",".join(map(str, rng.sample(f["product_ids"], min(20, len(f["product_ids"])))))}'
+    )),
+    Endpoint('review-list', lambda rng, f: f'{PRODUCTS}/reviews/?product={rng.choice(f["product_ids"])}'),
+    Endpoint('my-products', f'{PRODUCTS}/products/my/', auth='seller'),
+    Endpoint('my-reviews', f'{PRODUCTS}/reviews/my/', auth='buyer'),
+    Endpoint('order-list', f'{PRODUCTS}/orders/', auth='buyer'),
+    Endpoint('order-create', f'{PRODUCTS}/orders/', method='post', auth='buyer', expect=(201,), writes=True, data=lambda rng, f: {
+        'shipping_address': 'Ташкент, ул. Навои, 1',
+        'shipping_phone': '+998900000000',
+        'shipping_cost': '15000.00',
+        'items': [
+            {'product_id': product_id, 'quantity': 1}
+            for product_id in rng.sample(f['stock_product_ids'], min(2, len(f['stock_product_ids'])))
+        ],
+    }),
+    Endpoint('register-stage1', f'{ACCOUNTS}/register/stage1/', method='post', writes=True, data=lambda rng, f: {
+        'email_or_phone': f'load-{uuid.UUID(int=rng.getrandbits(128)).hex}@gmail.com',
+    }),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон API: конкурентные запросы к маршрутам products и accounts, '
+        'p50/p95/p99, пропускная способность и SQL-запросы на маршрут. '
+        'Данные — из seed_catalog (или --seed-scale на временной БД)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('-c', '--concurrency', type=int, default=8)
+        parser.add_argument('-n', '--requests', type=int, default=200, help='Запросов на маршрут')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help=f'Только эти маршруты: {", ".join(e.name for e in ENDPOINTS)}')
+        parser.add_argument('--base-url', help='Запущенный сервер, например http://127.0.0.1:8000 '
+                                               '(с INSTRUMENTATION_SERVER_TIMING=True для числа SQL); '
+                                               'по умолчанию запросы выполняются в этом процессе')
+        parser.add_argument('--seed-scale', type=float,
+                            help='Создать временную БД и заполнить ее seed_catalog --scale <значение>')
+        parser.add_argument('--writes', action='store_true',
+                            help='Включить маршруты с записью на рабочей БД (с --seed-scale включены всегда)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON')
+
+    def handle(self, *args, concurrency, requests, endpoints, base_url, seed_scale, writes, seed, json_path,
+               **options):
+        if endpoints:
+            unknown = set(endpoints) - {endpoint.name for endpoint in ENDPOINTS}
+            if unknown:
+                raise CommandError(f'Неизвестные маршруты: {", ".join(sorted(unknown))}')
+            selected = [endpoint for endpoint in ENDPOINTS if endpoint.name in endpoints]
+        else:
+            writes = writes or seed_scale is not None
+            selected = [endpoint for endpoint in ENDPOINTS if writes or not endpoint.writes]
+        if seed_scale is not None and base_url:
+            raise CommandError('--seed-scale работает только без --base-url')
+
+        with ExitStack() as stack:
+            if seed_scale is not None:
+                tmp = stack.enter_context(tempfile.TemporaryDirectory())
+                stack.enter_context(test_database(name=str(Path(tmp) / 'bench_api.sqlite3')))
+                call_command('seed_catalog', scale=seed_scale, seed=seed, stdout=self.stdout)
+            # Коды регистрации остаются в outbox: фоновая отправка не мешает замерам
+            stack.enter_context(override_settings(OUTBOX={**outbox_settings(), 'EAGER_DISPATCH': False}))
+            runner = LoadRunner(self._fixtures(), concurrency, requests, seed, base_url)
+            results = []
+            for endpoint in selected:
+                summary = runner.run(endpoint)
+                results.append(summary)
+                self.stdout.write(format_summary(summary) + f"  errors={summary['errors']}")
+
+        if json_path:
+            write_results(
+                json_path, results, benchmark='api', commit=self._commit(), started_at=timezone.now(),
+                concurrency=concurrency, requests=requests, seed=seed, seed_scale=seed_scale,
+                base_url=base_url, database=settings.DATABASES['default']['ENGINE'],
+            )
+
+    def _fixtures(self):
+        seller = SellerProfile.objects.select_related('user').order_by('id').first()
+        buyer_id = Order.objects.filter(
+            buyer__isnull=False, buyer__seller_profile__isnull=True,
+        ).order_by('id').values_list('buyer_id', flat=True).first()
+        if seller is None or buyer_id is None:
+            raise CommandError('Нет данных: запустите seed_catalog или укажите --seed-scale')
+
+        products = Product.objects.filter(is_active=True).order_by('id')
+        titles = products.values_list('title', flat=True)[:200]
+        return {
+            'category_ids': list(Category.objects.filter(is_active=True).values_list('id', flat=True)[:1000]),
+            'product_ids': list(products.values_list('id', flat=True)[:5000]),
+            'stock_product_ids': list(products.filter(quantity__gte=100).values_list('id', flat=True)[:5000]),
+            'search': sorted({word for title in titles for word in title.split() if not word.isdigit()}),
+            'tokens': {
+                'seller': str(UserRefreshToken.for_user(seller.user).access_token),
+                'buyer': str(UserRefreshToken.for_user(User.objects.get(id=buyer_id)).access_token),
+            },
+        }
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from common.openapi import build_schema_files
+
+
+class Command(BaseCommand):
+    help = 'Собирает OpenAPI-схему в статические файлы (запускать при деплое)'
+
+    def handle(self, *args, **options):
+        for path in build_schema_files():
+            self.stdout.write(f'Схема записана: {path}')
@@ -0,0 +1,115 @@
+"""
+Заранее собранная OpenAPI-схема.
+
+`manage.py build_openapi` при деплое пишет схему в OPENAPI_SCHEMA['DIR']
+(openapi.json и openapi.yaml). schema_file() отдает ее из памяти процесса
+с ETag: файл читается один раз и перечитывается, только если при
+следующем деплое изменилось его время модификации. Если файла нет,
+схема генерируется при первом запросе и тоже кэшируется в памяти.
+"""
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.module_loading import import_string
+from django.views.decorators.http import condition, require_safe
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+from drf_yasg.generators import OpenAPISchemaGenerator
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    '.json': (OpenAPICodecJson, 'application/json'),
+    '.yaml': (OpenAPICodecYaml, 'application/yaml'),
+}
+
+
+def schema_settings():
+    return {
+        'INFO': 'core.openapi.api_info',
+        'DIR': Path(settings.BASE_DIR) / 'openapi',
+        **getattr(settings, 'OPENAPI_SCHEMA', {}),
+    }
+
+
+def schema_path(fmt):
+    return Path(schema_settings()['DIR']) / f'openapi{fmt}'
+
+
+def generate_schema(fmt):
+    """Сгенерировать схему (обход всех view и swagger_auto_schema)"""
+    info = import_string(schema_settings()['INFO'])
+    schema = OpenAPISchemaGenerator(info=info).get_schema(request=None, public=True)
+    codec_class, _ = FORMATS[fmt]
+    return codec_class(validators=[]).encode(schema)
+
+
+def build_schema_files():
+    """Записать схему во все форматы; возвращает список путей"""
+    paths = []
+    for fmt in FORMATS:
+        path = schema_path(fmt)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        tmp.write_bytes(generate_schema(fmt))
+        # Атомарная замена: процессы не прочитают наполовину записанный файл
+        os.replace(tmp, path)
+        paths.append(path)
+    return paths
+
+
+class SchemaCache:
+    """Схема в памяти процесса: {формат: (mtime файла, содержимое, etag)}"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, fmt):
+        path = schema_path(fmt)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        entry = self._entries.get(fmt)
+        if entry is not None and entry[0] == mtime:
+            return entry[1], entry[2]
+
+        with self._lock:
+            entry = self._entries.get(fmt)
+            if entry is None or entry[0] != mtime:
+                if mtime is None:
+                    logger.warning('Файл %s не найден, схема генерируется на лету (manage.py build_openapi)', path)
+                    content = generate_schema(fmt)
+                else:
+                    content = path.read_bytes()
+                entry = (mtime, content, hashlib.sha256(content).hexdigest())
+                self._entries[fmt] = entry
+        return entry[1], entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+schema_cache = SchemaCache()
+
+
+def _etag(request, format):
+    if format not in FORMATS:
+        return None
+    return schema_cache.get(format)[1]
+
+
+@require_safe
+@condition(etag_func=_etag)
+def schema_file(request, format):
+    if format not in FORMATS:
+        raise Http404
+    content, _ = schema_cache.get(format)
+    return HttpResponse(content, content_type=FORMATS[format][1])
@@ -0,0 +1,144 @@
+"""
+Поиск повторяющихся запросов (N+1) в пределах HTTP-запроса или блока кода.
+
+Запросы сравниваются по «форме»: SQL, где литералы заменены плейсхолдерами,
+а списки IN (...) свернуты, поэтому 20 запросов
+    SELECT ... FROM products_productimage WHERE (product_id = %s AND is_main) ...
+с разными product_id — это одна форма, выполненная 20 раз. Форма,
+выполненная больше QUERY_GUARD['THRESHOLD'] раз, считается N+1:
+в лог пишутся места вызова, а в тестах запрос падает с DuplicateQueriesError.
+
+- DuplicateQueryMiddleware — для staging (ENABLED) и тестов;
+- QueryGuardRunner — тест-раннер, включающий проверку с RAISE;
+- detect_duplicate_queries() — для проверки отдельного блока в тесте.
+"""
+import logging
+import re
+import traceback
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'THRESHOLD': 5,
+    'RAISE': False,
+    # Регулярные выражения форм, которые не проверяются
+    'IGNORE': [],
+    'STACK_DEPTH': 8,
+}
+
+# Строки и числа, подставленные в SQL без параметров (raw(), LIMIT 21)
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_WHITESPACE = re.compile(r'\s+')
+# Сами обертки execute_wrapper в стеке не нужны
+_TOOLING_FILES = {
+    str(Path(__file__).resolve()),
+    str(Path(__file__).resolve().with_name('instrumentation.py')),
+}
+
+
+def guard_settings():
+    return {**DEFAULTS, **getattr(settings, 'QUERY_GUARD', {})}
+
+
+def fingerprint(sql):
+    return _WHITESPACE.sub(' ', _IN_LIST.sub('IN (...)', _LITERAL.sub('%s', sql))).strip()
+
+
+class DuplicateQueriesError(AssertionError):
+    pass
+
+
+def _call_site(depth):
+    """Кадры стека из кода проекта (без Django и библиотек)"""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(base_dir) and frame.filename not in _TOOLING_FILES
+        and 'site-packages' not in frame.filename
+    ]
+    return ''.join(traceback.format_list(frames[-depth:]))
+
+
+class QueryRecorder:
+    """execute_wrapper: считает запросы по форме и запоминает места вызова"""
+
+    def __init__(self, threshold, ignore=(), stack_depth=8):
+        self.threshold = threshold
+        self.ignore = [re.compile(pattern) for pattern in ignore]
+        self.stack_depth = stack_depth
+        self.counts = defaultdict(int)
+        self.call_sites = defaultdict(set)
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = fingerprint(sql)
+        if not any(pattern.search(shape) for pattern in self.ignore):
+            self.counts[shape] += 1
+            # Места вызова нужны только для повторов; разных мест обычно немного
+            if self.counts[shape] > 1 and len(self.call_sites[shape]) < 3:
+                self.call_sites[shape].add(_call_site(self.stack_depth))
+        return execute(sql, params, many, context)
+
+    def duplicates(self):
+        return {shape: count for shape, count in self.counts.items() if count > self.threshold}
+
+    def report(self, label=''):
+        lines = [f'Повторяющиеся запросы{f" ({label})" if label else ""}, порог {self.threshold}:']
+        for shape, count in sorted(self.duplicates().items(), key=lambda item: -item[1]):
+            lines.append(f'\n{count} x {shape}')
+            for site in self.call_sites[shape]:
+                lines.append(site.rstrip())
+        return '\n'.join(lines)
+
+
+@contextmanager
+def detect_duplicate_queries(threshold=None, raise_error=True, label=''):
+    config = guard_settings()
+    recorder = QueryRecorder(
+        config['THRESHOLD'] if threshold is None else threshold,
+        config['IGNORE'],
+        config['STACK_DEPTH'],
+    )
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+    if recorder.duplicates():
+        report = recorder.report(label)
+        logger.warning(report)
+        if raise_error:
+            raise DuplicateQueriesError(report)
+
+
+class DuplicateQueryMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = guard_settings()
+        if not config['ENABLED']:
+            return self.get_response(request)
+        with detect_duplicate_queries(raise_error=config['RAISE'], label=f'{request.method} {request.path}'):
+            return self.get_response(request)
+
+
+class QueryGuardRunner(DiscoverRunner):
+    """Тест-раннер: запросы с N+1 выше порога падают с DuplicateQueriesError"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._query_guard = override_settings(QUERY_GUARD={**guard_settings(), 'ENABLED': True, 'RAISE': True})
+        self._query_guard.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._query_guard.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,90 @@
+"""
+JSON-рендерер и парсер DRF на orjson (extra "fast-json" в pyproject.toml).
+
+Включаются настройкой API_FAST_JSON. Вывод совпадает с JSONRenderer
+при настройках DRF по умолчанию (UNICODE_JSON, COMPACT_JSON):
+datetime/Decimal/ленивые строки кодируются так же, как в JSONEncoder DRF,
+orjson лишь берет на себя обход структуры и кодирование строк и чисел.
+"""
+import datetime
+import decimal
+
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+
+OPTIONS = (
+    # datetime/date/time кодируем как JSONEncoder DRF (UTC — с "Z")
+    orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+    | orjson.OPT_NON_STR_KEYS
+)
+
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+def _datetime(obj):
+    # Тот же формат, что у JSONEncoder DRF
+    representation = obj.isoformat()
+    if representation.endswith('+00:00'):
+        representation = representation[:-6] + 'Z'
+    return representation
+
+
+# Частые типы без цепочки isinstance в JSONEncoder.default
+_FAST_TYPES = {
+    datetime.datetime: _datetime,
+    datetime.date: datetime.date.isoformat,
+    decimal.Decimal: float,
+}
+
+
+def default(obj):
+    encode = _FAST_TYPES.get(type(obj))
+    if encode is not None:
+        return encode(obj)
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = OPTIONS
+        if self._indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=default, option=options)
+        # Как в JSONRenderer: U+2028/U+2029 допустимы в JSON, но не в JavaScript
+        if LINE_SEPARATOR in ret or PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
+
+    def _indent(self, accepted_media_type, renderer_context):
+        if accepted_media_type:
+            params = dict(
+                part.strip().split('=', 1) for part in accepted_media_type.split(';')[1:] if '=' in part
+            )
+            if params.get('indent'):
+                return True
+        return bool(renderer_context.get('indent'))
+
+
+class ORJSONParser(BaseParser):
+    media_type = 'application/json'
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
@@ -0,0 +1,139 @@
+"""
+Разделение чтения и записи между основной БД и репликами.
+
+Реплики — все алиасы DATABASES, кроме default (см. replicas_from_env
+в core/settings/database.py). Чтения уходят на реплику, только если:
+
+- запрос безопасный (GET/HEAD/OPTIONS) и не попадает в PRIMARY_PATHS;
+- модель не из PRIMARY_MODELS (заказы всегда читаются с основной БД);
+- пользователь не делал запись последние STICKY_SECONDS секунд —
+  иначе он может не увидеть собственных изменений из-за отставания реплики.
+
+Реплика выбирается один раз на запрос: count() пагинации и сама страница
+читаются с одинаковым отставанием.
+
+Вне HTTP-запроса (management-команды, outbox, WebSocket) и внутри
+primary() все запросы идут в основную БД.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import SimpleLazyObject
+
+DEFAULTS = {
+    'STICKY_SECONDS': 5,
+    'PRIMARY_PATHS': [],
+    'PRIMARY_MODELS': [],
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_routing = ContextVar('replica_routing', default=None)
+_force_primary = ContextVar('replica_force_primary', default=False)
+
+
+def routing_settings():
+    return {**DEFAULTS, **getattr(settings, 'REPLICA_ROUTING', {})}
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+def _sticky_key(user_id):
+    return f'replica:sticky:{user_id}'
+
+
+@contextmanager
+def primary():
+    """Все чтения внутри блока — с основной БД (проверка остатков и т.п.)"""
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+
+class RequestRouting:
+    """Решение о чтении с реплики для одного запроса"""
+
+    __slots__ = ('request', 'primary_only', '_sticky_user_id', '_sticky', '_replica')
+
+    def __init__(self, request, config):
+        self.request = request
+        self.primary_only = request.method not in SAFE_METHODS or any(
+            request.path.startswith(prefix) for prefix in config['PRIMARY_PATHS']
+        )
+        self._sticky_user_id = None
+        self._sticky = False
+        self._replica = None
+
+    def use_primary(self):
+        if self.primary_only:
+            return True
+        # Пользователь известен только после аутентификации DRF (JWT без запроса
+        # к БД), поэтому проверка ленивая и повторяется, если он сменился.
+        # Ленивого пользователя сессии не вычисляем: его загрузка сама идет через роутер
+        user = self.request.__dict__.get('user')
+        if isinstance(user, SimpleLazyObject):
+            user = getattr(self.request, '_cached_user', None)
+        if user is None or not user.is_authenticated:
+            return False
+        if self._sticky_user_id != user.id:
+            self._sticky_user_id = user.id
+            self._sticky = cache.get(_sticky_key(user.id)) is not None
+        return self._sticky
+
+    def replica(self, aliases):
+        """Реплика, закрепленная за запросом"""
+        if self._replica not in aliases:
+            self._replica = random.choice(aliases)
+        return self._replica
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if not replicas or _force_primary.get():
+            return DEFAULT_DB_ALIAS
+        if model._meta.label_lower in routing_settings()['PRIMARY_MODELS']:
+            return DEFAULT_DB_ALIAS
+        routing = _routing.get()
+        if routing is None or routing.use_primary():
+            return DEFAULT_DB_ALIAS
+        return routing.replica(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Определяет для запроса, можно ли читать с реплик, и после записи
+    закрепляет пользователя за основной БД на STICKY_SECONDS
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = routing_settings()
+        token = _routing.set(RequestRouting(request, config))
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        user = getattr(request, 'user', None)
+        if request.method not in SAFE_METHODS and user is not None and user.is_authenticated \
+                and config['STICKY_SECONDS'] and replica_aliases():
+            cache.set(_sticky_key(user.id), 1, config['STICKY_SECONDS'])
+        return response
@@ -0,0 +1,217 @@
+"""
+Быстрый read-only вывод сериализаторов DRF из строк .values().
+
+ValuesSerializer повторяет вывод serializer_class (те же ключи, порядок
+и представление значений), но не создает модели и не проходит по полям
+DRF для каждой строки: список полей один раз компилируется в экстракторы
+(ключ .values(), проверки null-связей, функция представления), а для
+строк, полученных из БД уже в нужном типе (строки, числа, bool, pk),
+представление не вызывается вовсе.
+
+Поля, которые не выражаются ключом .values() (SerializerMethodField,
+вложенные сериализаторы, свойства и методы модели), задаются методом
+get_<поле>(row). Для обычных полей он заменяет только чтение атрибута —
+результат проходит через to_representation поля, как в DRF; для
+SerializerMethodField и вложенных сериализаторов возвращается как есть.
+Связанные данные для всей страницы загружаются в prepare(rows).
+
+Разреженный вывод (?fields=id,title&expand=items): fieldset_params()
+разбирает параметры, select_fields() выбирает поля. Вложенные связи из
+Meta.expandable_fields сериализатора отдаются только при expand (без
+параметра — все, как раньше). Выбранные поля определяют и запрос:
+ValuesSerializer читает только их ключи .values(), а sparse_queryset()
+задает only()/select_related() для ModelSerializer с SparseFieldsMixin.
+"""
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from .instrumentation import serializer_timer
+
+# Значения из БД уже в нужном типе: to_representation вернул бы их же
+PASSTHROUGH_FIELDS = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+)
+
+
+class InvalidFieldset(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+
+    def __init__(self, message):
+        super().__init__({'error': message})
+
+
+def _names(value):
+    return None if value is None else {name.strip() for name in value.split(',') if name.strip()}
+
+
+def fieldset_params(query_params):
+    """(fields, expand) из ?fields=&expand=; None — параметр не передан"""
+    return _names(query_params.get('fields')), _names(query_params.get('expand'))
+
+
+def select_fields(available, fields=None, expand=None, expandable=()):
+    """
+    Поля для вывода в порядке available. fields=None — все поля,
+    expand=None — все раскрываемые связи; раскрытые связи выводятся,
+    даже если их нет в fields
+    """
+    unknown = (set(fields or ()) - set(available)) | (set(expand or ()) - set(expandable))
+    if unknown:
+        raise InvalidFieldset(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    return [
+        name for name in available
+        if (fields is None or name in fields or name in (expand or ()))
+        and (name not in expandable or expand is None or name in expand)
+    ]
+
+
+def _resolve(model, source_attrs):
+    """
+    Ключ .values() для source поля и ключи nullable-связей на пути к нему:
+    если связь пуста, DRF пропускает поле (SkipField), а не отдает null.
+    FieldDoesNotExist — source не путь по полям модели
+    """
+    nullable = []
+    for depth, attr in enumerate(source_attrs):
+        model_field = model._meta.get_field(attr)
+        if depth < len(source_attrs) - 1:
+            if not model_field.is_relation:
+                raise FieldDoesNotExist(attr)
+            if model_field.null:
+                nullable.append('__'.join(source_attrs[:depth + 1]))
+            model = model_field.related_model
+    return '__'.join(source_attrs), tuple(nullable)
+
+
+def _expandable(serializer_class):
+    return tuple(getattr(serializer_class.Meta, 'expandable_fields', ()))
+
+
+class SparseFieldsMixin:
+    """
+    ModelSerializer с разреженным выводом: Serializer(..., fields=..., expand=...).
+    Meta.expandable_fields — вложенные связи, Meta.source_lookups — колонки
+    для полей, чей source не поле модели (например, get_status_display)
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = set(select_fields(list(self.fields), fields, expand, _expandable(type(self))))
+        for name in list(self.fields):
+            if name not in selected:
+                self.fields.pop(name)
+
+
+def sparse_queryset(queryset, serializer, *extra):
+    """
+    only()/select_related() по оставшимся полям сериализатора; extra —
+    колонки, нужные самому view. Вложенные связи и SerializerMethodField
+    загружает вызывающий код (prefetch_related)
+    """
+    model = queryset.model
+    source_lookups = getattr(serializer.Meta, 'source_lookups', {})
+    only, related = {model._meta.pk.name, *extra}, set()
+    for name, field in serializer.fields.items():
+        if field.write_only or isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer)):
+            continue
+        if name in source_lookups:
+            only.update(source_lookups[name])
+            continue
+        try:
+            if not field.source_attrs:
+                raise FieldDoesNotExist(name)
+            lookup, _ = _resolve(model, field.source_attrs)
+        except FieldDoesNotExist:
+            # Неизвестно, какие колонки нужны: only() вызвал бы догрузку по одной
+            return queryset
+        only.add(lookup)
+        if len(field.source_attrs) > 1:
+            related.add('__'.join(field.source_attrs[:-1]))
+    if related:
+        queryset = queryset.select_related(*sorted(related))
+    return queryset.only(*sorted(only))
+
+
+class ValuesSerializer:
+    serializer_class = None
+    # Дополнительные ключи .values(), нужные prepare()
+    extra_lookups = ()
+    # Ключи .values(), нужные get_<поле>(): {'total_cost': ('price', 'quantity')}
+    method_lookups = {}
+
+    _compiled = None
+
+    def __init__(self, context=None, fields=None, expand=None):
+        self.context = context or {}
+        compiled = self.compile()
+        self.field_names = select_fields(
+            [name for name, *_ in compiled], fields, expand, _expandable(self.serializer_class),
+        )
+        selected = set(self.field_names)
+        self.fields = [entry for entry in compiled if entry[0] in selected]
+
+    @classmethod
+    def compile(cls):
+        """[(имя, ключ .values(), nullable-связи, представление, get_<имя>)] — один раз на класс"""
+        if cls.__dict__.get('_compiled') is None:
+            model = cls.serializer_class.Meta.model
+            fields = []
+            for name, field in cls.serializer_class().fields.items():
+                if field.write_only:
+                    continue
+                getter = getattr(cls, f'get_{name}', None)
+                raw = isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer))
+                if getter is not None:
+                    fields.append((name, None, (), None if raw else field.to_representation, getter))
+                    continue
+                if raw:
+                    raise ImproperlyConfigured(f'{cls.__name__}: для поля "{name}" нужен метод get_{name}(row)')
+                try:
+                    lookup, nullable = _resolve(model, field.source_attrs)
+                except FieldDoesNotExist:
+                    raise ImproperlyConfigured(
+                        f'{cls.__name__}: source поля "{name}" не поле модели, нужен метод get_{name}(row)'
+                    )
+                passthrough = isinstance(field, PASSTHROUGH_FIELDS) or (
+                    isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None
+                )
+                fields.append((name, lookup, nullable, None if passthrough else field.to_representation, None))
+            cls._compiled = fields
+        return cls._compiled
+
+    def lookups(self):
+        keys = []
+        for name, lookup, nullable, _, getter in self.fields:
+            if getter is not None:
+                keys.extend(self.method_lookups.get(name, ()))
+            else:
+                keys.extend((lookup, *nullable))
+        keys.extend(self.extra_lookups)
+        return list(dict.fromkeys(keys))
+
+    def values(self, queryset, *extra):
+        """extra — ключи, нужные вызывающему коду, даже если поля нет в выводе"""
+        return queryset.values(*dict.fromkeys([*self.lookups(), *extra]))
+
+    def prepare(self, rows):
+        """Загрузить связанные данные для всех строк страницы"""
+
+    def to_representation(self, row):
+        ret = {}
+        for name, lookup, nullable, represent, getter in self.fields:
+            if getter is not None:
+                value = getter(self, row)
+            elif any(row[key] is None for key in nullable):
+                continue
+            else:
+                value = row[lookup]
+            ret[name] = value if value is None or represent is None else represent(value)
+        return ret
+
+    def serialize(self, rows):
+        # Не через BaseSerializer.data: время для InstrumentationMiddleware замеряется здесь
+        with serializer_timer():
+            rows = list(rows)
+            self.prepare(rows)
+            return [self.to_representation(row) for row in rows]
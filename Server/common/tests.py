@@ -0,0 +1,270 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, router
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import ignore_warnings
+
+from apps.products.models import Category, Order, Product
+
+from . import openapi
+from .instrumentation import registry
+from .querycheck import DuplicateQueriesError, DuplicateQueryMiddleware, detect_duplicate_queries, fingerprint
+from .replicas import ReplicaRoutingMiddleware
+
+User = get_user_model()
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    """
+    Роутер с двумя репликами на SQLite-файлах. Соединения к репликам не
+    открываются: проверяется, какой алиас выбирает роутер
+    """
+
+    def setUp(self):
+        cache.clear()
+        tmp = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        databases = {
+            **settings.DATABASES,
+            **{
+                alias: {**settings.DATABASES[DEFAULT_DB_ALIAS], 'NAME': str(tmp / f'{alias}.sqlite3')}
+                for alias in ('replica_1', 'replica_2')
+            },
+        }
+        override = override_settings(DATABASES=databases, REPLICA_ROUTING={
+            'STICKY_SECONDS': 5,
+            'PRIMARY_PATHS': ['/api/v1/products/orders/'],
+            'PRIMARY_MODELS': ['products.order'],
+        })
+        # Меняются только алиасы для роутера
+        with ignore_warnings(message='Overriding setting DATABASES'):
+            override.enable()
+        self.addCleanup(self._disable, override)
+        self.factory = RequestFactory()
+
+    def _disable(self, override):
+        with ignore_warnings(message='Overriding setting DATABASES'):
+            override.disable()
+
+    def route(self, method='get', path='/api/v1/products/products/', user=None):
+        """Алиасы чтения товаров и заказов, выбранные внутри запроса"""
+        reads = {}
+
+        def view(request):
+            if user is not None:
+                request.user = user
+            reads['products'] = {router.db_for_read(Product) for _ in range(10)}
+            reads['orders'] = router.db_for_read(Order)
+            reads['write'] = router.db_for_write(Product)
+            return None
+
+        request = getattr(self.factory, method)(path)
+        ReplicaRoutingMiddleware(view)(request)
+        return reads
+
+    def test_reads_go_to_one_replica_per_request(self):
+        seen = set()
+        for _ in range(20):
+            reads = self.route()
+            self.assertEqual(len(reads['products']), 1)
+            seen |= reads['products']
+            self.assertEqual(reads['orders'], DEFAULT_DB_ALIAS)
+            self.assertEqual(reads['write'], DEFAULT_DB_ALIAS)
+        self.assertLessEqual(seen, {'replica_1', 'replica_2'})
+
+    def test_primary_for_unsafe_methods_paths_and_outside_requests(self):
+        self.assertEqual(self.route(method='post')['products'], {DEFAULT_DB_ALIAS})
+        self.assertEqual(self.route(path='/api/v1/products/orders/')['products'], {DEFAULT_DB_ALIAS})
+        self.assertEqual(router.db_for_read(Product), DEFAULT_DB_ALIAS)
+
+    def test_user_sticks_to_primary_after_write(self):
+        user, other = User(id=1, username='buyer'), User(id=2, username='other')
+        self.route(method='post', user=user)
+        self.assertEqual(self.route(user=user)['products'], {DEFAULT_DB_ALIAS})
+        self.assertNotEqual(self.route(user=other)['products'], {DEFAULT_DB_ALIAS})
+        # Окно STICKY_SECONDS истекло
+        cache.clear()
+        self.assertNotEqual(self.route(user=user)['products'], {DEFAULT_DB_ALIAS})
+
+
+INSTRUMENTED = {'ENABLED': True, 'SAMPLE_RATE': 1.0, 'SERVER_TIMING': True, 'METRICS_TOKEN': ''}
+
+
+@override_settings(INSTRUMENTATION=INSTRUMENTED)
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def timing(self, response):
+        """{метрика: (desc, dur)} из Server-Timing"""
+        parts = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            params = dict(param.split('=', 1) for param in params)
+            parts[name] = (params.get('desc', '').strip('"'), float(params['dur']))
+        return parts
+
+    def test_server_timing_counts_queries_of_the_request(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/products/categories/')
+        self.assertEqual(response.status_code, 200)
+        timing = self.timing(response)
+        self.assertEqual(timing['db'][0], f'SQL: {len(queries)}')
+        self.assertGreater(timing['db'][1], 0)
+        self.assertGreaterEqual(timing['total'][1], timing['db'][1])
+        self.assertIn('orderly_requests_total{view="CategoryListView",method="GET",status="200"} 1',
+                      registry.render(1.0))
+
+    def test_disabled_or_unsampled_requests_are_not_measured(self):
+        for config in ({'ENABLED': False}, {'SAMPLE_RATE': 0.0}):
+            with self.subTest(config), override_settings(INSTRUMENTATION={**INSTRUMENTED, **config}):
+                response = self.client.get('/api/v1/products/categories/')
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('Server-Timing', response)
+                self.assertNotIn('orderly_requests_total{', registry.render(1.0))
+
+    @override_settings(INSTRUMENTATION={**INSTRUMENTED, 'SERVER_TIMING': False})
+    def test_server_timing_can_be_hidden_while_measuring(self):
+        response = self.client.get('/api/v1/products/categories/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertIn('view="CategoryListView"', registry.render(1.0))
+
+    def test_metrics_outside_debug(self):
+        self.client.get('/api/v1/products/categories/')
+        # Без токена /metrics вне DEBUG не существует
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with override_settings(INSTRUMENTATION={**INSTRUMENTED, 'METRICS_TOKEN': 'secret'}):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+            response = self.client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('orderly_db_queries_count{view="CategoryListView"} 1', response.content.decode())
+
+    @override_settings(DEBUG=True)
+    def test_metrics_without_token_in_debug(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+def categories_one_by_one(request):
+    """N+1: категория за категорией"""
+    for category_id in Category.objects.values_list('id', flat=True):
+        Category.objects.get(id=category_id)
+    return None
+
+
+class QueryGuardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [Category.objects.create(name=f'Категория {i}') for i in range(4)]
+
+    def test_fingerprint_collapses_in_lists_and_literals(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s) AND  slug = %s LIMIT 21'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s) AND slug = %s LIMIT 21'),
+        )
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'it''s' AND price > 9.5"),
+            'SELECT * FROM t WHERE id IN (...) AND name = %s AND price > %s',
+        )
+        # Имена таблиц и алиасов с цифрами не меняются
+        self.assertEqual(fingerprint('SELECT U0."id" FROM t2 U0'), 'SELECT U0."id" FROM t2 U0')
+
+    def test_looped_get_over_threshold_raises(self):
+        with self.assertLogs('common.querycheck', 'WARNING'):
+            with self.assertRaises(DuplicateQueriesError) as error:
+                with detect_duplicate_queries(threshold=3, label='loop'):
+                    categories_one_by_one(None)
+        self.assertIn('4 x SELECT', str(error.exception))
+        self.assertIn('products_category', str(error.exception))
+
+    def test_queries_below_threshold_pass(self):
+        with detect_duplicate_queries(threshold=4) as recorder:
+            categories_one_by_one(None)
+        self.assertEqual(recorder.duplicates(), {})
+        self.assertEqual(sorted(recorder.counts.values()), [1, 4])
+
+    @override_settings(QUERY_GUARD={'ENABLED': True, 'RAISE': False, 'THRESHOLD': 3})
+    def test_middleware_logs_call_site(self):
+        request = RequestFactory().get('/api/v1/products/categories/')
+        with self.assertLogs('common.querycheck', 'WARNING') as logs:
+            DuplicateQueryMiddleware(categories_one_by_one)(request)
+        report = logs.output[0]
+        self.assertIn('GET /api/v1/products/categories/', report)
+        self.assertIn(f'{Path(__file__).name}", line', report)
+        self.assertIn('Category.objects.get(id=category_id)', report)
+
+
+class OpenAPISchemaTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = Path(directory.name)
+        self.enterContext(override_settings(OPENAPI_SCHEMA={**settings.OPENAPI_SCHEMA, 'DIR': self.dir}))
+        openapi.schema_cache.clear()
+        self.addCleanup(openapi.schema_cache.clear)
+
+    def write(self, content, mtime_ns):
+        path = self.dir / 'openapi.json'
+        path.write_bytes(content)
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def test_build_openapi_writes_both_formats(self):
+        call_command('build_openapi', stdout=open(os.devnull, 'w'))
+        self.assertEqual(sorted(path.name for path in self.dir.iterdir()), ['openapi.json', 'openapi.yaml'])
+        schema = json.loads((self.dir / 'openapi.json').read_bytes())
+        self.assertIn('/products/products/batch/', schema['paths'])
+        self.assertIn(b'swagger:', (self.dir / 'openapi.yaml').read_bytes())
+
+    def test_failed_build_keeps_previous_file(self):
+        self.write(b'{"old": true}', 10 ** 18)
+        with mock.patch.object(openapi, 'generate_schema', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            openapi.build_schema_files()
+        self.assertEqual((self.dir / 'openapi.json').read_bytes(), b'{"old": true}')
+
+        # Файл заменяется целиком через os.replace из временного
+        with mock.patch.object(openapi.os, 'replace', wraps=os.replace) as replace:
+            openapi.build_schema_files()
+        self.assertEqual([call.args[0].name for call in replace.call_args_list],
+                         ['openapi.json.tmp', 'openapi.yaml.tmp'])
+        self.assertFalse(list(self.dir.glob('*.tmp')))
+
+    def test_served_schema_has_etag(self):
+        self.write(b'{"v": 1}', 10 ** 18)
+        with mock.patch.object(openapi, 'generate_schema', side_effect=AssertionError):
+            response = self.client.get('/swagger.json/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, b'{"v": 1}')
+            self.assertEqual(response['Content-Type'], 'application/json')
+            response = self.client.get('/swagger.json/', headers={'if_none_match': response['ETag']})
+            self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get('/swagger.xml/').status_code, 404)
+
+    def test_cache_reloads_when_mtime_changes(self):
+        self.write(b'{"v": 1}', 10 ** 18)
+        etag = self.client.get('/swagger.json/')['ETag']
+        # То же время модификации — файл не перечитывается
+        self.write(b'{"v": 2}', 10 ** 18)
+        self.assertEqual(self.client.get('/swagger.json/').content, b'{"v": 1}')
+
+        self.write(b'{"v": 2}', 10 ** 18 + 1)
+        response = self.client.get('/swagger.json/', headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'{"v": 2}')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_missing_file_is_generated_once(self):
+        with mock.patch.object(openapi, 'generate_schema', return_value=b'{}') as generate, \
+                self.assertLogs('common.openapi', 'WARNING'):
+            self.client.get('/swagger.yaml/')
+            self.client.get('/swagger.yaml/')
+        generate.assert_called_once_with('.yaml')
@@ -0,0 +1,31 @@
+from drf_yasg import openapi
+
+# Описание API: общее для Swagger UI и собранной заранее схемы (common/openapi.py)
+api_info = openapi.Info(
+    title="E-Commerce API",
+    default_version='v1',
+    description="""
+    # API документация для интернет-магазина
+    
+    ## Функциональность:
+    - **Категории** - управление категориями товаров
+    - **Товары** - CRUD операции с товарами, фильтрация, поиск
+    - **Заказы** - создание и управление заказами
+    - **Отзывы** - добавление и просмотр отзывов на товары
+    
+    ## Аутентификация:
+    API поддерживает несколько методов аутентификации:
+    - JWT токены (рекомендуется)
+    - DRF Token
+    - Session authentication
+    
+    ## Права доступа:
+    - Просмотр товаров и категорий - все пользователи
+    - Создание товаров - только продавцы
+    - Создание заказов - только авторизованные покупатели
+    - Управление заказами - владельцы заказов и продавцы
+    """,
+    terms_of_service="https://www.example.com/terms/",
+    contact=openapi.Contact(email="contact@example.com"),
+    license=openapi.License(name="BSD License"),
+)
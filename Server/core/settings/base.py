@@ -1,6 +1,7 @@
 from pathlib import Path
 from datetime import timedelta
 from decouple import config
+from .database import database_from_env, replicas_from_env
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
@@ -23,18 +24,24 @@ INSTALLED_APPS = [
     "rest_framework",
     "rest_framework_simplejwt",
     'django_filters',
+    'common',
     'drf_yasg',
     'apps.accounts',
     'apps.products',
     'apps.support',
+    'apps.notifications',
 ]
 
 MIDDLEWARE = [
+    'common.instrumentation.InstrumentationMiddleware',
+    'common.querycheck.DuplicateQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'common.replicas.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.accounts.middleware.SellerContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -57,20 +64,51 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'core.wsgi.application'
+ASGI_APPLICATION = 'core.asgi.application'
 
 
 
+# Профиль БД задается переменными окружения DB_* (см. core/settings/database.py)
 DATABASES = {
+    'default': database_from_env('sqlite', BASE_DIR / 'db.sqlite3'),
+}
+DATABASES.update(replicas_from_env(DATABASES['default']))
+
+# Чтения каталога — на реплики, записи и заказы — на основную БД
+DATABASE_ROUTERS = ['common.replicas.ReplicaRouter']
+REPLICA_ROUTING = {
+    # После записи запросы пользователя идут в основную БД еще столько секунд
+    'STICKY_SECONDS': config("DB_REPLICA_STICKY_SECONDS", default=5, cast=int),
+    'PRIMARY_PATHS': ['/api/v1/products/orders/', '/admin/'],
+    'PRIMARY_MODELS': ['products.order', 'products.orderitem'],
+}
+
+
+# Версии каталога (ETag), кэш ответов, корзина и коды OTP должны быть общими для
+# всех воркеров. LocMem по умолчанию — только для одного процесса (runserver, тесты);
+# в продакшене — например, CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# и CACHE_LOCATION=redis://... (extra "redis"). Проверка: manage.py check --deploy
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': config("CACHE_BACKEND", default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config("CACHE_LOCATION", default='orderly-default'),
     }
 }
+PROCESS_LOCAL_CACHE_BACKENDS = ['django.core.cache.backends.locmem.LocMemCache']
+CACHE_IS_SHARED = CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHE_BACKENDS
 
+# Сессия нужна регистрации только для хранения email/телефона между шагами:
+# подписанная cookie, без записи в django_session и без общего хранилища.
+# Подтверждение кода хранится на сервере (OTP_SETTINGS), в cookie его нет
+SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+
+
+# JSON на orjson (common/renderers.py, extra "fast-json"); вывод совпадает с JSONRenderer
+API_FAST_JSON = config("API_FAST_JSON", default=False, cast=bool)
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "apps.accounts.authentication.StatelessJWTAuthentication",
     ),
 
     'DEFAULT_PERMISSION_CLASSES': (
@@ -78,6 +116,17 @@ REST_FRAMEWORK = {
     ),                  
 }
 
+if API_FAST_JSON:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = (
+        'common.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    )
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = (
+        'common.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    )
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
@@ -85,6 +134,64 @@ SIMPLE_JWT = {
 }
 
 
+# Одноразовые коды регистрации (apps/accounts/otp.py)
+OTP_SETTINGS = {
+    # 'cache' или 'db'; кэш — только общий для воркеров (CACHE_IS_SHARED) или в DEBUG,
+    # иначе шаги регистрации на разных воркерах не увидят код друг друга
+    'STORE': config("OTP_STORE", default='cache' if CACHE_IS_SHARED or DEBUG else 'db'),
+    'TTL': config("OTP_TTL", default=300, cast=int),
+    'MAX_ATTEMPTS': 5,
+    'RESEND_INTERVAL': 60,
+    'MAX_SENDS': 5,
+    'SEND_WINDOW': 3600,
+}
+
+
+# Очередь исходящих email/SMS (apps/notifications)
+OUTBOX = {
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BASE_DELAY': 30,
+    'RETRY_MAX_DELAY': 3600,
+    # False, если очередь разбирает отдельный процесс `manage.py run_outbox`
+    'EAGER_DISPATCH': config("OUTBOX_EAGER_DISPATCH", default=True, cast=bool),
+    # В production задается явно (SMS_BACKEND), см. production.py и проверку common.E002
+    'SMS_BACKEND': config("SMS_BACKEND", default='apps.notifications.backends.ConsoleSmsBackend'),
+}
+# Бэкенды для разработки: пишут SMS (и коды OTP в них) в stdout/логи открытым текстом
+DEV_SMS_BACKENDS = ['apps.notifications.backends.ConsoleSmsBackend']
+
+# Доставка сообщений чата по WebSocket (apps/support/layers.py).
+# InMemoryChannelLayer — для одного процесса и тестов
+SUPPORT_CHANNEL_LAYER = {
+    'BACKEND': 'apps.support.layers.InMemoryChannelLayer',
+    'OPTIONS': {'capacity': 100},
+}
+
+# Архивация сообщений чата: `manage.py archive_messages` (apps/support/archive.py)
+SUPPORT_RETENTION = {
+    'ARCHIVE_AFTER_DAYS': config("SUPPORT_ARCHIVE_AFTER_DAYS", default=180, cast=int),
+    'BATCH_SIZE': 500,
+}
+
+# Корзина: проверенное состояние в кэше, позиции в БД (apps/products/cart.py)
+CART = {
+    'CACHE_TTL': config("CART_CACHE_TTL", default=24 * 3600, cast=int),
+    'MAX_AGE': config("CART_MAX_AGE", default=15 * 60, cast=int),
+    'MAX_ITEMS': 100,
+}
+
+# Кэш карточки товара с пересчетом одним воркером (apps/products/conditional.py).
+# Нужен общий кэш (CACHE_IS_SHARED): в LocMem у каждого процесса свои записи и
+# блокировки — устаревшие ответы и пересчет в каждом воркере. По умолчанию с LocMem
+# включен только в DEBUG (один процесс)
+CATALOG_RESPONSE_CACHE = {
+    'ENABLED': config("CATALOG_RESPONSE_CACHE", default=CACHE_IS_SHARED or DEBUG, cast=bool),
+    'TTL': config("CATALOG_RESPONSE_CACHE_TTL", default=3600, cast=int),
+    'LOCK_TIMEOUT': 10,
+    'WAIT': 2.0,
+}
+
 
 # Swagger настройки
 SWAGGER_SETTINGS = {
@@ -106,10 +213,39 @@ SWAGGER_SETTINGS = {
     'JSON_EDITOR': True,
     'SHOW_REQUEST_HEADERS': True,
     'VALIDATOR_URL': None,
+    # Схема из common/openapi.py вместо генерации при каждом открытии UI
+    'SPEC_URL': '/swagger.json/',
+}
+
+# Метрики запросов: Server-Timing и /metrics в формате Prometheus (common/instrumentation.py)
+INSTRUMENTATION = {
+    'ENABLED': config("INSTRUMENTATION_ENABLED", default=True, cast=bool),
+    'SAMPLE_RATE': config("INSTRUMENTATION_SAMPLE_RATE", default=1.0, cast=float),
+    # Число и время SQL в ответах видны всем клиентам — по умолчанию только в DEBUG
+    'SERVER_TIMING': config("INSTRUMENTATION_SERVER_TIMING", default=DEBUG, cast=bool),
+    # Без токена /metrics доступен только в DEBUG
+    'METRICS_TOKEN': config("METRICS_TOKEN", default=''),
+}
+
+# Поиск N+1 (common/querycheck.py): на staging — предупреждения в лог,
+# в тестах QueryGuardRunner превращает их в ошибки
+QUERY_GUARD = {
+    'ENABLED': config("QUERY_GUARD_ENABLED", default=False, cast=bool),
+    'THRESHOLD': config("QUERY_GUARD_THRESHOLD", default=5, cast=int),
+    'RAISE': False,
+    'IGNORE': [],
+}
+TEST_RUNNER = 'common.querycheck.QueryGuardRunner'
+
+# Заранее собранная OpenAPI-схема (common/openapi.py, manage.py build_openapi)
+OPENAPI_SCHEMA = {
+    'INFO': 'core.openapi.api_info',
+    'DIR': BASE_DIR / 'openapi',
 }
 
 REDOC_SETTINGS = {
     'LAZY_RENDERING': True,
+    'SPEC_URL': '/swagger.json/',
 }
 
 
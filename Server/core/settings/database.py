@@ -0,0 +1,101 @@
+"""
+Профили подключения к БД. Профиль выбирается переменной DB_ENGINE:
+
+- sqlite     — один узел: WAL, busy_timeout, транзакции BEGIN IMMEDIATE
+- postgresql — продакшен: постоянные соединения или пул psycopg,
+               проверка соединений, statement_timeout
+
+Для пула нужен пакет psycopg[pool] (extra "postgres" в pyproject.toml).
+
+Реплики для чтения (common/replicas.py) задаются DB_REPLICAS — списком
+хостов PostgreSQL или путей к файлам SQLite через запятую.
+"""
+from decouple import Csv, config
+
+
+def sqlite_database(name, busy_timeout=5, wal=True):
+    """
+    SQLite для одного узла. В режиме WAL чтения не блокируются записью,
+    а BEGIN IMMEDIATE сразу берет блокировку записи — параллельные записи
+    ждут busy_timeout секунд вместо ошибки "database is locked" на середине транзакции
+    """
+    pragmas = ['PRAGMA foreign_keys = ON']
+    if wal:
+        pragmas += ['PRAGMA journal_mode = WAL', 'PRAGMA synchronous = NORMAL']
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'OPTIONS': {
+            'timeout': busy_timeout,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': '; '.join(pragmas),
+        },
+    }
+
+
+def postgres_database(name, user, password, host, port=5432, conn_max_age=60,
+                      pool=False, pool_min_size=2, pool_max_size=10,
+                      statement_timeout=5000, connect_timeout=5):
+    """
+    PostgreSQL. Без пула соединение живет conn_max_age секунд и
+    проверяется перед повторным использованием (CONN_HEALTH_CHECKS);
+    с пулом соединения держит psycopg_pool, а CONN_MAX_AGE должен быть 0
+    """
+    options = {
+        'connect_timeout': connect_timeout,
+        # Зависший запрос не должен держать соединение и блокировки
+        'options': f'-c statement_timeout={statement_timeout}',
+    }
+    if pool:
+        options['pool'] = {'min_size': pool_min_size, 'max_size': pool_max_size}
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': name,
+        'USER': user,
+        'PASSWORD': password,
+        'HOST': host,
+        'PORT': port,
+        'CONN_MAX_AGE': 0 if pool else conn_max_age,
+        'CONN_HEALTH_CHECKS': not pool,
+        'OPTIONS': options,
+    }
+
+
+def database_from_env(default_engine, sqlite_name):
+    engine = config('DB_ENGINE', default=default_engine)
+    if engine == 'sqlite':
+        return sqlite_database(
+            config('DB_NAME', default=str(sqlite_name)),
+            busy_timeout=config('DB_BUSY_TIMEOUT', default=5, cast=int),
+            wal=config('DB_SQLITE_WAL', default=True, cast=bool),
+        )
+    if engine == 'postgresql':
+        return postgres_database(
+            config('DB_NAME'),
+            config('DB_USER'),
+            config('DB_PASSWORD'),
+            config('DB_HOST', default='localhost'),
+            port=config('DB_PORT', default=5432, cast=int),
+            conn_max_age=config('DB_CONN_MAX_AGE', default=60, cast=int),
+            pool=config('DB_POOL', default=False, cast=bool),
+            pool_min_size=config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            pool_max_size=config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            statement_timeout=config('DB_STATEMENT_TIMEOUT', default=5000, cast=int),
+        )
+    raise ValueError(f'Неизвестный DB_ENGINE: {engine}')
+
+
+def replicas_from_env(primary):
+    """
+    Реплики с параметрами основной БД: {'replica_1': {...}, ...}.
+    В тестах реплика — зеркало default (TEST MIRROR)
+    """
+    replicas = {}
+    for i, location in enumerate(config('DB_REPLICAS', default='', cast=Csv()), start=1):
+        replica = {**primary, 'OPTIONS': dict(primary.get('OPTIONS', {})), 'TEST': {'MIRROR': 'default'}}
+        if primary['ENGINE'] == 'django.db.backends.sqlite3':
+            replica['NAME'] = location
+        else:
+            replica['HOST'] = location
+        replicas[f'replica_{i}'] = replica
+    return replicas
@@ -9,13 +9,11 @@ SECRET_KEY = config("SECRET_KEY", default="dev-secret-key")
 # ✅ Доступ только с localhost
 ALLOWED_HOSTS = ["127.0.0.1", "localhost"]
 
-# ✅ Используем SQLite для dev
+# ✅ Используем SQLite для dev (WAL); DB_ENGINE=postgresql — как в продакшене
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+    "default": database_from_env("sqlite", BASE_DIR / "db.sqlite3"),
 }
+DATABASES.update(replicas_from_env(DATABASES["default"]))
 
 # ✅ Email (локально можно консоль)
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
\ No newline at end of file
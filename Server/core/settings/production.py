@@ -1,3 +1,5 @@
+from django.core.exceptions import ImproperlyConfigured
+
 from .base import *
 
 # ✅ Режим разработки
@@ -9,14 +11,24 @@ SECRET_KEY = config("SECRET_KEY", default="dev-secret-key")
 # ✅ Доступ только с localhost
 ALLOWED_HOSTS = ["127.0.0.1", "localhost"]
 
-# ✅ Используем SQLite для dev
+# ✅ PostgreSQL с постоянными соединениями или пулом; DB_ENGINE=sqlite — для одного узла
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+    "default": database_from_env("postgresql", BASE_DIR / "db.sqlite3"),
 }
+DATABASES.update(replicas_from_env(DATABASES["default"]))
+
+# ✅ Кэш общий для всех воркеров (CACHE_BACKEND, см. CACHES в base.py)
+if not CACHE_IS_SHARED:
+    raise ImproperlyConfigured(
+        "CACHE_BACKEND: нужен кэш, общий для всех воркеров (например, RedisCache); LocMem — только для одного процесса"
+    )
 
+# ✅ SMS с кодами OTP — только через SMS-шлюз, заданный явно
+OUTBOX["SMS_BACKEND"] = config("SMS_BACKEND", default="")
+if not OUTBOX["SMS_BACKEND"] or OUTBOX["SMS_BACKEND"] in DEV_SMS_BACKENDS:
+    raise ImproperlyConfigured(
+        "SMS_BACKEND: укажите бэкенд SMS-шлюза; ConsoleSmsBackend пишет коды OTP в логи открытым текстом"
+    )
 
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = config("EMAIL_HOST")
@@ -34,4 +46,7 @@ SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = "DENY"
 SECURE_HSTS_SECONDS = 31536000  # HSTS на 1 год
 SECURE_HSTS_INCLUDE_SUBDOMAINS = True
-SECURE_HSTS_PRELOAD = True
\ No newline at end of file
+SECURE_HSTS_PRELOAD = True
+
+# 📈 В продакшене замеряем только часть запросов
+INSTRUMENTATION["SAMPLE_RATE"] = config("INSTRUMENTATION_SAMPLE_RATE", default=0.1, cast=float)
@@ -1,41 +1,16 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
+from common.instrumentation import metrics_view
+from common.openapi import schema_file
+from core.openapi import api_info
 
 # Настройка Swagger/OpenAPI
 schema_view = get_schema_view(
-    openapi.Info(
-        title="E-Commerce API",
-        default_version='v1',
-        description="""
-        # API документация для интернет-магазина
-        
-        ## Функциональность:
-        - **Категории** - управление категориями товаров
-        - **Товары** - CRUD операции с товарами, фильтрация, поиск
-        - **Заказы** - создание и управление заказами
-        - **Отзывы** - добавление и просмотр отзывов на товары
-        
-        ## Аутентификация:
-        API поддерживает несколько методов аутентификации:
-        - JWT токены (рекомендуется)
-        - DRF Token
-        - Session authentication
-        
-        ## Права доступа:
-        - Просмотр товаров и категорий - все пользователи
-        - Создание товаров - только продавцы
-        - Создание заказов - только авторизованные покупатели
-        - Управление заказами - владельцы заказов и продавцы
-        """,
-        terms_of_service="https://www.example.com/terms/",
-        contact=openapi.Contact(email="contact@example.com"),
-        license=openapi.License(name="BSD License"),
-    ),
+    api_info,
     public=True,
     permission_classes=(permissions.AllowAny,),
 )
@@ -46,12 +21,18 @@ urlpatterns = [
     # API URLs
     path('api/v1/products/', include('apps.products.urls')),
     path('api/v1/accounts/', include('apps.accounts.urls')),
+    path('api/v1/support/', include('apps.support.urls')),
     
     # Swagger/ReDoc URLs
-    path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    # Схема собирается при деплое (manage.py build_openapi) и отдается из памяти с ETag;
+    # страницы UI не содержат схему и загружают ее по SPEC_URL
+    re_path(r'^swagger(?P<format>\.json|\.yaml)/$', schema_file, name='schema-json'),
+    path('swagger/', schema_view.with_ui('swagger', cache_timeout=3600), name='schema-swagger-ui'),
+    path('redoc/', schema_view.with_ui('redoc', cache_timeout=3600), name='schema-redoc'),
     
+    # Метрики Prometheus
+    path('metrics', metrics_view, name='metrics'),
+
     # DRF browsable API auth
     path('api-auth/', include('rest_framework.urls'))
 ]
\ No newline at end of file